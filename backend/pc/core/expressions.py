@@ -0,0 +1,30 @@
+# core/expressions.py
+from django.db.models import Func, IntegerField
+
+
+class JoursEntre(Func):
+    """
+    Nombre de jours entre deux dates, calculé en SQL : fin - debut.
+    JoursEntre(Value(aujourd_hui), F('date_echeance')) -> jours restants
+    """
+    output_field = IntegerField()
+    arity = 2
+
+    # PostgreSQL, Oracle : la différence de deux dates est un nombre de jours
+    template = "(CAST({fin} AS date) - CAST({debut} AS date))"
+    templates = {
+        'sqlite': "CAST(julianday({fin}) - julianday({debut}) AS integer)",
+        'mysql': "DATEDIFF({fin}, {debut})",
+    }
+
+    def as_sql(self, compiler, connection, **extra_context):
+        template = self.templates.get(connection.vendor, self.template)
+        debut_sql, debut_params = compiler.compile(self.source_expressions[0])
+        fin_sql, fin_params = compiler.compile(self.source_expressions[1])
+
+        # Paramètres dans l'ordre d'apparition dans le SQL
+        if template.index('{fin}') < template.index('{debut}'):
+            params = (*fin_params, *debut_params)
+        else:
+            params = (*debut_params, *fin_params)
+        return template.format(debut=debut_sql, fin=fin_sql), params
@@ -0,0 +1,76 @@
+# core/pagination.py
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+
+class PaginationPages(PageNumberPagination):
+    """Pagination par numéro de page (?page=3), pour l'interface d'administration"""
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+
+class PaginationCurseur(CursorPagination):
+    """
+    Pagination par défaut des listes : curseur (keyset) sur (created_at, id),
+    coût constant quelle que soit la profondeur de la page.
+
+    - ?page=N bascule en pagination par numéro de page (opt-in, admin).
+    - Une vue peut fixer son ordre via `pagination_ordering`
+      (ex: ('-date_imputation', '-id')) ; sinon l'ordre de l'OrderingFilter
+      ou `ordering` est utilisé.
+    - Un ordre sur une colonne nullable ou une annotation (ex: jours_restants)
+      ne peut pas servir de curseur : la pagination par numéro de page est
+      alors utilisée.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+    ordering = ('-created_at', '-id')
+
+    pages = None
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.pages = None
+        ordering = self.get_ordering(request, queryset, view)
+
+        if request.query_params.get(PaginationPages.page_query_param) or self._nullable(queryset, ordering[0]):
+            self.pages = PaginationPages()
+            resultats = self.pages.paginate_queryset(queryset.order_by(*ordering), request, view)
+            self.display_page_controls = self.pages.display_page_controls
+            return resultats
+
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_ordering(self, request, queryset, view):
+        ordering = getattr(view, 'pagination_ordering', None)
+        if ordering is None or request.query_params.get('ordering'):
+            ordering = super().get_ordering(request, queryset, view)
+        ordering = tuple(ordering)
+
+        champs = {field.name for field in queryset.model._meta.concrete_fields}
+        premier = ordering[0].lstrip('-')
+        if premier != 'pk' and premier not in champs and premier not in queryset.query.annotations:
+            ordering = ('-pk',)
+
+        # Départage stable sur la clé primaire
+        if not {'pk', 'id'} & {champ.lstrip('-') for champ in ordering}:
+            ordering += ('-pk' if ordering[0].startswith('-') else 'pk',)
+        return ordering
+
+    def _nullable(self, queryset, champ):
+        champ = champ.lstrip('-')
+        if champ == 'pk':
+            return False
+        if champ in queryset.query.annotations:
+            return True
+        return queryset.model._meta.get_field(champ).null
+
+    def get_paginated_response(self, data):
+        if self.pages:
+            return self.pages.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def get_html_context(self):
+        if self.pages:
+            return self.pages.get_html_context()
+        return super().get_html_context()
@@ -0,0 +1,187 @@
+# core/projection.py
+import re
+from dataclasses import dataclass, field
+
+from django.core.exceptions import FieldDoesNotExist
+from django.db.models import Prefetch
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+
+@dataclass
+class Besoin:
+    """Ce qu'un champ de serializer lit en base"""
+    colonnes: tuple = ()
+    select_related: tuple = ()
+    prefetch_related: tuple = ()
+    annotations: dict = field(default_factory=dict)
+
+
+class ProjectionSerializerMixin:
+    """
+    Serializer dont la sortie peut être restreinte (`champs=`) et dont le
+    queryset est construit à partir des seuls champs demandés.
+
+    Les besoins en base de chaque champ sont déduits de sa source (colonne,
+    relation 'category.name', get_X_display, serializer imbriqué) ; les
+    SerializerMethodField et cas particuliers sont déclarés dans `projection()`.
+    Un champ dont les besoins sont inconnus charge toutes les colonnes.
+    """
+
+    # Champs imbriqués (relations, collections) soumis à ?expand=
+    CHAMPS_EXTENSIBLES = ()
+
+    def __init__(self, *args, champs=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        if champs is not None:
+            for nom in set(self.fields) - set(champs):
+                self.fields.pop(nom)
+
+    @classmethod
+    def projection(cls):
+        """Besoins déclarés explicitement : {'champ': Besoin(...)}"""
+        return {}
+
+    @classmethod
+    def champs_lisibles(cls):
+        return {nom: f for nom, f in cls().fields.items() if not f.write_only}
+
+    @classmethod
+    def optimiser_queryset(cls, queryset, champs=None, colonnes=()):
+        """
+        Jointures, préchargements et colonnes nécessaires aux champs demandés
+        (tous par défaut). `colonnes` : colonnes supplémentaires à charger
+        (ex: clés du curseur de pagination).
+        """
+        lisibles = cls.champs_lisibles()
+        explicites = cls.projection()
+        modele = queryset.model
+
+        colonnes, select, prefetch, annotations = {modele._meta.pk.name, *colonnes}, set(), {}, {}
+        relations_completes = set()
+        toutes_colonnes = False
+
+        # Ordre des champs du serializer : à préchargement identique, le premier déclaré l'emporte
+        for nom in (lisibles if champs is None else [nom for nom in lisibles if nom in champs]):
+            besoin = explicites[nom] if nom in explicites else _besoin_implicite(lisibles[nom], modele)
+            if besoin is None:
+                toutes_colonnes = True
+                continue
+            colonnes.update(besoin.colonnes)
+            select.update(besoin.select_related)
+            # Serializer imbriqué : toutes les colonnes de la relation sont lues
+            relations_completes.update(
+                chemin.split('__')[0] for chemin in besoin.select_related
+                if chemin.split('__')[0] in besoin.colonnes
+            )
+            for lookup in besoin.prefetch_related:
+                prefetch.setdefault(lookup.prefetch_to if isinstance(lookup, Prefetch) else lookup, lookup)
+            annotations.update(besoin.annotations)
+
+        # Les relations parcourues par select_related ne peuvent pas être différées
+        colonnes.update(chemin.split('__')[0] for chemin in select)
+        colonnes = {
+            c for c in colonnes
+            if not any(c.startswith(f"{relation}__") for relation in relations_completes)
+        }
+
+        if select:
+            queryset = queryset.select_related(*sorted(select))
+        if prefetch:
+            queryset = queryset.prefetch_related(*prefetch.values())
+        if annotations:
+            queryset = queryset.annotate(**annotations)
+        if not toutes_colonnes:
+            queryset = queryset.only(*sorted(colonnes))
+        return queryset
+
+
+def _est_colonne(modele, nom):
+    try:
+        return modele._meta.get_field(nom).concrete
+    except FieldDoesNotExist:
+        return False
+
+
+def _besoin_implicite(champ, modele):
+    source = champ.source
+
+    if isinstance(champ, serializers.ListSerializer):
+        return Besoin(prefetch_related=(source,))
+    if isinstance(champ, serializers.BaseSerializer):
+        return Besoin(colonnes=(source,), select_related=(source,))
+    if source == '*' or isinstance(champ, serializers.SerializerMethodField):
+        return None
+
+    affichage = re.fullmatch(r'get_(\w+)_display', source)
+    if affichage:
+        return Besoin(colonnes=(affichage.group(1),))
+
+    parties = source.split('.')
+    if len(parties) == 1:
+        return Besoin(colonnes=(source,)) if _est_colonne(modele, source) else None
+
+    relation = '__'.join(parties[:-1])
+    return Besoin(colonnes=(f"{relation}__{parties[-1]}",), select_related=(relation,))
+
+
+class ProjectionMixin:
+    """
+    Champs à la demande pour les ViewSets (actions de lecture) :
+
+    - ?fields=id,reference,statut   ne renvoie (et ne lit en base) que ces champs
+    - ?expand=pieces_jointes        parmi les champs imbriqués (CHAMPS_EXTENSIBLES),
+                                    n'inclut que ceux listés ; sans ?expand= ils
+                                    sont tous inclus, sauf si ?fields= les omet
+
+    Le serializer doit hériter de ProjectionSerializerMixin.
+    """
+    projection_actions = ('list', 'retrieve')
+
+    def champs_demandes(self):
+        """Noms des champs à produire, ou None pour la représentation complète"""
+        if self.action not in self.projection_actions:
+            return None
+
+        params = self.request.query_params
+        if 'fields' not in params and 'expand' not in params:
+            return None
+
+        serializer_class = self.get_serializer_class()
+        lisibles = set(serializer_class.champs_lisibles())
+        extensibles = set(serializer_class.CHAMPS_EXTENSIBLES)
+
+        demandes = _liste(params.get('fields'))
+        etendus = _liste(params.get('expand'))
+        inconnus = (demandes - lisibles) | (etendus - extensibles)
+        if inconnus:
+            raise ValidationError({
+                'fields': f"Champs inconnus: {', '.join(sorted(inconnus))}",
+                'disponibles': sorted(lisibles),
+            })
+
+        if demandes:
+            return demandes | etendus
+        return lisibles - (extensibles - etendus)
+
+    def projeter(self, queryset):
+        if self.action not in self.projection_actions:
+            return queryset
+
+        # La pagination par curseur lit les colonnes d'ordre sur la dernière ligne
+        colonnes = ()
+        if self.action == 'list' and hasattr(self.paginator, 'get_ordering'):
+            ordre = self.paginator.get_ordering(self.request, queryset, self)
+            champs = {f.name for f in queryset.model._meta.concrete_fields}
+            colonnes = [c.lstrip('-') for c in ordre if c.lstrip('-') in champs]
+        return self.get_serializer_class().optimiser_queryset(queryset, self.champs_demandes(), colonnes)
+
+    def get_serializer(self, *args, **kwargs):
+        champs = self.champs_demandes()
+        if champs is not None:
+            kwargs.setdefault('champs', champs)
+        return super().get_serializer(*args, **kwargs)
+
+
+def _liste(valeur):
+    return {nom.strip() for nom in (valeur or '').split(',') if nom.strip()}
@@ -0,0 +1,73 @@
+# core/services/classification_rules.py
+import logging
+
+from core.models import ClassificationRule
+from core.services.texte import replier_accents
+
+logger = logging.getLogger(__name__)
+
+# Nombre de mots-clés concordants à partir duquel un vote unanime vaut 1.0
+VOTES_CONFIANCE_PLEINE = 3
+
+
+def confiance_votes(votes_gagnant, votes_total, concordances):
+    """
+    Échelle de confiance commune aux classifieurs par mots-clés : part des
+    votes obtenue par le gagnant, réduite tant que moins de
+    VOTES_CONFIANCE_PLEINE mots-clés le désignent (un mot isolé ne suffit pas).
+    """
+    if not votes_total or not concordances:
+        return 0.0
+    return (votes_gagnant / votes_total) * min(concordances / VOTES_CONFIANCE_PLEINE, 1.0)
+
+
+def appliquer_regles(texte):
+    """
+    Applique les règles de classification actives (mots-clés) à un texte.
+
+    Chaque règle trouvée vote pour son service avec un poids 1/priorité ;
+    la confiance est celle de confiance_votes (part des votes du meilleur
+    service, pondérée par son nombre de règles concordantes).
+    Retourne: {'category_id': 2, 'category': 'RH', 'service_id': 5,
+               'service_impute': 'Service RH', 'confidence': 0.75, 'regles': [1, 4]}
+    ou None si aucune règle ne correspond.
+    """
+    texte_normalise = replier_accents(texte)
+    if not texte_normalise:
+        return None
+
+    regles = ClassificationRule.objects.filter(active=True).select_related('service', 'category')
+
+    votes = {}
+    concordances = {}
+    meilleure_regle = {}
+    regles_trouvees = []
+    for regle in regles:
+        mot_cle = replier_accents(regle.keyword).strip()
+        if not mot_cle or mot_cle not in texte_normalise:
+            continue
+
+        poids = 1.0 / max(regle.priority, 1)
+        votes[regle.service_id] = votes.get(regle.service_id, 0.0) + poids
+        concordances[regle.service_id] = concordances.get(regle.service_id, 0) + 1
+        regles_trouvees.append(regle.id)
+        if regle.service_id not in meilleure_regle or regle.priority < meilleure_regle[regle.service_id].priority:
+            meilleure_regle[regle.service_id] = regle
+
+    if not votes:
+        return None
+
+    service_id = max(votes, key=votes.get)
+    regle = meilleure_regle[service_id]
+    confiance = confiance_votes(votes[service_id], sum(votes.values()), concordances[service_id])
+
+    logger.debug(f"Règles: {regle.keyword} -> {regle.service.nom} ({confiance:.2f})")
+
+    return {
+        'category_id': regle.category_id,
+        'category': regle.category.name,
+        'service_id': service_id,
+        'service_impute': regle.service.nom,
+        'confidence': round(confiance, 4),
+        'regles': regles_trouvees,
+    }
@@ -0,0 +1,76 @@
+# core/services/resolution_noms.py
+import logging
+import threading
+import time
+from difflib import SequenceMatcher, get_close_matches
+
+from core.models import Category, Service
+from core.services.texte import replier_accents
+
+logger = logging.getLogger(__name__)
+
+
+class ResolveurNoms:
+    """
+    Résout un nom libre (ex: suggestion IA "Ressources humaines") en id
+    d'objet, sans requête LIKE.
+
+    Les noms sont chargés une fois dans un dictionnaire normalisé
+    (sans accents, casse repliée) ; la correspondance exacte est un accès
+    O(1), les quasi-correspondances sont départagées par similarité.
+    Le cache est invalidé par les signaux de core/signals.py, avec une
+    durée de vie maximale pour les autres processus.
+    """
+
+    SEUIL_SIMILARITE = 0.75
+
+    def __init__(self, model, champ, duree_vie=300):
+        self.model = model
+        self.champ = champ
+        self.duree_vie = duree_vie
+        self._verrou = threading.Lock()
+        self._noms = None
+        self._charge_le = 0
+
+    def invalider(self):
+        self._noms = None
+
+    def _index(self):
+        noms = self._noms
+        if noms is None or time.monotonic() - self._charge_le > self.duree_vie:
+            with self._verrou:
+                noms = {}
+                for pk, nom in self.model.objects.order_by('pk').values_list('pk', self.champ):
+                    cle = replier_accents(nom).strip()
+                    # Une clé vide serait "incluse" dans toutes les recherches
+                    if cle:
+                        noms.setdefault(cle, pk)
+                self._noms = noms
+                self._charge_le = time.monotonic()
+        return noms
+
+    def resoudre(self, nom):
+        """Retourne l'id correspondant le mieux à `nom`, ou None."""
+        cle = replier_accents(nom).strip()
+        if not cle:
+            return None
+
+        noms = self._index()
+        if cle in noms:
+            return noms[cle]
+
+        # Inclusion dans un sens ou dans l'autre ("finance" / "service financier")
+        candidats = [n for n in noms if cle in n or n in cle]
+        if not candidats:
+            candidats = get_close_matches(cle, noms.keys(), n=3, cutoff=self.SEUIL_SIMILARITE)
+        if not candidats:
+            return None
+
+        meilleur = max(candidats, key=lambda n: SequenceMatcher(None, cle, n).ratio())
+        logger.debug(f"Résolution {self.model.__name__}: '{nom}' -> '{meilleur}'")
+        return noms[meilleur]
+
+
+# Instances globales
+resolveur_categories = ResolveurNoms(Category, 'name')
+resolveur_services = ResolveurNoms(Service, 'nom')
@@ -0,0 +1,33 @@
+# core/services/taches.py
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+
+logger = logging.getLogger(__name__)
+
+
+def lancer_tache(tache, *args):
+    """
+    Lance une tâche @shared_task en arrière-plan, après validation de la
+    transaction en cours :
+    - par Celery si un broker est configuré (CELERY_BROKER_URL) ;
+    - sinon dans un thread du processus (développement, petit déploiement).
+    """
+    def lancer():
+        if getattr(settings, 'CELERY_BROKER_URL', None):
+            tache.delay(*args)
+            return
+        threading.Thread(target=_executer, args=(tache, args), daemon=True).start()
+
+    transaction.on_commit(lancer)
+
+
+def _executer(tache, args):
+    try:
+        tache(*args)
+    except Exception as e:
+        logger.error(f"Tâche {tache.name} en échec: {e}", exc_info=True)
+    finally:
+        close_old_connections()
@@ -0,0 +1,56 @@
+# core/services/texte.py
+import re
+import unicodedata
+
+MOTS_VIDES = {
+    'les', 'des', 'une', 'dans', 'pour', 'par', 'sur', 'avec', 'sans', 'sous',
+    'aux', 'est', 'sont', 'qui', 'que', 'quoi', 'dont', 'ont', 'pas', 'plus',
+    'nous', 'vous', 'ils', 'elles', 'leur', 'leurs', 'votre', 'vos', 'notre',
+    'nos', 'ces', 'cette', 'cet', 'son', 'ses', 'sont', 'etre', 'avoir', 'ete',
+    'tres', 'mais', 'donc', 'car', 'comme', 'tout', 'tous', 'toute', 'toutes',
+    'madame', 'monsieur', 'objet', 'date', 'the', 'and', 'for',
+}
+
+_MOT = re.compile(r'[a-z0-9]+')
+
+
+def replier_accents(texte):
+    """
+    Supprime les accents et passe en minuscules ("Équipe" -> "equipe")
+    """
+    if not texte:
+        return ""
+    decompose = unicodedata.normalize('NFKD', str(texte))
+    sans_accents = ''.join(c for c in decompose if not unicodedata.combining(c))
+    return sans_accents.casefold()
+
+
+def tokeniser(texte, longueur_min=3):
+    """
+    Découpe un texte en mots normalisés, sans accents ni mots vides
+    """
+    return [
+        mot for mot in _MOT.findall(replier_accents(texte))
+        if len(mot) >= longueur_min and mot not in MOTS_VIDES
+    ]
+
+
+# Suffixes retirés par raciniser(), du plus long au plus court
+SUFFIXES = (
+    'issements', 'issement', 'atrices', 'atrice', 'ateurs', 'ateur', 'ations', 'ation',
+    'ements', 'ement', 'ances', 'ance', 'ences', 'ence', 'ables', 'able',
+    'istes', 'iste', 'ismes', 'isme', 'euses', 'euse', 'ites', 'ite',
+    'ives', 'ive', 'ifs', 'eux', 'ions', 'aux', 'ees', 'ee', 'es', 'er', 'ez', 'e', 's', 'x',
+)
+
+
+def raciniser(mot, longueur_min=4):
+    """
+    Racinisation légère du français sur un mot déjà normalisé
+    ("facturation" -> "factur", "reclamations" -> "reclam").
+    La racine garde au moins `longueur_min` caractères.
+    """
+    for suffixe in SUFFIXES:
+        if mot.endswith(suffixe) and len(mot) - len(suffixe) >= longueur_min:
+            return mot[:-len(suffixe)]
+    return mot
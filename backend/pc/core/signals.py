@@ -0,0 +1,16 @@
+# core/signals.py
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from core.models import Category, Service
+from core.services.resolution_noms import resolveur_categories, resolveur_services
+
+
+@receiver([post_save, post_delete], sender=Category)
+def invalider_resolution_categories(sender, **kwargs):
+    resolveur_categories.invalider()
+
+
+@receiver([post_save, post_delete], sender=Service)
+def invalider_resolution_services(sender, **kwargs):
+    resolveur_services.invalider()
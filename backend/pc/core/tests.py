@@ -1,3 +1,146 @@
+from datetime import timedelta
+
 from django.test import TestCase
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.models import Category, Service
+from core.services.resolution_noms import resolveur_categories, resolveur_services
+from courriers.models import Courrier
+from users.models import User
+
+
+class ResolveurNomsTest(TestCase):
+    """Résolution d'un nom libre en id et invalidation du cache par les signaux"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.rh = Service.objects.create(nom="Ressources Humaines")
+        cls.finances = Service.objects.create(nom="Service Financier")
+        cls.courrier = Service.objects.create(nom="Bureau d'ordre")
+        cls.sans_nom = Service.objects.create(nom="  ")
+
+    def setUp(self):
+        resolveur_services.invalider()
+        self.addCleanup(resolveur_services.invalider)
+
+    def test_correspondance_exacte_et_sans_accents(self):
+        self.assertEqual(resolveur_services.resoudre("Ressources Humaines"), self.rh.id)
+        self.assertEqual(resolveur_services.resoudre("  ressources humaines "), self.rh.id)
+        self.assertEqual(resolveur_services.resoudre("RESSOURCES HUMAINES"), self.rh.id)
+        categorie = Category.objects.create(name="Télécommunications")
+        self.assertEqual(resolveur_categories.resoudre("telecommunications"), categorie.id)
+
+    def test_inclusion_dans_les_deux_sens(self):
+        # Nom cherché contenu dans un nom connu
+        self.assertEqual(resolveur_services.resoudre("financier"), self.finances.id)
+        # Nom connu contenu dans le nom cherché
+        self.assertEqual(resolveur_services.resoudre("Direction des Ressources Humaines"), self.rh.id)
+
+    def test_repli_par_similarite(self):
+        self.assertEqual(resolveur_services.resoudre("Resources Humaine"), self.rh.id)
+        self.assertEqual(resolveur_services.resoudre("Bureau dordre"), self.courrier.id)
+
+    def test_aucune_correspondance(self):
+        self.assertIsNone(resolveur_services.resoudre("Protocole"))
+        self.assertIsNone(resolveur_services.resoudre(""))
+        self.assertIsNone(resolveur_services.resoudre(None))
+
+    def test_nom_vide_jamais_candidat(self):
+        self.assertNotIn("", resolveur_services._index())
+        self.assertNotEqual(resolveur_services.resoudre("Protocole"), self.sans_nom.id)
+
+    def test_cache_rafraichi_apres_enregistrement_et_suppression(self):
+        self.assertIsNone(resolveur_services.resoudre("Protocole"))
+
+        protocole = Service.objects.create(nom="Protocole")
+        self.assertEqual(resolveur_services.resoudre("protocole"), protocole.id)
+
+        protocole.nom = "Cabinet"
+        protocole.save()
+        self.assertEqual(resolveur_services.resoudre("cabinet"), protocole.id)
+
+        protocole.delete()
+        self.assertIsNone(resolveur_services.resoudre("cabinet"))
+
+
+class PaginationCurseurTest(TestCase):
+    """Curseur par défaut sur les listes, pages numérotées en opt-in et pour les ordres non indexables"""
+
+    URL = '/api/courriers/courriers/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(email='admin@test.bf', password='x', nom='Admin', prenom='Test')
+        aujourd_hui = timezone.localdate()
+        for i in range(7):
+            cls.creer(f"CE-PAG-{i}", date_echeance=aujourd_hui + timedelta(days=i) if i % 2 else None)
+
+    @classmethod
+    def creer(cls, reference, **champs):
+        return Courrier.objects.create(reference=reference, type='entrant', objet=reference,
+                                       created_by=cls.user, **champs)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url, params=None):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def references(self, page):
+        return [ligne['reference'] for ligne in page['results']]
+
+    def test_parcours_suivant_puis_precedent_pendant_des_insertions(self):
+        attendu = list(Courrier.objects.order_by('-created_at', '-id').values_list('reference', flat=True))
+
+        page = self.get(self.URL, {'page_size': 2})
+        self.assertNotIn('count', page)
+        self.assertIsNone(page['previous'])
+        vues, pages = self.references(page), [page]
+        while page['next']:
+            self.creer(f"CE-PAG-NOUVEAU-{len(pages)}")
+            page = self.get(page['next'])
+            vues += self.references(page)
+            pages.append(page)
+
+        # Les insertions (plus récentes) ne décalent pas le parcours : ni trou ni doublon
+        self.assertEqual(vues, attendu)
+        self.assertEqual(len(pages), 4)
+
+        retour = []
+        while page['previous']:
+            page = self.get(page['previous'])
+            retour = self.references(page) + retour
+        tous = list(Courrier.objects.order_by('-created_at', '-id').values_list('reference', flat=True))
+        self.assertEqual(retour + self.references(pages[-1]), tous)
+
+    def test_page_numerotee_sur_demande(self):
+        page = self.get(self.URL, {'page': 2, 'page_size': 3})
+
+        self.assertEqual(page['count'], 7)
+        self.assertEqual(len(page['results']), 3)
+        self.assertIn('page=3', page['next'])
+        self.assertIn('page_size=3', page['previous'])
+
+    def test_ordre_non_indexable_bascule_en_pages_numerotees(self):
+        vues = []
+        page = self.get(self.URL, {'ordering': 'jours_restants', 'page_size': 3})
+        self.assertEqual(page['count'], 7)
+        vues += self.references(page)
+        while page['next']:
+            self.assertIn('page=', page['next'])
+            page = self.get(page['next'])
+            vues += self.references(page)
+
+        self.assertEqual(sorted(vues), sorted(Courrier.objects.values_list('reference', flat=True)))
+        avec_echeance = [ref for ref in vues if Courrier.objects.get(reference=ref).date_echeance]
+        self.assertEqual(avec_echeance, ['CE-PAG-1', 'CE-PAG-3', 'CE-PAG-5'])
 
-# Create your tests here.
+        # Colonne nullable : même bascule
+        page = self.get(self.URL, {'ordering': '-date_echeance'})
+        self.assertEqual(page['count'], 7)
+        # Colonne non nullable : curseur
+        self.assertNotIn('count', self.get(self.URL, {'ordering': 'created_at'}))
@@ -121,6 +121,8 @@ REST_FRAMEWORK = {
      "DEFAULT_PERMISSION_CLASSES": [
         "rest_framework.permissions.AllowAny",  
     ],
+    "DEFAULT_PAGINATION_CLASS": "core.pagination.PaginationCurseur",
+    "PAGE_SIZE": 50,
 }
 
 AUTHENTICATION_BACKENDS = [
@@ -190,3 +192,55 @@ GOOGLE_API_KEY = os.environ.get("GOOGLE_API_KEY", "AIzaSyCe9tmbPd-28RQLxtxJdp583
 GEMINI_API_KEY = GOOGLE_API_KEY  # Pour compatibilité
 
 
+
+# Routeur k-NN local entraîné sur les imputations (voir ia/services/knn_router.py)
+IA_KNN_INDEX_PATH = BASE_DIR / 'ia' / 'index' / 'imputations.npz'
+IA_KNN_VOISINS = 15
+
+# Seuils de confiance de la cascade de classification (voir ia/services/classifier.py) :
+# la cascade s'arrête au premier niveau qui atteint son seuil, Gemini en dernier recours.
+IA_CASCADE_SEUILS = {
+    'regles': 0.8,
+    'knn': 0.6,
+}
+
+# Cache (réponses courrier, tableau de bord) : DJANGO_CACHE_BACKEND = locmem | file | redis
+# Le cache local est propre à chaque processus : utiliser file ou redis dès
+# qu'il y a plusieurs workers, sans quoi les invalidations ne sont pas partagées.
+DJANGO_CACHE_BACKEND = os.environ.get("DJANGO_CACHE_BACKEND", "locmem")
+if DJANGO_CACHE_BACKEND == "redis":
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': os.environ.get("DJANGO_CACHE_LOCATION", "redis://127.0.0.1:6379/1"),
+        }
+    }
+elif DJANGO_CACHE_BACKEND == "file":
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': os.environ.get("DJANGO_CACHE_LOCATION", str(BASE_DIR / 'cache')),
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+            'LOCATION': 'courrier',
+        }
+    }
+
+# Durée (secondes) des réponses du tableau de bord en cache (voir dashboard/services/cache_dashboard.py)
+DASHBOARD_CACHE_DUREE = 300
+# Au-delà (secondes), un rapport encore en préparation est considéré interrompu (voir dashboard/services/rapports.py)
+DASHBOARD_RAPPORT_DELAI_MAX = 900
+
+# Import de courriers : lignes validées et écrites par transaction (voir courriers/services/import_courriers.py)
+COURRIER_IMPORT_TAILLE_LOT = 1000
+# Erreurs détaillées conservées par import (rapport CSV) ; au-delà, les lignes sont seulement comptées
+COURRIER_IMPORT_ERREURS_MAX = 1000
+# 'tache' : import lancé à la réception du fichier (Celery ou thread, voir core/services/taches.py)
+# 'commande' : imports traités par `manage.py traiter_imports` (cron / worker dédié)
+COURRIER_IMPORT_EXECUTION = 'tache'
+# Import en cours sans lot validé depuis ce délai (secondes) : considéré interrompu et repris
+COURRIER_IMPORT_DELAI_MAX = 900
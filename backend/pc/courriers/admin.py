@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import Courrier, PieceJointe, Imputation, ActionHistorique
+from .models import Courrier, PieceJointe, Imputation, ActionHistorique, ImportJob
 
 
 class PieceJointeInline(admin.TabularInline):
@@ -39,3 +39,11 @@ class ActionHistoriqueAdmin(admin.ModelAdmin):
     list_display = ("courrier", "user", "action", "date")
     list_filter = ("action", "date")
     search_fields = ("courrier__reference", "user__email", "action")
+
+
+@admin.register(ImportJob)
+class ImportJobAdmin(admin.ModelAdmin):
+    list_display = ("nom_fichier", "type_courrier", "statut", "lignes_traitees", "importes", "nb_erreurs", "created_by", "created_at")
+    list_filter = ("statut", "type_courrier")
+    search_fields = ("nom_fichier", "created_by__email")
+    readonly_fields = ("erreurs",)
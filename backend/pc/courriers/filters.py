@@ -0,0 +1,53 @@
+# courriers/filters.py
+import django_filters
+from rest_framework import filters
+
+from .models import Courrier
+from .services.recherche import moteur_recherche
+
+
+class RechercheTexteFilter(filters.SearchFilter):
+    """
+    Paramètre ?search= servi par l'index plein texte (courrier_fts)
+    au lieu de LIKE '%terme%' sur chaque colonne de search_fields.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        texte = request.query_params.get(self.search_param, '').strip()
+        if not texte:
+            return queryset
+        return moteur_recherche.filtrer(queryset, texte)
+
+
+class CourrierFilter(django_filters.FilterSet):
+    """
+    Filtres de la liste des courriers. Les champs d'échéance portent sur les
+    annotations de Courrier.objects.with_deadlines() (appliquées par la vue) :
+    ?est_en_retard=true, ?jours_restants_max=3, ?delai_traitement_min=30
+    """
+    est_en_retard = django_filters.BooleanFilter(method='filtrer_retard')
+    jours_restants_min = django_filters.NumberFilter(field_name='jours_restants', lookup_expr='gte')
+    jours_restants_max = django_filters.NumberFilter(field_name='jours_restants', lookup_expr='lte')
+    delai_traitement_min = django_filters.NumberFilter(field_name='delai_traitement', lookup_expr='gte')
+    delai_traitement_max = django_filters.NumberFilter(field_name='delai_traitement', lookup_expr='lte')
+
+    class Meta:
+        model = Courrier
+        fields = {
+            'type': ['exact', 'in'],
+            'statut': ['exact', 'in'],
+            'priorite': ['exact', 'in'],
+            'confidentialite': ['exact', 'in'],
+            'canal': ['exact', 'in'],
+            'category': ['exact', 'in'],
+            'service_impute': ['exact', 'in'],
+            'created_by': ['exact'],
+            'date_reception': ['gte', 'lte', 'exact'],
+            'date_echeance': ['gte', 'lte', 'exact'],
+        }
+
+    def filtrer_retard(self, queryset, name, value):
+        # Les retards sont cherchés sur les colonnes indexées plutôt que sur l'annotation
+        if value:
+            return queryset.en_retard()
+        return queryset.filter(est_en_retard=False)
@@ -0,0 +1,140 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.db.models import Count, DateField, Q, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from core.models import Service
+from courriers.models import A_IMPUTER, ActionHistorique, Courrier, Imputation
+from courriers.views import CourrierViewSet
+from dashboard.models import StatJour
+from users.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        "Affiche le plan d'exécution (EXPLAIN) des requêtes principales de chaque endpoint "
+        "et signale les parcours complets et les tris en table temporaire."
+    )
+
+    # Parcours voulus : requête -> raison (non comptés comme alertes)
+    PARCOURS_ATTENDUS = {
+        'dashboard.performance': "tous les services, y compris sans courrier (table de référence, quelques lignes)",
+    }
+
+    def add_arguments(self, parser):
+        parser.add_argument('--strict', action='store_true', help="Échoue si un parcours complet ou un tri temporaire est détecté")
+
+    def handle(self, *args, **options):
+        parcours_complets = []
+        tris_temporaires = []
+        for nom, queryset in self.requetes():
+            plan = queryset.explain()
+            lignes = plan.splitlines()
+            parcours = any(self.est_parcours_complet(ligne) for ligne in lignes)
+            tri = any(self.est_tri_temporaire(ligne) for ligne in lignes)
+
+            if nom in self.PARCOURS_ATTENDUS:
+                self.stdout.write(self.style.NOTICE(f"~ {nom} (attendu : {self.PARCOURS_ATTENDUS[nom]})"))
+                parcours = tri = False
+            else:
+                style = self.style.WARNING if parcours or tri else self.style.SUCCESS
+                self.stdout.write(style(f"{'✘' if parcours or tri else '✔'} {nom}"))
+            for ligne in lignes:
+                alerte = ' ⚠ tri temporaire' if self.est_tri_temporaire(ligne) else ''
+                self.stdout.write(f"    {ligne}{alerte}")
+            if parcours:
+                parcours_complets.append(nom)
+            if tri:
+                tris_temporaires.append(nom)
+
+        messages = []
+        if parcours_complets:
+            messages.append(f"{len(parcours_complets)} requête(s) avec parcours complet : {', '.join(parcours_complets)}")
+        if tris_temporaires:
+            messages.append(f"{len(tris_temporaires)} requête(s) triée(s) hors index : {', '.join(tris_temporaires)}")
+        if messages and options['strict']:
+            raise CommandError(' ; '.join(messages))
+        for message in messages:
+            self.stdout.write(self.style.WARNING(message))
+
+    def est_parcours_complet(self, ligne):
+        if connection.vendor == 'sqlite':
+            # "SCAN courrier_courrier" sans index ; "SCAN ... USING INDEX" reste acceptable
+            return 'SCAN ' in ligne and 'USING' not in ligne and 'CONSTANT ROW' not in ligne
+        if connection.vendor == 'postgresql':
+            return 'Seq Scan' in ligne
+        if connection.vendor == 'mysql':
+            return '\tALL\t' in ligne or ' ALL ' in ligne
+        return False
+
+    def est_tri_temporaire(self, ligne):
+        """ORDER BY non servi par un index : toutes les lignes filtrées sont triées avant le LIMIT"""
+        if connection.vendor == 'sqlite':
+            return 'USE TEMP B-TREE FOR ORDER BY' in ligne
+        if connection.vendor == 'postgresql':
+            return 'Sort Key' in ligne
+        if connection.vendor == 'mysql':
+            return 'Using filesort' in ligne
+        return False
+
+    # ------------------------------------------------------------------
+    # Requêtes des endpoints
+    # ------------------------------------------------------------------
+    def requetes(self):
+        aujourd_hui = timezone.now().date()
+        debut_mois = aujourd_hui.replace(day=1)
+        service = Service(pk=Service.objects.values_list('pk', flat=True).first() or 1)
+        agent = User(pk=User.objects.values_list('pk', flat=True).first() or 1, service=service)
+        admin = User(pk=agent.pk, is_superuser=True)
+        courrier_id = Courrier.objects.values_list('pk', flat=True).first() or 1
+
+        yield "courriers.list (admin)", self.liste_courriers(admin, {})
+        yield "courriers.list (périmètre service)", self.liste_courriers(agent, {})
+        yield "courriers.list en_retard", self.liste_courriers(agent, {'en_retard': 'true'})
+        yield "courriers.list statut", self.liste_courriers(admin, {'statut': 'traitement'})
+
+        yield "courriers.historique", ActionHistorique.objects.filter(
+            courrier_id=courrier_id
+        ).order_by('-date', '-id')[:51]
+
+        yield "imputations.list", Imputation.objects.order_by('-date_imputation', '-id')[:51]
+
+        yield "imputation-dashboard.list", Courrier.objects.filter(A_IMPUTER).order_by('-created_at', '-id')[:51]
+
+        # Tableau de bord : compteurs lus dans l'agrégat journalier (StatJour),
+        # retards et délais sur les courriers
+        stats = StatJour.objects.filter(date__gte=debut_mois, date__lte=aujourd_hui)
+        yield "dashboard.stats (StatJour)", stats
+        yield "dashboard.stats late", Courrier.objects.en_retard(aujourd_hui).filter(
+            date_reception__gte=debut_mois, date_reception__lte=aujourd_hui, archived=False
+        )
+        yield "dashboard.trends (StatJour)", StatJour.objects.filter(
+            Q(date__gte=debut_mois - timedelta(days=31), date__lt=debut_mois) | Q(date__gte=debut_mois, date__lte=aujourd_hui),
+            archived=False,
+        )
+        yield "dashboard.series (StatJour)", stats.filter(archived=False).annotate(
+            periode=Trunc('date', 'week', output_field=DateField())
+        ).values('periode', 'type').annotate(count=Sum('nombre')).order_by()
+        yield "dashboard.performance", Service.objects.order_by('id').values('id', 'nom').annotate(
+            total=Count('courrier', filter=Q(
+                courrier__date_reception__gte=debut_mois, courrier__date_reception__lte=aujourd_hui,
+                courrier__archived=False,
+            )),
+        )
+        yield "dashboard.delais", Courrier.objects.filter(
+            date_reception__gte=debut_mois, date_reception__lte=aujourd_hui, archived=False
+        ).values_list('service_impute', 'date_reception', 'date_cloture', 'date_echeance')
+
+    def liste_courriers(self, user, params):
+        """Queryset réellement construit par CourrierViewSet.list pour ces paramètres"""
+        request = Request(APIRequestFactory().get('/api/courriers/courriers/', params))
+        request.user = user
+
+        vue = CourrierViewSet(action='list', request=request, format_kwarg=None, kwargs={})
+        queryset = vue.filter_queryset(vue.get_queryset())
+        return queryset.order_by('-created_at', '-id')[:51]
@@ -0,0 +1,79 @@
+import time
+import uuid
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from courriers.models import Courrier
+from courriers.serializers import CourrierListeRapide, CourrierListSerializer
+
+
+class Command(BaseCommand):
+    help = "Mesure le débit (lignes/s) de la liste des courriers : CourrierListSerializer contre le chemin rapide values()."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--lignes', type=int, default=1000, help="Nombre de courriers sérialisés")
+        parser.add_argument('--repetitions', type=int, default=5, help="Mesures par variante (la meilleure est retenue)")
+        parser.add_argument('--generer', action='store_true',
+                            help="Complète la base avec des courriers temporaires (annulés en fin de mesure)")
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['generer']:
+                self.generer(options['lignes'] - Courrier.objects.count())
+
+            queryset = Courrier.objects.order_by('-created_at', '-id')
+            nombre = min(options['lignes'], queryset.count())
+            if not nombre:
+                self.stdout.write(self.style.WARNING("Aucun courrier à sérialiser (utiliser --generer)"))
+                return
+
+            variantes = {
+                'serializer': lambda: JSONRenderer().render(
+                    CourrierListSerializer(CourrierListSerializer.optimiser_queryset(queryset)[:nombre], many=True).data
+                ),
+                'rapide': lambda: JSONRenderer().render(
+                    CourrierListeRapide.serialiser(CourrierListeRapide.valeurs(queryset)[:nombre])
+                ),
+            }
+
+            sorties = {nom: produire() for nom, produire in variantes.items()}  # échauffement
+            if sorties['serializer'] != sorties['rapide']:
+                self.stdout.write(self.style.ERROR("Les deux sorties diffèrent !"))
+
+            debits = {}
+            for nom, produire in variantes.items():
+                meilleure = min(self.chronometrer(produire) for _ in range(options['repetitions']))
+                debits[nom] = nombre / meilleure
+                self.stdout.write(f"{nom:<12} {nombre} lignes en {meilleure * 1000:.1f} ms -> {debits[nom]:,.0f} lignes/s")
+
+            self.stdout.write(self.style.SUCCESS(f"Chemin rapide : x{debits['rapide'] / debits['serializer']:.1f}"))
+            transaction.set_rollback(True)
+
+    def chronometrer(self, produire):
+        debut = time.perf_counter()
+        produire()
+        return time.perf_counter() - debut
+
+    def generer(self, manquants):
+        if manquants <= 0:
+            return
+        aujourd_hui = timezone.now().date()
+        priorites = ['basse', 'normale', 'haute', 'urgente']
+        statuts = ['recu', 'impute', 'traitement', 'repondu']
+        Courrier.objects.bulk_create(
+            Courrier(
+                reference=f"BENCH-{uuid.uuid4().hex[:12]}",
+                type='entrant',
+                objet=f"Courrier de mesure {i}",
+                expediteur_nom="Expéditeur de Mesure",
+                date_reception=aujourd_hui,
+                date_echeance=aujourd_hui + timedelta(days=i % 30 - 10),
+                statut=statuts[i % len(statuts)],
+                priorite=priorites[i % len(priorites)],
+            )
+            for i in range(manquants)
+        )
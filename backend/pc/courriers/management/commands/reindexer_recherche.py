@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from courriers.services.recherche import moteur_recherche
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index de recherche plein texte des courriers."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--taille-lot', type=int, default=1000, help="Courriers indexés par lot")
+
+    def handle(self, *args, **options):
+        if not moteur_recherche.disponible:
+            self.stdout.write(self.style.WARNING(
+                f"Moteur {moteur_recherche.vendor} : pas d'index plein texte, recherche par LIKE."
+            ))
+            return
+
+        total = moteur_recherche.reconstruire(taille_lot=options['taille_lot'])
+        self.stdout.write(self.style.SUCCESS(f"✔ {total} courriers indexés"))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from courriers.services.acces import reconstruire_acces
+
+
+class Command(BaseCommand):
+    help = "Reconstruit la table de visibilité des courriers (CourrierAcces)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--taille-lot', type=int, default=500, help="Courriers traités par lot")
+
+    def handle(self, *args, **options):
+        total = reconstruire_acces(taille_lot=options['taille_lot'])
+        self.stdout.write(self.style.SUCCESS(f"✔ {total} lignes d'accès créées"))
@@ -0,0 +1,25 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from courriers.services.import_courriers import executer_import, imports_a_traiter
+
+
+class Command(BaseCommand):
+    help = "Traite les imports de courriers en attente ou interrompus (worker, COURRIER_IMPORT_EXECUTION = 'commande')."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--boucle', action='store_true', help="Continue à attendre de nouveaux imports")
+        parser.add_argument('--intervalle', type=float, default=5, help="Secondes entre deux scrutations (--boucle)")
+
+    def handle(self, *args, **options):
+        while True:
+            for job_id in list(imports_a_traiter().order_by('created_at').values_list('pk', flat=True)):
+                job = executer_import(job_id)
+                if job is not None:
+                    style = self.style.SUCCESS if job.statut == 'termine' else self.style.ERROR
+                    self.stdout.write(style(f"Import {job.pk} ({job.nom_fichier}) : {job.statut} - {job.message}"))
+
+            if not options['boucle']:
+                break
+            time.sleep(options['intervalle'])
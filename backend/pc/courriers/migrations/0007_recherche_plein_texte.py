@@ -0,0 +1,74 @@
+from django.db import migrations
+
+# Schéma de l'index plein texte figé à cette migration (voir courriers/services/recherche.py)
+TABLE = 'courrier_fts'
+CHAMPS = ('reference', 'objet', 'expediteur_nom', 'contenu_texte')
+
+
+def creer_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        schema_editor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {TABLE} USING fts5("
+            f"{', '.join(CHAMPS)}, tokenize='unicode61 remove_diacritics 2', prefix='2 3 4')"
+        )
+    elif vendor == 'postgresql':
+        schema_editor.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+        schema_editor.execute(
+            f"CREATE TABLE IF NOT EXISTS {TABLE} ("
+            "courrier_id bigint PRIMARY KEY REFERENCES courrier_courrier(id) ON DELETE CASCADE, "
+            "document tsvector NOT NULL, texte text NOT NULL DEFAULT '')"
+        )
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {TABLE}_document_gin ON {TABLE} USING GIN (document)"
+        )
+    else:
+        return
+
+    Courrier = apps.get_model('courriers', 'Courrier')
+    lignes = Courrier.objects.order_by('pk').values_list('pk', *CHAMPS)
+    lot = []
+    for ligne in lignes.iterator(chunk_size=1000):
+        lot.append(ligne)
+        if len(lot) >= 1000:
+            indexer_lignes(schema_editor, lot)
+            lot = []
+    indexer_lignes(schema_editor, lot)
+
+
+def indexer_lignes(schema_editor, lignes):
+    lignes = [(pk, *(valeur or '' for valeur in valeurs)) for pk, *valeurs in lignes]
+    if not lignes:
+        return
+    with schema_editor.connection.cursor() as cursor:
+        if schema_editor.connection.vendor == 'sqlite':
+            cursor.executemany(
+                f"INSERT INTO {TABLE} (rowid, {', '.join(CHAMPS)}) VALUES (%s, %s, %s, %s, %s)",
+                lignes,
+            )
+        else:
+            cursor.executemany(
+                f"INSERT INTO {TABLE} (courrier_id, document, texte) VALUES (%s, "
+                "setweight(to_tsvector('french', unaccent(%s)), 'A') || "
+                "setweight(to_tsvector('french', unaccent(%s)), 'B') || "
+                "setweight(to_tsvector('french', unaccent(%s)), 'C') || "
+                "setweight(to_tsvector('french', unaccent(%s)), 'D'), %s) "
+                "ON CONFLICT (courrier_id) DO NOTHING",
+                [(pk, ref, objet, exp, contenu, f"{objet}\n{contenu}") for pk, ref, objet, exp, contenu in lignes],
+            )
+
+
+def supprimer_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute(f"DROP TABLE IF EXISTS {TABLE}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courriers', '0006_courrier_expediteur_telephone'),
+    ]
+
+    operations = [
+        migrations.RunPython(creer_index, supprimer_index),
+    ]
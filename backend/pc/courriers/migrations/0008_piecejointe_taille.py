@@ -0,0 +1,27 @@
+from django.db import migrations, models
+
+
+def remplir_tailles(apps, schema_editor):
+    PieceJointe = apps.get_model('courriers', 'PieceJointe')
+    for piece in PieceJointe.objects.filter(taille__isnull=True).exclude(fichier='').iterator():
+        try:
+            piece.taille = piece.fichier.size
+        except OSError:
+            continue
+        piece.save(update_fields=['taille'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courriers', '0007_recherche_plein_texte'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='piecejointe',
+            name='taille',
+            field=models.PositiveBigIntegerField(blank=True, null=True),
+        ),
+        migrations.RunPython(remplir_tailles, migrations.RunPython.noop),
+    ]
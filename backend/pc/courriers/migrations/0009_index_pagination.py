@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:47
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_initial'),
+        ('courriers', '0008_piecejointe_taille'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='courrier',
+            name='courrier_co_created_fef719_idx',
+        ),
+        migrations.AddIndex(
+            model_name='actionhistorique',
+            index=models.Index(fields=['courrier', 'date', 'id'], name='courrier_hi_courrie_eef200_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='courrier',
+            index=models.Index(fields=['created_at', 'id'], name='courrier_co_created_97519e_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='imputation',
+            index=models.Index(fields=['date_imputation', 'id'], name='courrier_im_date_im_a01c10_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='piecejointe',
+            index=models.Index(fields=['uploaded_at', 'id'], name='courrier_pi_uploade_52ae9d_idx'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:49
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_initial'),
+        ('courriers', '0009_index_pagination'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='courrier',
+            name='courrier_co_statut_d9ac49_idx',
+        ),
+        migrations.AddIndex(
+            model_name='courrier',
+            index=models.Index(fields=['statut', 'date_echeance'], name='courrier_co_statut_c6afd0_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='courrier',
+            index=models.Index(fields=['service_impute', 'statut', 'date_echeance'], name='courrier_svc_impute_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='courrier',
+            index=models.Index(fields=['service_actuel', 'statut', 'date_echeance'], name='courrier_svc_actuel_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='courrier',
+            index=models.Index(fields=['responsable_actuel', 'statut', 'date_echeance'], name='courrier_responsable_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='courrier',
+            index=models.Index(condition=models.Q(('archived', False)), fields=['date_reception', 'type'], name='courrier_reception_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='courrier',
+            index=models.Index(condition=models.Q(('statut__in', ['recu', 'impute', 'traitement'])), fields=['date_echeance'], name='courrier_ouverts_echeance_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='courrier',
+            index=models.Index(condition=models.Q(('archived', False), models.Q(('statut', 'recu'), ('service_impute__isnull', True), _connector='OR')), fields=['created_at', 'id'], name='courrier_a_imputer_idx'),
+        ),
+    ]
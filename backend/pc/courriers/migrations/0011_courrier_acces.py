@@ -0,0 +1,72 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def lignes_acces(courrier, services_imputes=()):
+    """Règles de visibilité figées à cette migration (voir courriers/services/acces.py)"""
+    lignes = set()
+    for service_id in (courrier.service_impute_id, courrier.service_actuel_id):
+        if service_id:
+            lignes.add((service_id, None, 'service'))
+
+    if courrier.confidentialite == 'normale':
+        for service_id in services_imputes:
+            if service_id and (service_id, None, 'service') not in lignes:
+                lignes.add((service_id, None, 'concerne'))
+
+    if courrier.responsable_actuel_id:
+        lignes.add((None, courrier.responsable_actuel_id, 'responsable'))
+    if courrier.created_by_id:
+        lignes.add((None, courrier.created_by_id, 'createur'))
+    return lignes
+
+
+def remplir_acces(apps, schema_editor):
+    Courrier = apps.get_model('courriers', 'Courrier')
+    CourrierAcces = apps.get_model('courriers', 'CourrierAcces')
+    Imputation = apps.get_model('courriers', 'Imputation')
+
+    services_imputes = {}
+    for courrier_id, service_id in Imputation.objects.filter(service__isnull=False).values_list('courrier_id', 'service_id'):
+        services_imputes.setdefault(courrier_id, set()).add(service_id)
+
+    lot = []
+    for courrier in Courrier.objects.all().iterator(chunk_size=1000):
+        for service_id, user_id, motif in lignes_acces(courrier, services_imputes.get(courrier.pk, ())):
+            lot.append(CourrierAcces(courrier_id=courrier.pk, service_id=service_id, user_id=user_id, motif=motif))
+        if len(lot) >= 1000:
+            CourrierAcces.objects.bulk_create(lot)
+            lot = []
+    CourrierAcces.objects.bulk_create(lot)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_initial'),
+        ('courriers', '0010_index_requetes'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CourrierAcces',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('motif', models.CharField(choices=[('service', 'Service imputé / actuel'), ('concerne', 'Service concerné (imputation)'), ('responsable', 'Responsable actuel'), ('createur', 'Créateur')], max_length=20)),
+                ('courrier', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='acces', to='courriers.courrier')),
+                ('service', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to='core.service')),
+                ('user', models.ForeignKey(blank=True, db_index=False, null=True, on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Accès courrier',
+                'verbose_name_plural': 'Accès courriers',
+                'db_table': 'courrier_acces',
+                'indexes': [models.Index(fields=['service', 'courrier'], name='courrier_ac_service_882ef0_idx'), models.Index(fields=['user', 'courrier'], name='courrier_ac_user_id_1b7d1a_idx')],
+            },
+        ),
+        migrations.RunPython(remplir_acces, migrations.RunPython.noop),
+    ]
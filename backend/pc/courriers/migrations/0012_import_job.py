@@ -0,0 +1,44 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courriers', '0011_courrier_acces'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ImportJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('fichier', models.FileField(upload_to='imports/%Y/%m/')),
+                ('nom_fichier', models.CharField(max_length=255)),
+                ('type_courrier', models.CharField(choices=[('entrant', 'Entrant'), ('sortant', 'Sortant'), ('interne', 'Interne')], max_length=20)),
+                ('mapping', models.JSONField(blank=True, default=dict)),
+                ('statut', models.CharField(choices=[('en_attente', 'En attente'), ('en_cours', 'En cours'), ('termine', 'Terminé'), ('echec', 'Échec')], default='en_attente', max_length=20)),
+                ('total_estime', models.PositiveIntegerField(blank=True, null=True)),
+                ('lignes_traitees', models.PositiveIntegerField(default=0)),
+                ('importes', models.PositiveIntegerField(default=0)),
+                ('nb_erreurs', models.PositiveIntegerField(default=0)),
+                ('erreurs', models.JSONField(blank=True, default=list)),
+                ('message', models.TextField(blank=True, default='')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('demarre_le', models.DateTimeField(blank=True, null=True)),
+                ('termine_le', models.DateTimeField(blank=True, null=True)),
+                ('created_by', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='imports_courriers', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Import de courriers',
+                'verbose_name_plural': 'Imports de courriers',
+                'db_table': 'courrier_import_job',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['statut', 'created_at'], name='courrier_im_statut_9ef2f6_idx')],
+            },
+        ),
+    ]
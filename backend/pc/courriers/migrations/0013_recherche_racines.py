@@ -0,0 +1,75 @@
+import re
+import unicodedata
+
+from django.db import migrations
+
+# L'index SQLite contient désormais les racines des mots, comme les requêtes.
+# Normalisation figée à cette migration (voir core/services/texte.py).
+TABLE = 'courrier_fts'
+CHAMPS = ('reference', 'objet', 'expediteur_nom', 'contenu_texte')
+
+MOTS_VIDES = {
+    'les', 'des', 'une', 'dans', 'pour', 'par', 'sur', 'avec', 'sans', 'sous',
+    'aux', 'est', 'sont', 'qui', 'que', 'quoi', 'dont', 'ont', 'pas', 'plus',
+    'nous', 'vous', 'ils', 'elles', 'leur', 'leurs', 'votre', 'vos', 'notre',
+    'nos', 'ces', 'cette', 'cet', 'son', 'ses', 'etre', 'avoir', 'ete',
+    'tres', 'mais', 'donc', 'car', 'comme', 'tout', 'tous', 'toute', 'toutes',
+    'madame', 'monsieur', 'objet', 'date', 'the', 'and', 'for',
+}
+SUFFIXES = (
+    'issements', 'issement', 'atrices', 'atrice', 'ateurs', 'ateur', 'ations', 'ation',
+    'ements', 'ement', 'ances', 'ance', 'ences', 'ence', 'ables', 'able',
+    'istes', 'iste', 'ismes', 'isme', 'euses', 'euse', 'ites', 'ite',
+    'ives', 'ive', 'ifs', 'eux', 'ions', 'aux', 'ees', 'ee', 'es', 'er', 'ez', 'e', 's', 'x',
+)
+MOT = re.compile(r'[a-z0-9]+')
+
+
+def raciniser(mot):
+    for suffixe in SUFFIXES:
+        if mot.endswith(suffixe) and len(mot) - len(suffixe) >= 4:
+            return mot[:-len(suffixe)]
+    return mot
+
+
+def texte_indexe(texte):
+    decompose = unicodedata.normalize('NFKD', str(texte or ''))
+    texte = ''.join(c for c in decompose if not unicodedata.combining(c)).casefold()
+    return ' '.join(
+        raciniser(mot) for mot in MOT.findall(texte)
+        if len(mot) >= 2 and mot not in MOTS_VIDES
+    )
+
+
+def reindexer(apps, schema_editor, racines=True):
+    if schema_editor.connection.vendor != 'sqlite':
+        return  # PostgreSQL : to_tsvector('french') racinise déjà le document
+
+    Courrier = apps.get_model('courriers', 'Courrier')
+    normaliser = texte_indexe if racines else (lambda valeur: valeur or '')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {TABLE}")
+        lot = []
+        lignes = Courrier.objects.order_by('pk').values_list('pk', *CHAMPS)
+        for pk, *valeurs in lignes.iterator(chunk_size=1000):
+            lot.append((pk, *(normaliser(valeur) for valeur in valeurs)))
+            if len(lot) >= 1000:
+                cursor.executemany(f"INSERT INTO {TABLE} (rowid, {', '.join(CHAMPS)}) VALUES (%s, %s, %s, %s, %s)", lot)
+                lot = []
+        if lot:
+            cursor.executemany(f"INSERT INTO {TABLE} (rowid, {', '.join(CHAMPS)}) VALUES (%s, %s, %s, %s, %s)", lot)
+
+
+def reindexer_texte_brut(apps, schema_editor):
+    reindexer(apps, schema_editor, racines=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courriers', '0012_import_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(reindexer, reindexer_texte_brut),
+    ]
@@ -0,0 +1,33 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:31
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courriers', '0013_recherche_racines'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='courrier',
+            name='courrier_svc_impute_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='courrier',
+            name='courrier_svc_actuel_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='courrier',
+            name='courrier_responsable_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='courrier',
+            name='courrier_ouverts_echeance_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='courrier',
+            name='courrier_a_imputer_idx',
+        ),
+    ]
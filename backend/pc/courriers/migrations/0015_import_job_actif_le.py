@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courriers', '0014_suppression_index_inutilises'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='importjob',
+            name='actif_le',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+    ]
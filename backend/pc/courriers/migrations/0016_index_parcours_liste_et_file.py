@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:50
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_initial'),
+        ('courriers', '0015_import_job_actif_le'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='courrier',
+            name='courrier_co_statut_c6afd0_idx',
+        ),
+        # Index couvrant créé avant de retirer l'index simple de la clé étrangère
+        migrations.AddIndex(
+            model_name='courrieracces',
+            index=models.Index(fields=['courrier', 'service', 'user'], name='courrier_acces_perimetre_idx'),
+        ),
+        migrations.AlterField(
+            model_name='courrieracces',
+            name='courrier',
+            field=models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='acces', to='courriers.courrier'),
+        ),
+        migrations.AddIndex(
+            model_name='courrier',
+            index=models.Index(fields=['date_echeance', 'statut'], name='courrier_echeance_statut_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='courrier',
+            index=models.Index(condition=models.Q(('archived', False), models.Q(('statut', 'recu'), ('service_impute__isnull', True), _connector='OR')), fields=['-created_at', '-id'], name='courrier_a_imputer_idx'),
+        ),
+    ]
@@ -4,7 +4,9 @@ from core.models import Category, Service
 from django.core.cache import cache
 from django.utils import timezone
 from datetime import timedelta
-from django.db.models import Count, Q
+from django.db.models import BooleanField, Case, Count, F, Q, Value, When
+from django.db.models.functions import Coalesce
+from core.expressions import JoursEntre
 
 
 class TypeCourrier(models.TextChoices):
@@ -20,12 +22,47 @@ class StatusCourrier(models.TextChoices):
     REPONDU = 'repondu', 'Répondu'
     ARCHIVE = 'archive', 'Archivé'
 
+# Statuts d'un courrier non clôturé (file de traitement, retards)
+STATUTS_EN_COURS = ['recu', 'impute', 'traitement']
+# File d'imputation (ImputationDashboardViewSet), condition de l'index courrier_a_imputer_idx
+A_IMPUTER = Q(archived=False) & (Q(statut='recu') | Q(service_impute__isnull=True))
+
+
 class PriorityLevel(models.TextChoices):
     BASSE = 'basse', 'Basse'
     NORMALE = 'normale', 'Normale'
     HAUTE = 'haute', 'Haute'
     URGENTE = 'urgente', 'Urgente'
 
+class CourrierQuerySet(models.QuerySet):
+
+    @staticmethod
+    def annotations_echeances(aujourd_hui=None):
+        """
+        Champs dérivés des dates, calculés en SQL (filtrables et triables) :
+        - jours_restants : jours avant l'échéance (négatif si dépassée, NULL sans échéance)
+        - est_en_retard : échéance dépassée et courrier encore en cours
+        - delai_traitement : jours entre la réception et la clôture (ou aujourd'hui)
+        """
+        aujourd_hui = Value(aujourd_hui or timezone.localdate(), output_field=models.DateField())
+        return {
+            'jours_restants': JoursEntre(aujourd_hui, F('date_echeance')),
+            'est_en_retard': Case(
+                When(Q(date_echeance__lt=aujourd_hui, statut__in=STATUTS_EN_COURS), then=True),
+                default=False,
+                output_field=BooleanField(),
+            ),
+            'delai_traitement': JoursEntre(F('date_reception'), Coalesce(F('date_cloture'), aujourd_hui)),
+        }
+
+    def with_deadlines(self, aujourd_hui=None):
+        return self.annotate(**self.annotations_echeances(aujourd_hui))
+
+    def en_retard(self, aujourd_hui=None):
+        """Même critère que est_en_retard, sur les colonnes (index statut, date_echeance)"""
+        return self.filter(date_echeance__lt=aujourd_hui or timezone.localdate(), statut__in=STATUTS_EN_COURS)
+
+
 class Courrier(models.Model):
     # Champs pour l'IA
     meta_analyse = models.JSONField(default=dict, blank=True, null=True)  # Stocke l'analyse Gemini
@@ -113,15 +150,24 @@ class Courrier(models.Model):
         related_name='courriers_encours'
     )
 
+    objects = CourrierQuerySet.as_manager()
+
     class Meta:
         db_table = 'courrier_courrier'
         verbose_name = "Courrier"
         verbose_name_plural = "Courriers"
         indexes = [
             models.Index(fields=['reference']),
-            models.Index(fields=['statut']),
-            models.Index(fields=['created_at']),
+            models.Index(fields=['created_at', 'id']),  # pagination par curseur
             models.Index(fields=['priorite']),
+            # Retards (échéance dépassée, statut en cours). Pas d'index menant par statut, qui
+            # ferait préférer un MULTI-INDEX OR + tri à la file d'imputation ; pas d'index partiel
+            # sur statut IN (...), qu'SQLite n'applique pas à des valeurs passées en paramètres
+            models.Index(fields=['date_echeance', 'statut'], name='courrier_echeance_statut_idx'),
+            # File d'imputation, dans l'ordre de la pagination
+            models.Index(fields=['-created_at', '-id'], condition=A_IMPUTER, name='courrier_a_imputer_idx'),
+            # Dashboard : période de réception par type
+            models.Index(fields=['date_reception', 'type'], condition=Q(archived=False), name='courrier_reception_idx'),
         ]
 
     def __str__(self):
@@ -129,6 +175,7 @@ class Courrier(models.Model):
 class PieceJointe(models.Model):
     courrier = models.ForeignKey(Courrier, on_delete=models.CASCADE, related_name='pieces_jointes')
     fichier = models.FileField(upload_to='courriers/pieces/')
+    taille = models.PositiveBigIntegerField(null=True, blank=True)  # octets, évite un stat() par lecture
     description = models.CharField(max_length=255, blank=True, null=True)
     uploaded_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
     uploaded_at = models.DateTimeField(auto_now_add=True)
@@ -137,10 +184,21 @@ class PieceJointe(models.Model):
         db_table = 'courrier_piecejointe'
         verbose_name = "Pièce jointe"
         verbose_name_plural = "Pièces jointes"
+        indexes = [
+            models.Index(fields=['uploaded_at', 'id']),
+        ]
 
     def __str__(self):
         return f"PJ - {self.courrier.reference}"
 
+    def save(self, *args, **kwargs):
+        if self.fichier and self.taille is None:
+            try:
+                self.taille = self.fichier.size
+            except OSError:
+                pass
+        super().save(*args, **kwargs)
+
 
 class Imputation(models.Model):
     courrier = models.ForeignKey(Courrier, on_delete=models.CASCADE, related_name='imputations')
@@ -155,11 +213,47 @@ class Imputation(models.Model):
         db_table = 'courrier_imputation'
         verbose_name = "Imputation"
         verbose_name_plural = "Imputations"
+        indexes = [
+            models.Index(fields=['date_imputation', 'id']),
+        ]
 
     def __str__(self):
         return f"Imputation {self.courrier.reference} -> {self.service and self.service.nom}"
 
 
+class CourrierAcces(models.Model):
+    """
+    Visibilité matérialisée d'un courrier : une ligne par service ou utilisateur
+    qui y a accès (maintenue par courriers/signals.py, voir services/acces.py).
+    """
+    MOTIF_CHOICES = [
+        ('service', 'Service imputé / actuel'),
+        ('concerne', 'Service concerné (imputation)'),
+        ('responsable', 'Responsable actuel'),
+        ('createur', 'Créateur'),
+    ]
+
+    # Index couvrants (courrier, service, user), (service, courrier) et (user, courrier) ci-dessous
+    courrier = models.ForeignKey(Courrier, on_delete=models.CASCADE, related_name='acces', db_index=False)
+    service = models.ForeignKey(Service, on_delete=models.CASCADE, null=True, blank=True, db_index=False)
+    user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.CASCADE, null=True, blank=True, db_index=False)
+    motif = models.CharField(max_length=20, choices=MOTIF_CHOICES)
+
+    class Meta:
+        db_table = 'courrier_acces'
+        verbose_name = "Accès courrier"
+        verbose_name_plural = "Accès courriers"
+        indexes = [
+            # Liste filtrée par EXISTS, parcourue dans l'ordre (created_at, id) : sondage par courrier
+            models.Index(fields=['courrier', 'service', 'user'], name='courrier_acces_perimetre_idx'),
+            models.Index(fields=['service', 'courrier']),
+            models.Index(fields=['user', 'courrier']),
+        ]
+
+    def __str__(self):
+        return f"{self.courrier_id} -> {self.service_id or self.user_id} ({self.motif})"
+
+
 class ActionHistorique(models.Model):
     courrier = models.ForeignKey(Courrier, on_delete=models.CASCADE, related_name='historiques')
     user = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
@@ -173,6 +267,9 @@ class ActionHistorique(models.Model):
         db_table = 'courrier_historique'
         verbose_name = "Historique action"
         verbose_name_plural = "Historique actions"
+        indexes = [
+            models.Index(fields=['courrier', 'date', 'id']),
+        ]
 
     def __str__(self):
         return f"{self.date} - {self.action}"
@@ -205,6 +302,62 @@ class ModeleCourrier(models.Model):
         return self.nom
     
 
+class ImportJob(models.Model):
+    """Import de courriers en arrière-plan (voir courriers/services/import_courriers.py)"""
+    STATUT_CHOICES = [
+        ('en_attente', 'En attente'),
+        ('en_cours', 'En cours'),
+        ('termine', 'Terminé'),
+        ('echec', 'Échec'),
+    ]
+
+    fichier = models.FileField(upload_to='imports/%Y/%m/')
+    nom_fichier = models.CharField(max_length=255)
+    type_courrier = models.CharField(max_length=20, choices=TypeCourrier.choices)
+    mapping = models.JSONField(default=dict, blank=True)
+
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='en_attente')
+    total_estime = models.PositiveIntegerField(null=True, blank=True)  # lignes de données du fichier
+    lignes_traitees = models.PositiveIntegerField(default=0)
+    importes = models.PositiveIntegerField(default=0)
+    nb_erreurs = models.PositiveIntegerField(default=0)
+    erreurs = models.JSONField(default=list, blank=True)  # [{'ligne': 12, 'erreurs': {'champ': [...]}}]
+    message = models.TextField(blank=True, default='')
+
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True, related_name='imports_courriers')
+    created_at = models.DateTimeField(auto_now_add=True)
+    demarre_le = models.DateTimeField(null=True, blank=True)
+    actif_le = models.DateTimeField(null=True, blank=True)  # dernier lot validé (reprise d'un import interrompu)
+    termine_le = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        db_table = 'courrier_import_job'
+        verbose_name = "Import de courriers"
+        verbose_name_plural = "Imports de courriers"
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['statut', 'created_at']),
+        ]
+
+    def __str__(self):
+        return f"Import {self.nom_fichier} ({self.get_statut_display()})"
+
+    @property
+    def est_interrompu(self):
+        """En cours sans activité depuis COURRIER_IMPORT_DELAI_MAX secondes"""
+        delai = timedelta(seconds=getattr(settings, 'COURRIER_IMPORT_DELAI_MAX', 900))
+        return self.statut == 'en_cours' and self.actif_le is not None and self.actif_le < timezone.now() - delai
+
+    @property
+    def progression(self):
+        """Pourcentage de lignes traitées"""
+        if self.statut == 'termine':
+            return 100
+        if not self.total_estime:
+            return 0
+        return min(99, round(self.lignes_traitees / self.total_estime * 100))
+
+
 class CourrierService:
     @staticmethod
     def get_courrier_stats(service_id):
@@ -1,11 +1,75 @@
 # courriers/permissions.py
 from rest_framework import permissions
-from django.db.models import Q
+from django.db.models import Exists, OuterRef, Q
+
+
+class PolitiqueAcces:
+    """
+    Politique unique de visibilité des courriers, compilée en un filtre SQL.
+
+    - administrateur / superutilisateur : tous les courriers
+    - direction : courriers non confidentiels
+    - archiviste : courriers archivés
+    - agent courrier : tous les courriers, en lecture seule
+    - sinon : courriers présents dans CourrierAcces pour l'utilisateur
+      (responsable, créateur) ou pour ses services (service de rattachement
+      et services qu'il dirige)
+
+    Le même filtre sert aux listes (get_queryset) et aux contrôles objet.
+    """
+
+    def acces_complet(self, user):
+        return user.is_superuser or getattr(user, 'role', None) == 'admin'
+
+    def filtre_services(self, user):
+        """Service de rattachement + services dirigés par l'utilisateur"""
+        from core.models import Service
+        filtre = Q(service__in=Service.objects.filter(chef=user).values('pk'))
+        if user.service_id:
+            filtre |= Q(service_id=user.service_id)
+        return filtre
+
+    def filtre(self, user, lecture=True):
+        """Q à appliquer sur un queryset de Courrier (None = aucun filtre)."""
+        if not user.is_authenticated:
+            return Q(pk__in=[])
+        if self.acces_complet(user):
+            return None
+        if lecture and user.role == 'agent_courrier':
+            return None
+
+        # EXISTS corrélé plutôt que pk IN (...) : la liste est lue dans l'ordre de
+        # l'index (created_at, id) et s'arrête à la page, sans tri temporaire
+        from courriers.models import CourrierAcces
+        acces = CourrierAcces.objects.filter(
+            Q(user=user) | self.filtre_services(user), courrier=OuterRef('pk')
+        )
+
+        filtre = Q(Exists(acces))
+        if user.role == 'direction':
+            filtre |= Q(confidentialite__in=['normale', 'restreinte'])
+        elif user.role == 'archiviste':
+            filtre |= Q(archived=True)
+        return filtre
+
+    def filtrer(self, queryset, user, lecture=True):
+        filtre = self.filtre(user, lecture)
+        return queryset if filtre is None else queryset.filter(filtre)
+
+    def peut_acceder(self, user, courrier, lecture=True):
+        filtre = self.filtre(user, lecture)
+        if filtre is None:
+            return True
+        from courriers.models import Courrier
+        return Courrier.objects.filter(filtre, pk=courrier.pk).exists()
+
+
+politique_acces = PolitiqueAcces()
 
 
 class CourrierPermissions(permissions.BasePermission):
     """
-    Permissions personnalisées pour les courriers
+    Permissions personnalisées pour les courriers (voir PolitiqueAcces)
     """
     
     def has_permission(self, request, view):
@@ -18,57 +82,11 @@ class CourrierPermissions(permissions.BasePermission):
         """
         Vérifie si l'utilisateur a accès à un courrier spécifique
         """
-        # 0. Vérifier si l'utilisateur est authentifié
         if not request.user.is_authenticated:
             return False
-        
-        # 1. Administrateur système - accès total
-        if request.user.role == 'admin' or request.user.is_superuser:
-            return True
-        
-        # 2. Direction - peut voir tous les courriers non confidentiels
-        if request.user.role == 'direction':
-            if obj.confidentialite in ['normale', 'restreinte']:
-                return True
-        
-        # 3. Archiviste - peut voir tous les courriers archivés
-        if request.user.role == 'archiviste':
-            if obj.archived:
-                return True
-        
-        # 4. Le courrier est imputé au service de l'utilisateur
-        if obj.service_actuel == request.user.service:
-            return True
-        
-        # 5. L'utilisateur est responsable du service imputé
-        if (obj.service_actuel and 
-            obj.service_actuel.chef and 
-            request.user == obj.service_actuel.chef):
-            return True
-        
-        # 6. L'utilisateur est responsable actuel du courrier
-        if obj.responsable_actuel == request.user:
-            return True
-        
-        # 7. Le courrier n'est pas confidentiel ET l'utilisateur est dans un service concerné
-        if obj.confidentialite == 'normale':
-            # Vérifier si l'utilisateur fait partie des services concernés
-            # (nécessite d'implémenter services_concernes() dans le modèle)
-            services_concernes = obj.services_concernes() if hasattr(obj, 'services_concernes') else []
-            if request.user.service in services_concernes:
-                return True
-        
-        # 8. L'utilisateur a créé le courrier
-        if obj.created_by == request.user:
-            return True
-        
-        # 9. Accès en lecture seule pour certains rôles
-        if request.method in permissions.SAFE_METHODS:  # GET, HEAD, OPTIONS
-            # Secrétariat/Guichet peut voir tous les courriers en lecture
-            if request.user.role == 'agent_courrier':
-                return True
-        
-        return False
+        return politique_acces.peut_acceder(
+            request.user, obj, lecture=request.method in permissions.SAFE_METHODS
+        )
 
 
 class CourrierCreatePermissions(permissions.BasePermission):
@@ -1,11 +1,19 @@
+import json
+
 from rest_framework import serializers
+from rest_framework.reverse import reverse
+from django.db.models import Count, F, IntegerField, OuterRef, Prefetch, Subquery
+from django.db.models.functions import Coalesce
 from django.utils import timezone
 from datetime import datetime
 from .models import (
-    Courrier, PieceJointe, Imputation, ActionHistorique,
-    ModeleCourrier, TypeCourrier, StatusCourrier, PriorityLevel
+    Courrier, CourrierQuerySet, PieceJointe, Imputation, ActionHistorique,
+    ModeleCourrier, ImportJob, TypeCourrier, StatusCourrier, PriorityLevel, STATUTS_EN_COURS
 )
+from .services.export_courriers import colonnes_disponibles
+from core.projection import Besoin, ProjectionSerializerMixin
 from core.serializers import ServiceSerializer, CategorySerializer, MiniUserSerializer
+from workflow.models import WorkflowStep
 from users.serializers import UserSerializer
 
 
@@ -36,6 +44,8 @@ class PieceJointeSerializer(serializers.ModelSerializer):
         return None
     
     def get_fichier_taille(self, obj):
+        if obj.taille is not None:
+            return obj.taille
         if obj.fichier:
             try:
                 return obj.fichier.size
@@ -73,7 +83,51 @@ class ActionHistoriqueSerializer(serializers.ModelSerializer):
         read_only_fields = ['date']
 
 
-class CourrierListSerializer(serializers.ModelSerializer):
+ICONES_PRIORITE = {
+    'urgente': '🔥',
+    'haute': '⚠️',
+    'normale': '📄',
+    'basse': '📋'
+}
+
+
+# Calcul Python des champs d'échéance, pour une instance non annotée (ex: après création)
+_ECHEANCES_PYTHON = {
+    'jours_restants': lambda obj, aujourd_hui: (
+        (obj.date_echeance - aujourd_hui).days if obj.date_echeance else None
+    ),
+    'est_en_retard': lambda obj, aujourd_hui: bool(
+        obj.date_echeance and obj.date_echeance < aujourd_hui and obj.statut in STATUTS_EN_COURS
+    ),
+    'delai_traitement': lambda obj, aujourd_hui: (
+        ((obj.date_cloture or aujourd_hui) - obj.date_reception).days if obj.date_reception else None
+    ),
+}
+
+
+def echeance(obj, nom):
+    """Valeur annotée par Courrier.objects.with_deadlines(), sinon calculée en Python"""
+    if hasattr(obj, nom):
+        return getattr(obj, nom)
+    return _ECHEANCES_PYTHON[nom](obj, timezone.localdate())
+
+
+def besoins_echeances(*noms):
+    """Besoins de projection des champs d'échéance : les annotations SQL correspondantes"""
+    annotations = CourrierQuerySet.annotations_echeances()
+    return {nom: Besoin(annotations={nom: annotations[nom]}) for nom in noms}
+
+
+def initiales_expediteur(nom):
+    if nom:
+        mots = nom.split()
+        if len(mots) >= 2:
+            return f"{mots[0][0]}{mots[1][0]}".upper()
+        return nom[0:2].upper()
+    return "??"
+
+
+class CourrierListSerializer(ProjectionSerializerMixin, serializers.ModelSerializer):
     """Serializer pour la liste (allégé)"""
     category_nom = serializers.CharField(source='category.name', read_only=True)
     service_impute_nom = serializers.CharField(source='service_impute.nom', read_only=True)
@@ -92,36 +146,92 @@ class CourrierListSerializer(serializers.ModelSerializer):
             'jours_restants', 'est_en_retard', 'created_at'
         ]
     
+    @classmethod
+    def projection(cls):
+        """Colonnes lues par les champs calculés (contenu_texte, meta_analyse... restent en base)"""
+        return {
+            'expediteur_initiale': Besoin(colonnes=('expediteur_nom',)),
+            'priorite_icone': Besoin(colonnes=('priorite',)),
+            **besoins_echeances('jours_restants', 'est_en_retard'),
+        }
+    
     def get_expediteur_initiale(self, obj):
-        if obj.expediteur_nom:
-            mots = obj.expediteur_nom.split()
-            if len(mots) >= 2:
-                return f"{mots[0][0]}{mots[1][0]}".upper()
-            return obj.expediteur_nom[0:2].upper()
-        return "??"
+        return initiales_expediteur(obj.expediteur_nom)
     
     def get_jours_restants(self, obj):
-        if obj.date_echeance:
-            delta = obj.date_echeance - timezone.now().date()
-            return max(0, delta.days)
-        return None
+        jours = echeance(obj, 'jours_restants')
+        return max(0, jours) if jours is not None else None
     
     def get_est_en_retard(self, obj):
-        if obj.date_echeance and obj.statut not in ['repondu', 'archive']:
-            return obj.date_echeance < timezone.now().date()
-        return False
+        return echeance(obj, 'est_en_retard')
     
     def get_priorite_icone(self, obj):
-        icones = {
-            'urgente': '🔥',
-            'haute': '⚠️',
-            'normale': '📄',
-            'basse': '📋'
-        }
-        return icones.get(obj.priorite, '📄')
+        return ICONES_PRIORITE.get(obj.priorite, '📄')
+
 
+class CourrierListeRapide:
+    """
+    Chemin rapide, en lecture seule, de CourrierListSerializer pour les listes :
+    les lignes sont lues par values() et les champs dérivés (jours restants,
+    retard : with_deadlines() ; noms liés) calculés en SQL ; seuls les formats,
+    les initiales et le plancher à 0 des jours restants restent en Python.
+    Sortie identique octet pour octet au serializer (vérifié dans
+    courriers/tests.py).
+    """
+    CHAMPS = CourrierListSerializer.Meta.fields
+    COLONNES = (
+        'id', 'reference', 'type', 'objet', 'expediteur_nom', 'date_reception', 'date_echeance',
+        'statut', 'priorite', 'confidentialite', 'category', 'service_impute', 'created_at',
+    )
+    
+    _date = serializers.DateField()
+    _date_heure = serializers.DateTimeField()
+    
+    @classmethod
+    def valeurs(cls, queryset):
+        """Queryset de dicts prêts à sérialiser (ordre et filtres conservés)"""
+        return queryset.with_deadlines().values(
+            *cls.COLONNES,
+            'jours_restants', 'est_en_retard',
+            category_nom=F('category__name'),
+            service_impute_nom=F('service_impute__nom'),
+        )
+    
+    @classmethod
+    def serialiser(cls, lignes):
+        date, date_heure = cls._date.to_representation, cls._date_heure.to_representation
+        resultats = []
+        for ligne in lignes:
+            donnees = {
+                'id': ligne['id'],
+                'reference': ligne['reference'],
+                'type': ligne['type'],
+                'objet': ligne['objet'],
+                'expediteur_nom': ligne['expediteur_nom'],
+                'expediteur_initiale': initiales_expediteur(ligne['expediteur_nom']),
+                'date_reception': date(ligne['date_reception']),
+                'date_echeance': date(ligne['date_echeance']),
+                'statut': ligne['statut'],
+                'priorite': ligne['priorite'],
+                'priorite_icone': ICONES_PRIORITE.get(ligne['priorite'], '📄'),
+                'confidentialite': ligne['confidentialite'],
+                'category': ligne['category'],
+            }
+            # Comme le serializer : champ 'relation.nom' absent si la relation est nulle
+            if ligne['category'] is not None:
+                donnees['category_nom'] = ligne['category_nom']
+            donnees['service_impute'] = ligne['service_impute']
+            if ligne['service_impute'] is not None:
+                donnees['service_impute_nom'] = ligne['service_impute_nom']
+            jours = ligne['jours_restants']
+            donnees['jours_restants'] = max(0, jours) if jours is not None else None
+            donnees['est_en_retard'] = ligne['est_en_retard']
+            donnees['created_at'] = date_heure(ligne['created_at'])
+            resultats.append(donnees)
+        return resultats
 
-class CourrierDetailSerializer(serializers.ModelSerializer):
+
+class CourrierDetailSerializer(ProjectionSerializerMixin, serializers.ModelSerializer):
     """Serializer détaillé pour un courrier"""
     # Relations directes
     category_detail = CategorySerializer(source='category', read_only=True)
@@ -140,7 +250,9 @@ class CourrierDetailSerializer(serializers.ModelSerializer):
     # Relations inverses
     pieces_jointes = PieceJointeSerializer(many=True, read_only=True)
     imputations = ImputationSerializer(many=True, read_only=True)
-    historiques = ActionHistoriqueSerializer(many=True, read_only=True)
+    historiques = serializers.SerializerMethodField()  # HISTORIQUE_LIMITE dernières actions
+    historiques_total = serializers.SerializerMethodField()
+    historiques_url = serializers.SerializerMethodField()
     
     # Calculs
     jours_restants = serializers.SerializerMethodField()
@@ -158,6 +270,13 @@ class CourrierDetailSerializer(serializers.ModelSerializer):
     workflow_existe = serializers.SerializerMethodField()
     workflow_statut = serializers.SerializerMethodField()
     
+    HISTORIQUE_LIMITE = 20
+    CHAMPS_EXTENSIBLES = (
+        'category_detail', 'service_impute_detail', 'service_actuel_detail',
+        'responsable_actuel_detail', 'created_by_detail',
+        'pieces_jointes', 'imputations', 'historiques',
+    )
+    
     class Meta:
         model = Courrier
         fields = [
@@ -198,7 +317,7 @@ class CourrierDetailSerializer(serializers.ModelSerializer):
             'workflow_existe', 'workflow_statut',
             
             # Relations
-            'pieces_jointes', 'imputations', 'historiques',
+            'pieces_jointes', 'imputations', 'historiques', 'historiques_total', 'historiques_url',
             'type', 'objet', 'priorite', 'confidentialite',
             'date_reception', 'expediteur_nom', 'expediteur_adresse',
             'expediteur_email', 'destinataire_nom', 'canal',
@@ -241,6 +360,11 @@ class CourrierDetailSerializer(serializers.ModelSerializer):
             }
             courrier.save(update_fields=['meta_analyse'])
             
+            # Normaliser l'analyse dans IAResult (colonnes indexées, relues par le dashboard)
+            if 'classification' in ia_suggestions_data:
+                from ia.services.classifier import classification_cascade
+                classification_cascade.enregistrer(courrier, ia_suggestions_data)
+            
             # Journaliser l'acceptation IA
             ActionHistorique.objects.create(
                 courrier=courrier,
@@ -255,34 +379,83 @@ class CourrierDetailSerializer(serializers.ModelSerializer):
         
         return courrier   
     
+    @classmethod
+    def projection(cls):
+        """
+        Besoins des champs calculés et imbriqués : jointures des FK, Prefetch
+        des collections (historique tronqué aux HISTORIQUE_LIMITE dernières
+        actions), comptes annotés. Nombre de requêtes fixe.
+        """
+        nb_historiques = ActionHistorique.objects.filter(courrier=OuterRef('pk')).order_by().values('courrier')
+        nb_etapes = WorkflowStep.objects.filter(workflow__courrier=OuterRef('pk')).order_by().values('workflow')
+        return {
+            'service_impute_detail': Besoin(colonnes=('service_impute',), select_related=('service_impute__chef',)),
+            'service_actuel_detail': Besoin(colonnes=('service_actuel',), select_related=('service_actuel__chef',)),
+            'pieces_jointes': Besoin(prefetch_related=(
+                Prefetch('pieces_jointes', queryset=PieceJointe.objects.select_related('uploaded_by').order_by('-uploaded_at')),
+            )),
+            # Les lignes imbriquées relisent courrier.reference / objet sur l'instance parente
+            'imputations': Besoin(colonnes=('reference', 'objet'), prefetch_related=(
+                Prefetch('imputations', queryset=Imputation.objects.select_related('service__chef', 'responsable').order_by('-date_imputation')),
+            )),
+            'historiques': Besoin(colonnes=('reference',), prefetch_related=(
+                Prefetch(
+                    'historiques',
+                    queryset=ActionHistorique.objects.select_related('user').order_by('-date')[:cls.HISTORIQUE_LIMITE],
+                    to_attr='historiques_recents',
+                ),
+            )),
+            'historiques_total': Besoin(annotations={
+                'nb_historiques': Coalesce(Subquery(nb_historiques.annotate(n=Count('id')).values('n'), output_field=IntegerField()), 0),
+            }),
+            'historiques_url': Besoin(),
+            **besoins_echeances('jours_restants', 'est_en_retard', 'delai_traitement'),
+            'workflow_existe': Besoin(select_related=('workflow',)),
+            'workflow_statut': Besoin(select_related=('workflow',), annotations={
+                'nb_etapes_workflow': Coalesce(Subquery(nb_etapes.annotate(n=Count('id')).values('n'), output_field=IntegerField()), 0),
+            }),
+            # Champs d'écriture sans attribut sur le modèle (ignorés en lecture)
+            'ia_suggestions_data': Besoin(),
+            'user_modifications': Besoin(),
+        }
+    
     def get_jours_restants(self, obj):
-        if obj.date_echeance:
-            delta = obj.date_echeance - timezone.now().date()
-            return delta.days
-        return None
+        return echeance(obj, 'jours_restants')
     
     def get_est_en_retard(self, obj):
-        if obj.date_echeance and obj.statut not in ['repondu', 'archive']:
-            return obj.date_echeance < timezone.now().date()
-        return False
+        return echeance(obj, 'est_en_retard')
     
     def get_delai_traitement(self, obj):
-        if obj.date_reception and obj.date_cloture:
-            return (obj.date_cloture - obj.date_reception).days
-        elif obj.date_reception:
-            return (timezone.now().date() - obj.date_reception).days
-        return None
+        return echeance(obj, 'delai_traitement')
     
     def get_workflow_existe(self, obj):
         return hasattr(obj, 'workflow') and obj.workflow is not None
     
     def get_workflow_statut(self, obj):
         if hasattr(obj, 'workflow'):
+            total_steps = getattr(obj, 'nb_etapes_workflow', None)
+            if total_steps is None:
+                total_steps = obj.workflow.steps.count()
             return {
                 'current_step': obj.workflow.current_step,
-                'total_steps': obj.workflow.steps.count() if hasattr(obj.workflow, 'steps') else 0
+                'total_steps': total_steps
             }
         return None
+    
+    def get_historiques(self, obj):
+        historiques = getattr(obj, 'historiques_recents', None)
+        if historiques is None:
+            historiques = obj.historiques.select_related('user').order_by('-date')[:self.HISTORIQUE_LIMITE]
+        return ActionHistoriqueSerializer(historiques, many=True, context=self.context).data
+    
+    def get_historiques_total(self, obj):
+        total = getattr(obj, 'nb_historiques', None)
+        return total if total is not None else obj.historiques.count()
+    
+    def get_historiques_url(self, obj):
+        if not obj.pk:
+            return None
+        return reverse('courrier-historique', args=[obj.pk], request=self.context.get('request'))
 
 
 class CourrierCreateSerializer(serializers.ModelSerializer):
@@ -418,9 +591,30 @@ class ImportCourrierSerializer(serializers.Serializer):
     )
 
 
+class ImportJobSerializer(serializers.ModelSerializer):
+    """Suivi d'un import en arrière-plan (sans le détail des erreurs, voir /erreurs/)"""
+    progression = serializers.IntegerField(read_only=True)
+    created_by_detail = MiniUserSerializer(source='created_by', read_only=True)
+    url_erreurs = serializers.SerializerMethodField()
+
+    class Meta:
+        model = ImportJob
+        fields = [
+            'id', 'nom_fichier', 'type_courrier', 'statut', 'progression',
+            'total_estime', 'lignes_traitees', 'importes', 'nb_erreurs', 'message',
+            'created_by', 'created_by_detail', 'created_at', 'demarre_le', 'termine_le', 'url_erreurs',
+        ]
+        read_only_fields = fields
+
+    def get_url_erreurs(self, obj):
+        if not obj.nb_erreurs:
+            return None
+        return reverse('importjob-erreurs', args=[obj.pk], request=self.context.get('request'))
+
+
 class ExportCourrierSerializer(serializers.Serializer):
     """Serializer pour l'export de courriers"""
-    format = serializers.ChoiceField(choices=['csv', 'excel', 'pdf', 'json'])
+    format = serializers.ChoiceField(choices=['csv', 'excel', 'pdf', 'json', 'ndjson'])
     periode_debut = serializers.DateField(required=False)
     periode_fin = serializers.DateField(required=False)
     type_courrier = serializers.ChoiceField(
@@ -432,4 +626,13 @@ class ExportCourrierSerializer(serializers.Serializer):
         default=['reference', 'objet', 'expediteur_nom', 'date_reception', 'statut']
     )
 
+    def validate_colonnes(self, value):
+        if not value:
+            raise serializers.ValidationError("Au moins une colonne est requise")
+        disponibles = set(colonnes_disponibles())
+        inconnues = [colonne for colonne in value if colonne not in disponibles]
+        if inconnues:
+            raise serializers.ValidationError(f"Colonnes inconnues: {', '.join(inconnues)}")
+        return value
+
 # courriers/serializers.py
\ No newline at end of file
@@ -0,0 +1,97 @@
+# courriers/services/acces.py
+import logging
+
+from django.db import transaction
+
+logger = logging.getLogger(__name__)
+
+# Champs du courrier qui déterminent ses lignes d'accès
+CHAMPS_ACCES = {
+    'service_impute', 'service_impute_id', 'service_actuel', 'service_actuel_id',
+    'responsable_actuel', 'responsable_actuel_id', 'created_by', 'created_by_id',
+    'confidentialite',
+}
+
+
+def lignes_acces(courrier, services_imputes=()):
+    """
+    Lignes d'accès (service_id, user_id, motif) d'un courrier :
+    - services imputé et actuel, quelle que soit la confidentialité
+    - services des imputations, seulement pour un courrier 'normale'
+    - responsable actuel et créateur
+    """
+    lignes = set()
+    for service_id in (courrier.service_impute_id, courrier.service_actuel_id):
+        if service_id:
+            lignes.add((service_id, None, 'service'))
+
+    if courrier.confidentialite == 'normale':
+        for service_id in services_imputes:
+            if service_id and (service_id, None, 'service') not in lignes:
+                lignes.add((service_id, None, 'concerne'))
+
+    if courrier.responsable_actuel_id:
+        lignes.add((None, courrier.responsable_actuel_id, 'responsable'))
+    if courrier.created_by_id:
+        lignes.add((None, courrier.created_by_id, 'createur'))
+    return lignes
+
+
+def synchroniser_acces(courrier_ids, taille_lot=500):
+    """
+    Recalcule les lignes CourrierAcces des courriers donnés ; un courrier
+    dont les lignes n'ont pas changé n'est pas réécrit (une lecture par lot).
+    Retourne le nombre de lignes créées.
+    """
+    from courriers.models import Courrier, CourrierAcces, Imputation
+
+    courrier_ids = list(courrier_ids)
+    total = 0
+    for debut in range(0, len(courrier_ids), taille_lot):
+        lot = courrier_ids[debut:debut + taille_lot]
+        courriers = Courrier.objects.filter(pk__in=lot).only(
+            'id', 'service_impute', 'service_actuel', 'responsable_actuel', 'created_by', 'confidentialite'
+        )
+
+        services_imputes = {}
+        for courrier_id, service_id in Imputation.objects.filter(
+            courrier_id__in=lot, service__isnull=False
+        ).values_list('courrier_id', 'service_id'):
+            services_imputes.setdefault(courrier_id, set()).add(service_id)
+
+        existantes = {}
+        for courrier_id, *ligne in CourrierAcces.objects.filter(courrier_id__in=lot).values_list(
+            'courrier_id', 'service_id', 'user_id', 'motif'
+        ):
+            existantes.setdefault(courrier_id, set()).add(tuple(ligne))
+
+        # Seuls les courriers dont les lignes changent sont réécrits
+        attendues = {
+            courrier.pk: lignes_acces(courrier, services_imputes.get(courrier.pk, ()))
+            for courrier in courriers
+        }
+        modifies = [pk for pk in lot if attendues.get(pk, set()) != existantes.get(pk, set())]
+        if not modifies:
+            continue
+
+        nouvelles = [
+            CourrierAcces(courrier_id=pk, service_id=service_id, user_id=user_id, motif=motif)
+            for pk in modifies
+            for service_id, user_id, motif in attendues.get(pk, ())
+        ]
+        with transaction.atomic():
+            CourrierAcces.objects.filter(courrier_id__in=modifies).delete()
+            CourrierAcces.objects.bulk_create(nouvelles)
+        total += len(nouvelles)
+
+    return total
+
+
+def reconstruire_acces(taille_lot=500):
+    """Reconstruit toute la table CourrierAcces."""
+    from courriers.models import Courrier
+
+    return synchroniser_acces(
+        Courrier.objects.order_by('pk').values_list('pk', flat=True).iterator(chunk_size=taille_lot),
+        taille_lot=taille_lot,
+    )
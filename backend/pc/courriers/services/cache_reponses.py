@@ -0,0 +1,92 @@
+# courriers/services/cache_reponses.py
+import hashlib
+import logging
+from datetime import datetime, time
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+
+class CacheReponses:
+    """
+    Validateurs HTTP (ETag / Last-Modified) et cache par utilisateur des
+    représentations sérialisées des courriers.
+
+    La version d'un courrier est sa colonne `updated_at` : les écritures sur
+    les lignes liées (imputations, pièces jointes, historique, workflow,
+    résultat IA) la font avancer via `toucher()` (signaux de courriers/signals.py).
+    Les clés de cache sont versionnées, une écriture rend donc l'ancienne
+    entrée inatteignable sans suppression explicite.
+
+    La représentation dépend aussi :
+    - de la date du jour (jours_restants, est_en_retard) ;
+    - des référentiels affichés (noms de services, catégories, utilisateurs),
+      suivis par une génération globale remise à jour par les signaux.
+    """
+
+    PREFIXE = 'courriers:reponse'
+    CLE_GENERATION = 'courriers:referentiels'
+
+    @property
+    def duree(self):
+        return getattr(settings, 'COURRIER_CACHE_REPONSES_DUREE', 300)
+
+    # ------------------------------------------------------------------
+    # Versions
+    # ------------------------------------------------------------------
+    def toucher(self, **filtre):
+        """Fait avancer updated_at des courriers désignés (ex: pk=12, workflow__id=3)."""
+        from courriers.models import Courrier
+        return Courrier.objects.filter(**filtre).update(updated_at=timezone.now())
+
+    def generation(self):
+        """Horodatage (epoch) du dernier changement de référentiel"""
+        return cache.get_or_set(self.CLE_GENERATION, 0, timeout=None)
+
+    def invalider_referentiels(self):
+        cache.set(self.CLE_GENERATION, timezone.now().timestamp(), timeout=None)
+
+    def derniere_modification(self, updated_at):
+        """
+        Last-Modified effectif : le plus récent entre la modification du
+        courrier, le début du jour et le dernier changement de référentiel.
+        """
+        debut_jour = timezone.make_aware(datetime.combine(timezone.localdate(), time.min))
+        generation = datetime.fromtimestamp(self.generation(), tz=timezone.get_current_timezone())
+        return max(updated_at, debut_jour, generation)
+
+    # ------------------------------------------------------------------
+    # ETag et cache
+    # ------------------------------------------------------------------
+    def etag(self, request, *versions):
+        """ETag de la réponse à `request` pour ces versions (propre à l'utilisateur et à l'URL)"""
+        composantes = (
+            request.user.pk,
+            request.get_host(),
+            request.get_full_path(),
+            getattr(request, 'accepted_media_type', ''),
+            timezone.localdate().isoformat(),
+            self.generation(),
+            *versions,
+        )
+        empreinte = hashlib.sha1('|'.join(str(c) for c in composantes).encode()).hexdigest()
+        return f'"{empreinte}"'
+
+    def _cle(self, etag):
+        return f"{self.PREFIXE}:{etag.strip(chr(34))}"
+
+    def lire(self, etag):
+        return cache.get(self._cle(etag))
+
+    def ecrire(self, etag, data):
+        try:
+            cache.set(self._cle(etag), data, timeout=self.duree)
+        except Exception as e:  # un cache indisponible ne doit pas faire échouer la lecture
+            logger.warning(f"Cache des réponses courrier indisponible: {e}")
+
+
+# Instance globale
+cache_reponses = CacheReponses()
@@ -0,0 +1,131 @@
+# courriers/services/courrier_service.py
+import logging
+import os
+import tempfile
+from dataclasses import dataclass
+from typing import Optional
+
+from django.utils import timezone
+
+from core.services.resolution_noms import resolveur_categories, resolveur_services
+from ia.services.classifier import classification_cascade
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class CourrierApercu:
+    """
+    Courrier non enregistré, utilisé pour les analyses de prévisualisation.
+    Expose les mêmes attributs que Courrier pour les services d'analyse
+    (classifieurs, Gemini), sans jamais toucher la base de données.
+    """
+    objet: str = ''
+    contenu_texte: str = ''
+    expediteur_nom: str = ''
+    expediteur_email: str = ''
+    expediteur_telephone: str = ''
+    expediteur_adresse: str = ''
+    date_reception: Optional[str] = None
+    canal: str = 'physique'
+    confidentialite: str = 'normale'
+    priorite: str = 'normale'
+    type: str = 'entrant'
+    id: Optional[int] = None
+    reference: str = 'APERCU'
+
+    @classmethod
+    def depuis_requete(cls, data, texte_ocr=''):
+        return cls(
+            objet=data.get('objet', ''),
+            contenu_texte=texte_ocr,
+            expediteur_nom=data.get('expediteur_nom', ''),
+            expediteur_email=data.get('expediteur_email', ''),
+            expediteur_telephone=data.get('expediteur_telephone', ''),
+            expediteur_adresse=data.get('expediteur_adresse', ''),
+            date_reception=data.get('date_reception'),
+            canal=data.get('canal', 'physique'),
+            confidentialite=data.get('confidentialite', 'normale'),
+            priorite=data.get('priorite', 'normale'),
+        )
+
+
+def extraire_texte_fichiers(fichiers):
+    """OCR des fichiers uploadés (sans créer de PieceJointe)"""
+    from workflow.services.ocr import process_ocr
+
+    texte_ocr = ""
+    for fichier in fichiers:
+        tmp_path = None
+        try:
+            with tempfile.NamedTemporaryFile(delete=False, suffix=fichier.name) as tmp:
+                for chunk in fichier.chunks():
+                    tmp.write(chunk)
+                tmp_path = tmp.name
+
+            texte = process_ocr(tmp_path, None)
+            if texte:
+                texte_ocr += f"\n--- {fichier.name} ---\n{texte}\n"
+        except Exception as e:
+            logger.error(f"Erreur OCR fichier {fichier.name}: {e}")
+        finally:
+            if tmp_path:
+                os.unlink(tmp_path)
+
+    return texte_ocr
+
+
+def _suggestion_confidentialite(analyse):
+    mots_cles = analyse.get("mots_cles", "")
+    if isinstance(mots_cles, (list, tuple)):
+        mots_cles = " ".join(str(mot) for mot in mots_cles)
+    texte = f"{analyse.get('resume', '')} {mots_cles}".lower()
+
+    if "confidentiel" in texte:
+        return "confidentielle"
+    if "restreint" in texte:
+        return "restreinte"
+    return "normale"
+
+
+def analyser_apercu(data, fichiers=()):
+    """
+    Pipeline unique d'analyse de prévisualisation (analyze_ai / analyze_complete).
+    Le courrier reste en mémoire : aucune écriture en base.
+    """
+    ocr_applique = data.get('ocr') == 'true'
+    texte_ocr = extraire_texte_fichiers(fichiers) if ocr_applique else ""
+    courrier = CourrierApercu.depuis_requete(data, texte_ocr)
+
+    analyse_data = classification_cascade.classifier(courrier)
+    classification = analyse_data.get("classification", {})
+    priorite = analyse_data.get("priorite", {})
+    analyse = analyse_data.get("analyse", {})
+
+    categorie_nom = classification.get("categorie_suggeree")
+    service_nom = classification.get("service_suggere")
+
+    return {
+        "success": True,
+        "analyse": analyse,
+        "classification": {
+            "categorie_suggeree": categorie_nom,
+            "service_suggere": service_nom,
+            "categorie_id": classification.get("categorie_id") or resolveur_categories.resoudre(categorie_nom),
+            "service_id": classification.get("service_id") or resolveur_services.resoudre(service_nom),
+            "confiance_categorie": classification.get("confiance_categorie", 0),
+            "confiance_service": classification.get("confiance_service", 0),
+        },
+        "priorite": {
+            "niveau": priorite.get("niveau", "NORMALE"),
+            "raison": priorite.get("raison", ""),
+            "confiance": priorite.get("confiance", 0.8),
+        },
+        "confidentialite_suggestion": _suggestion_confidentialite(analyse),
+        "cascade": analyse_data.get("cascade", {}),
+        "metadata": {
+            "timestamp": timezone.now().isoformat(),
+            "ocr_applied": ocr_applique,
+            "ocr_text_length": len(texte_ocr),
+        },
+    }
@@ -0,0 +1,115 @@
+# courriers/services/export_courriers.py
+import csv
+import json
+import tempfile
+from datetime import date, datetime
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import FileResponse, StreamingHttpResponse
+from django.utils import timezone
+
+# Colonnes issues des relations : nom exporté -> chemin ORM
+COLONNES_RELATIONS = {
+    'category_nom': 'category__name',
+    'service_impute_nom': 'service_impute__nom',
+}
+# Annotations de CourrierQuerySet.with_deadlines()
+COLONNES_ANNOTEES = ('jours_restants', 'est_en_retard', 'delai_traitement')
+
+FORMATS = {
+    'csv': ('text/csv; charset=utf-8', 'csv'),
+    'ndjson': ('application/x-ndjson', 'ndjson'),
+    'json': ('application/json', 'json'),
+    'excel': ('application/vnd.openxmlformats-officedocument.spreadsheetml.sheet', 'xlsx'),
+}
+
+
+def colonnes_disponibles():
+    from courriers.models import Courrier
+
+    champs = [
+        f.attname if f.is_relation else f.name
+        for f in Courrier._meta.concrete_fields
+        if f.name != 'meta_analyse'
+    ]
+    return [*champs, *COLONNES_ANNOTEES, *COLONNES_RELATIONS]
+
+
+class _Echo:
+    """Pseudo-fichier : csv.writer écrit une ligne, writerow la renvoie"""
+    def write(self, valeur):
+        return valeur
+
+
+class ExportCourriers:
+    """
+    Export en flux des courriers (CSV, NDJSON, JSON, XLSX).
+
+    Les lignes sont lues par lots (values_list + iterator) : ni instances de
+    modèle, ni liste complète en mémoire. CSV et (ND)JSON sont produits au fil
+    de l'eau par une StreamingHttpResponse ; le classeur XLSX est écrit en mode
+    write_only dans un fichier temporaire puis servi par FileResponse.
+    """
+
+    def __init__(self, queryset, colonnes, taille_lot=2000):
+        self.queryset = queryset
+        self.colonnes = list(colonnes)
+        self.taille_lot = taille_lot
+
+    def lignes(self):
+        chemins = [COLONNES_RELATIONS.get(colonne, colonne) for colonne in self.colonnes]
+        for ligne in self.queryset.values_list(*chemins).iterator(chunk_size=self.taille_lot):
+            yield [_valeur(v) for v in ligne]
+
+    def reponse(self, format_export):
+        content_type, extension = FORMATS[format_export]
+        nom = f"courriers_{timezone.now():%Y%m%d_%H%M}.{extension}"
+
+        if format_export == 'excel':
+            return FileResponse(self._classeur(), content_type=content_type, as_attachment=True, filename=nom)
+
+        producteur = {'csv': self._csv, 'ndjson': self._ndjson, 'json': self._json}[format_export]
+        response = StreamingHttpResponse(producteur(), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{nom}"'
+        return response
+
+    def _csv(self):
+        ecrivain = csv.writer(_Echo(), delimiter=';')
+        yield '\ufeff' + ecrivain.writerow(self.colonnes)  # BOM : accents lus correctement par Excel
+        for ligne in self.lignes():
+            yield ecrivain.writerow('' if v is None else v for v in ligne)
+
+    def _ndjson(self):
+        for ligne in self.lignes():
+            yield json.dumps(dict(zip(self.colonnes, ligne)), cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+
+    def _json(self):
+        separateur = '['
+        for ligne in self.lignes():
+            yield separateur + json.dumps(dict(zip(self.colonnes, ligne)), cls=DjangoJSONEncoder, ensure_ascii=False)
+            separateur = ','
+        yield ']' if separateur == ',' else '[]'
+
+    def _classeur(self):
+        from openpyxl import Workbook
+
+        classeur = Workbook(write_only=True)
+        feuille = classeur.create_sheet('Courriers')
+        feuille.append(self.colonnes)
+        for ligne in self.lignes():
+            feuille.append(ligne)
+
+        fichier = tempfile.TemporaryFile()
+        classeur.save(fichier)
+        fichier.seek(0)
+        return fichier
+
+
+def _valeur(valeur):
+    if isinstance(valeur, datetime):
+        if timezone.is_aware(valeur):
+            valeur = timezone.localtime(valeur)
+        return valeur.strftime('%Y-%m-%d %H:%M')
+    if isinstance(valeur, date):
+        return valeur.isoformat()
+    return valeur
@@ -0,0 +1,421 @@
+# courriers/services/import_courriers.py
+import codecs
+import csv
+import io
+import logging
+from datetime import date, datetime, timedelta
+from itertools import islice
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db import DatabaseError, models, transaction
+from django.db.models import F, Q, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+
+from core.services.resolution_noms import resolveur_categories, resolveur_services
+from courriers.services.reference_generator import generer_references
+
+logger = logging.getLogger(__name__)
+
+# Colonnes reprises telles quelles (validées par le champ du modèle)
+CHAMPS_IMPORT = (
+    'reference', 'objet', 'contenu_texte',
+    'expediteur_nom', 'expediteur_email', 'expediteur_adresse', 'expediteur_telephone', 'destinataire_nom',
+    'priorite', 'canal', 'statut',
+    'date_reception', 'date_echeance', 'date_cloture',
+)
+# Colonnes désignant un objet par son nom : colonne -> (champ, résolveur)
+RELATIONS_IMPORT = {
+    'service': ('service_impute_id', resolveur_services),
+    'categorie': ('category_id', resolveur_categories),
+}
+FORMATS_DATE = ('%Y-%m-%d', '%d/%m/%Y', '%d-%m-%Y', '%d/%m/%y')
+
+
+def lire_lignes(fichier, nom):
+    """
+    Lignes d'un fichier CSV ou XLSX, lues en flux : (numéro de ligne, {colonne: valeur}).
+    Lève ValueError pour un format non supporté.
+    """
+    extension = nom.rsplit('.', 1)[-1].lower() if '.' in nom else ''
+    brut = getattr(fichier, 'file', fichier)
+    if extension == 'csv':
+        return _lire_csv(brut)
+    if extension == 'xlsx':
+        return _lire_xlsx(brut)
+    raise ValueError("Format de fichier non supporté (CSV ou XLSX)")
+
+
+def detecter_encodage(brut):
+    """
+    Encodage d'un CSV, déterminé sur tout le fichier avant la première
+    écriture : UTF-8 s'il est valide de bout en bout, sinon Windows-1252
+    (export Excel français). Une erreur de décodage ne peut donc plus
+    interrompre un import dont des lots sont déjà enregistrés.
+    """
+    brut.seek(0)
+    decodeur = codecs.getincrementaldecoder('utf-8-sig')()
+    try:
+        for bloc in iter(lambda: brut.read(1 << 20), b''):
+            decodeur.decode(bloc)
+        decodeur.decode(b'', final=True)
+        return 'utf-8-sig'
+    except UnicodeDecodeError:
+        return 'cp1252'
+    finally:
+        brut.seek(0)
+
+
+def _lire_csv(brut):
+    encodage = detecter_encodage(brut)
+    echantillon = brut.read(8192).decode(encodage, errors='ignore')
+    brut.seek(0)
+    try:
+        dialecte = csv.Sniffer().sniff(echantillon, delimiters=',;\t')
+    except csv.Error:
+        dialecte = csv.excel
+
+    # Les 5 octets non définis en Windows-1252 deviennent U+FFFD au lieu d'interrompre l'import
+    texte = io.TextIOWrapper(brut, encoding=encodage, errors='replace', newline='')
+    try:
+        lecteur = csv.DictReader(texte, dialect=dialecte)
+        for ligne in lecteur:
+            yield lecteur.line_num, ligne
+    finally:
+        texte.detach()  # le fichier reste ouvert pour son propriétaire
+
+
+def _lire_xlsx(brut):
+    from openpyxl import load_workbook
+
+    classeur = load_workbook(brut, read_only=True, data_only=True)
+    try:
+        lignes = classeur.active.iter_rows(values_only=True)
+        entetes = [str(e).strip() if e is not None else '' for e in next(lignes, ())]
+        for numero, valeurs in enumerate(lignes, start=2):
+            if all(v is None or v == '' for v in valeurs):
+                continue
+            yield numero, dict(zip(entetes, valeurs))
+    finally:
+        classeur.close()
+
+
+def estimer_lignes(fichier, nom):
+    """
+    Nombre de lignes de données du fichier, pour la progression (approché :
+    un saut de ligne dans un champ CSV compte double).
+    """
+    extension = nom.rsplit('.', 1)[-1].lower() if '.' in nom else ''
+    brut = getattr(fichier, 'file', fichier)
+    brut.seek(0)
+    try:
+        if extension == 'xlsx':
+            from openpyxl import load_workbook
+            classeur = load_workbook(brut, read_only=True)
+            try:
+                return max((classeur.active.max_row or 1) - 1, 0)
+            finally:
+                classeur.close()
+
+        sauts, dernier = 0, b''
+        for bloc in iter(lambda: brut.read(1 << 20), b''):
+            sauts += bloc.count(b'\n')
+            dernier = bloc[-1:]
+        if dernier and dernier != b'\n':
+            sauts += 1  # dernière ligne sans saut final
+        return max(sauts - 1, 0)
+    finally:
+        brut.seek(0)
+
+
+class ImportCourriers:
+    """
+    Import en masse de courriers depuis un fichier CSV / XLSX.
+
+    Le fichier est lu en flux et traité par lots (COURRIER_IMPORT_TAILLE_LOT) :
+    validation des lignes, références attribuées en une fois, bulk_create
+    dans une transaction par lot. bulk_create ne déclenchant pas les signaux,
+    les tables dérivées (accès, agrégat journalier, index de recherche,
+    cache du tableau de bord) sont mises à jour explicitement pour chaque lot.
+
+    Les lignes invalides ne bloquent pas les autres : elles sont listées dans
+    le rapport avec leur numéro de ligne dans le fichier (au plus
+    COURRIER_IMPORT_ERREURS_MAX, les suivantes sont seulement comptées).
+    """
+
+    def __init__(self, type_courrier, utilisateur=None, mapping=None, taille_lot=None):
+        self.type_courrier = type_courrier
+        self.utilisateur = utilisateur
+        self.mapping = mapping or {}
+        self.taille_lot = taille_lot or getattr(settings, 'COURRIER_IMPORT_TAILLE_LOT', 1000)
+        self.erreurs_max = getattr(settings, 'COURRIER_IMPORT_ERREURS_MAX', 1000)
+        self.aujourd_hui = timezone.now().date()
+
+    def importer(self, fichier, nom, progression=None, rapport=None):
+        """
+        Importe le fichier. `progression(rapport)` est appelée après chaque lot,
+        dans la transaction du lot : la progression enregistrée correspond
+        exactement aux lots validés. Un `rapport` d'une exécution interrompue
+        reprend l'import après ses rapport['total'] premières lignes.
+        Retourne le rapport : {'total', 'importes', 'nb_erreurs', 'erreurs': [{'ligne', 'erreurs'}]}
+        """
+        from dashboard.services.cache_dashboard import cache_dashboard
+
+        rapport = rapport or {'total': 0, 'importes': 0, 'nb_erreurs': 0, 'erreurs': []}
+        importes_avant = rapport['importes']
+        lecture = lire_lignes(fichier, nom)
+        lignes = islice(lecture, rapport['total'], None)
+        try:
+            while True:
+                lot = list(islice(lignes, self.taille_lot))
+                if not lot:
+                    break
+                with transaction.atomic():
+                    self._importer_lot(lot, rapport)
+                    if progression:
+                        progression(rapport)
+        finally:
+            lecture.close()  # avant la fermeture du fichier par l'appelant
+            if rapport['importes'] > importes_avant:
+                transaction.on_commit(cache_dashboard.invalider)
+        rapport['erreurs'].sort(key=lambda erreur: erreur['ligne'])
+        return rapport
+
+    # ------------------------------------------------------------------
+    # Validation
+    # ------------------------------------------------------------------
+    def construire(self, ligne):
+        """Courrier (non enregistré) correspondant à une ligne ; lève ValidationError"""
+        from courriers.models import Courrier
+
+        ligne = {self.mapping.get(colonne, colonne).strip(): valeur for colonne, valeur in ligne.items() if colonne}
+
+        valeurs, erreurs = {}, {}
+        for nom in CHAMPS_IMPORT:
+            champ = Courrier._meta.get_field(nom)
+            valeur = _nettoyer(ligne.get(nom), champ)
+            if valeur is None:
+                continue
+            try:
+                if nom.startswith('date_'):
+                    valeur = _date(valeur)
+                valeurs[nom] = champ.clean(valeur, None)
+            except ValidationError as e:
+                erreurs[nom] = e.messages
+
+        for colonne, (champ, resolveur) in RELATIONS_IMPORT.items():
+            nom_objet = _nettoyer(ligne.get(colonne))
+            if nom_objet is None:
+                continue
+            valeurs[champ] = resolveur.resoudre(str(nom_objet))
+            if valeurs[champ] is None:
+                erreurs[colonne] = [f"'{nom_objet}' introuvable"]
+
+        if not valeurs.get('objet') and 'objet' not in erreurs:
+            erreurs['objet'] = ["Ce champ est obligatoire."]
+        if erreurs:
+            raise ValidationError(erreurs)
+
+        valeurs.setdefault('date_reception', self.aujourd_hui)
+        return Courrier(type=self.type_courrier, created_by=self.utilisateur, **valeurs)
+
+    def _valider_lot(self, lot, rapport):
+        valides = []
+        for numero, ligne in lot:
+            rapport['total'] += 1
+            try:
+                valides.append((numero, self.construire(ligne)))
+            except ValidationError as e:
+                self._signaler(rapport, numero, e.message_dict)
+        return valides
+
+    def _signaler(self, rapport, numero, erreurs):
+        """Compte la ligne en erreur ; le détail n'est gardé que pour les erreurs_max premières"""
+        rapport['nb_erreurs'] += 1
+        if len(rapport['erreurs']) < self.erreurs_max:
+            rapport['erreurs'].append({'ligne': numero, 'erreurs': erreurs})
+
+    def _attribuer_references(self, valides, rapport):
+        """Références fournies : vérifiées en une requête ; manquantes : générées en bloc"""
+        from courriers.models import Courrier
+
+        fournies = [c.reference for _, c in valides if c.reference]
+        existantes = set(Courrier.objects.filter(reference__in=fournies).values_list('reference', flat=True))
+
+        retenus, vues = [], set()
+        for numero, courrier in valides:
+            if courrier.reference:
+                if courrier.reference in existantes or courrier.reference in vues:
+                    self._signaler(rapport, numero, {'reference': [f"La référence {courrier.reference} existe déjà."]})
+                    continue
+                vues.add(courrier.reference)
+            retenus.append((numero, courrier))
+
+        sans_reference = [c for _, c in retenus if not c.reference]
+        for courrier, reference in zip(
+            sans_reference, generer_references(self.type_courrier, len(sans_reference), reservees=vues)
+        ):
+            courrier.reference = reference
+        return retenus
+
+    # ------------------------------------------------------------------
+    # Écriture
+    # ------------------------------------------------------------------
+    def _importer_lot(self, lot, rapport):
+        valides = self._attribuer_references(self._valider_lot(lot, rapport), rapport)
+        if not valides:
+            return
+
+        try:
+            with transaction.atomic():
+                crees = self._ecrire([c for _, c in valides])
+        except DatabaseError as e:
+            # Ligne fautive inconnue : repli ligne à ligne pour l'isoler
+            logger.warning(f"Import: lot de {len(valides)} lignes rejeté ({e}), repli ligne à ligne")
+            crees = []
+            for numero, courrier in valides:
+                try:
+                    with transaction.atomic():
+                        crees += self._ecrire([courrier])
+                except DatabaseError as e:
+                    self._signaler(rapport, numero, {'__all__': [str(e)]})
+
+        self._indexer(crees)
+        rapport['importes'] += len(crees)
+
+    def _ecrire(self, courriers):
+        """bulk_create puis tables dérivées qui doivent rester cohérentes (même transaction)"""
+        from courriers.models import Courrier
+        from courriers.services.acces import synchroniser_acces
+        from dashboard.services.statistiques import agregat_journalier
+
+        crees = Courrier.objects.bulk_create(courriers)
+        synchroniser_acces([c.pk for c in crees])
+        agregat_journalier.ajouter_lot(crees)
+        return crees
+
+    def _indexer(self, courriers):
+        from courriers.services.recherche import CHAMPS, moteur_recherche
+
+        try:
+            with transaction.atomic():
+                moteur_recherche.indexer_lignes(
+                    (c.pk, *(getattr(c, champ) for champ, _ in CHAMPS)) for c in courriers
+                )
+        except DatabaseError as e:
+            logger.error(f"Import: indexation recherche en échec ({e}), relancer reindexer_recherche")
+
+
+def imports_a_traiter():
+    """
+    Imports à exécuter : en attente, ou en cours sans activité depuis
+    COURRIER_IMPORT_DELAI_MAX secondes (thread ou worker arrêté en route).
+    """
+    from courriers.models import ImportJob
+
+    limite = timezone.now() - timedelta(seconds=getattr(settings, 'COURRIER_IMPORT_DELAI_MAX', 900))
+    return ImportJob.objects.filter(Q(statut='en_attente') | Q(statut='en_cours', actif_le__lt=limite))
+
+
+def executer_import(job_id):
+    """
+    Traite un ImportJob en attente ou interrompu (tâche courriers.tasks.traiter_import
+    ou commande traiter_imports). Le job est réservé par une mise à jour
+    conditionnelle : deux workers ne le traitent jamais tous les deux.
+    Un job interrompu reprend après les lots déjà validés.
+    Retourne le job, ou None s'il n'était plus à traiter.
+    """
+    from courriers.models import ImportJob
+
+    maintenant = timezone.now()
+    if not imports_a_traiter().filter(pk=job_id).update(
+        statut='en_cours', demarre_le=Coalesce(F('demarre_le'), Value(maintenant)), actif_le=maintenant
+    ):
+        return None
+    job = ImportJob.objects.select_related('created_by').get(pk=job_id)
+    reprise = {'total': job.lignes_traitees, 'importes': job.importes, 'nb_erreurs': job.nb_erreurs,
+               'erreurs': job.erreurs}
+    if job.lignes_traitees:
+        logger.warning(f"Import {job_id} interrompu, reprise après {job.lignes_traitees} lignes")
+    erreurs_enregistrees = [len(job.erreurs)]
+
+    def progression(rapport):
+        # Le détail des erreurs (plafonné) n'est réécrit que s'il a changé depuis le dernier lot
+        champs = {}
+        if len(rapport['erreurs']) != erreurs_enregistrees[0]:
+            champs['erreurs'] = rapport['erreurs']
+        ImportJob.objects.filter(pk=job.pk).update(
+            lignes_traitees=rapport['total'],
+            importes=rapport['importes'],
+            nb_erreurs=rapport['nb_erreurs'],
+            actif_le=timezone.now(),
+            **champs,
+        )
+        erreurs_enregistrees[0] = len(rapport['erreurs'])
+
+    importeur = ImportCourriers(job.type_courrier, utilisateur=job.created_by, mapping=job.mapping)
+    try:
+        with job.fichier.open('rb') as fichier:
+            job.total_estime = estimer_lignes(fichier, job.nom_fichier)
+            ImportJob.objects.filter(pk=job.pk).update(total_estime=job.total_estime)
+            rapport = importeur.importer(fichier, job.nom_fichier, progression=progression, rapport=reprise)
+
+        job.statut = 'termine'
+        job.message = f"{rapport['importes']} courriers importés, {rapport['nb_erreurs']} lignes en erreur"
+    except Exception as e:
+        logger.error(f"Import {job_id} en échec: {e}", exc_info=True)
+        # Lot en échec annulé : le rapport retenu est celui du dernier lot validé
+        job.refresh_from_db(fields=['lignes_traitees', 'importes', 'nb_erreurs', 'erreurs'])
+        rapport = {'total': job.lignes_traitees, 'importes': job.importes, 'nb_erreurs': job.nb_erreurs,
+                   'erreurs': job.erreurs}
+        job.statut = 'echec'
+        job.message = str(e)
+
+    rapport['erreurs'].sort(key=lambda erreur: erreur['ligne'])
+    job.lignes_traitees = rapport['total']
+    job.importes = rapport['importes']
+    job.nb_erreurs = rapport['nb_erreurs']
+    job.erreurs = rapport['erreurs']
+    job.termine_le = timezone.now()
+    job.save(update_fields=[
+        'statut', 'total_estime', 'lignes_traitees', 'importes', 'nb_erreurs', 'erreurs', 'message', 'termine_le',
+    ])
+    return job
+
+
+def erreurs_csv(job):
+    """Lignes du rapport d'erreurs CSV d'un import : ligne;champ;message"""
+    yield ['ligne', 'champ', 'message']
+    for erreur in job.erreurs:
+        for champ, messages in erreur['erreurs'].items():
+            for message in messages:
+                yield [erreur['ligne'], champ, message]
+    omises = job.nb_erreurs - len(job.erreurs)
+    if omises > 0:
+        yield ['', '__all__', f"{omises} autres lignes en erreur non détaillées"]
+
+
+def _nettoyer(valeur, champ=None):
+    """
+    Valeur d'une cellule avant validation par le champ du modèle. Les entiers
+    qu'Excel stocke en flottant (12.0) ne sont convertis que pour un champ
+    entier : une colonne texte (téléphone, référence) reçoit la cellule telle quelle.
+    """
+    if isinstance(valeur, str):
+        valeur = valeur.strip()
+        return valeur or None
+    if isinstance(valeur, float) and valeur.is_integer() and isinstance(champ, models.IntegerField):
+        return int(valeur)
+    return valeur
+
+
+def _date(valeur):
+    if isinstance(valeur, (date, datetime)):
+        return valeur
+    for format_date in FORMATS_DATE:
+        try:
+            return datetime.strptime(str(valeur), format_date).date()
+        except ValueError:
+            continue
+    return valeur  # laissé au champ, qui signale l'erreur
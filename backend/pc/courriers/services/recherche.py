@@ -0,0 +1,246 @@
+# courriers/services/recherche.py
+import logging
+
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from core.services.texte import raciniser, tokeniser
+
+logger = logging.getLogger(__name__)
+
+TABLE = 'courrier_fts'
+
+# Champs indexés et leur poids dans le classement (référence > objet > expéditeur > texte OCR)
+CHAMPS = (
+    ('reference', 10.0),
+    ('objet', 5.0),
+    ('expediteur_nom', 3.0),
+    ('contenu_texte', 1.0),
+)
+
+
+LONGUEUR_MIN = 2
+
+
+def texte_indexe(texte):
+    """Texte tel qu'indexé (et cherché) dans FTS5 : mots normalisés et racinisés"""
+    return ' '.join(raciniser(mot) for mot in tokeniser(texte or '', longueur_min=LONGUEUR_MIN))
+
+
+def surligner(texte, racines, mots=16):
+    """Extrait de `texte` autour du premier mot dont la racine commence par un terme, termes en <mark>"""
+    morceaux = texte.split()
+    trouves = {
+        i for i, morceau in enumerate(morceaux)
+        if any(racine_mot.startswith(racine) for racine_mot in texte_indexe(morceau).split() for racine in racines)
+    }
+    debut = max(min(trouves) - mots // 4, 0) if trouves else 0
+    fin = debut + mots
+    extrait = ' '.join(
+        f'<mark>{morceau}</mark>' if i in trouves else morceau
+        for i, morceau in enumerate(morceaux[debut:fin], debut)
+    )
+    return ('…' if debut > 0 else '') + extrait + ('…' if fin < len(morceaux) else '')
+
+
+class MoteurRecherche:
+    """
+    Recherche plein texte sur les courriers, via une table d'index `courrier_fts`
+    alimentée par les signaux de courriers/signals.py.
+
+    - SQLite : table virtuelle FTS5 (tokenizer unicode61, accents repliés) ;
+      le texte indexé et les termes de la requête passent par le même
+      texte_indexe() (mots normalisés puis racinisés), les termes sont
+      cherchés en préfixe. L'extrait surligné est construit en Python.
+    - PostgreSQL : colonne tsvector (configuration 'french' + unaccent) et index GIN.
+    - Autres moteurs : repli sur des LIKE (icontains).
+    """
+
+    @property
+    def vendor(self):
+        return connection.vendor
+
+    @property
+    def disponible(self):
+        return self.vendor in ('sqlite', 'postgresql')
+
+    # ------------------------------------------------------------------
+    # Indexation
+    # ------------------------------------------------------------------
+    def indexer(self, courrier):
+        """Ajoute ou remplace un courrier dans l'index (sans jamais bloquer l'enregistrement)."""
+        ligne = (courrier.pk, *(getattr(courrier, champ, '') for champ, _ in CHAMPS))
+        try:
+            with transaction.atomic():
+                self.indexer_lignes([ligne])
+        except DatabaseError as e:
+            logger.error(f"Erreur indexation recherche courrier {courrier.pk}: {e}")
+
+    def indexer_lignes(self, lignes):
+        """lignes: itérable de (id, reference, objet, expediteur_nom, contenu_texte)"""
+        if not self.disponible:
+            return 0
+
+        if self.vendor == 'sqlite':
+            lignes = [(pk, *(texte_indexe(valeur) for valeur in valeurs)) for pk, *valeurs in lignes]
+        else:
+            lignes = [(pk, *(valeur or '' for valeur in valeurs)) for pk, *valeurs in lignes]
+        if not lignes:
+            return 0
+
+        with connection.cursor() as cursor:
+            if self.vendor == 'sqlite':
+                cursor.executemany(f"DELETE FROM {TABLE} WHERE rowid = %s", [(ligne[0],) for ligne in lignes])
+                cursor.executemany(
+                    f"INSERT INTO {TABLE} (rowid, reference, objet, expediteur_nom, contenu_texte) "
+                    "VALUES (%s, %s, %s, %s, %s)",
+                    lignes,
+                )
+            else:
+                cursor.executemany(
+                    f"INSERT INTO {TABLE} (courrier_id, document, texte) VALUES (%s, "
+                    "setweight(to_tsvector('french', unaccent(%s)), 'A') || "
+                    "setweight(to_tsvector('french', unaccent(%s)), 'B') || "
+                    "setweight(to_tsvector('french', unaccent(%s)), 'C') || "
+                    "setweight(to_tsvector('french', unaccent(%s)), 'D'), %s) "
+                    "ON CONFLICT (courrier_id) DO UPDATE SET document = EXCLUDED.document, texte = EXCLUDED.texte",
+                    [(pk, ref, objet, exp, contenu, f"{objet}\n{contenu}") for pk, ref, objet, exp, contenu in lignes],
+                )
+        return len(lignes)
+
+    def retirer(self, courrier_id):
+        if not self.disponible:
+            return
+        colonne = 'rowid' if self.vendor == 'sqlite' else 'courrier_id'
+        try:
+            with transaction.atomic(), connection.cursor() as cursor:
+                cursor.execute(f"DELETE FROM {TABLE} WHERE {colonne} = %s", [courrier_id])
+        except DatabaseError as e:
+            logger.error(f"Erreur retrait recherche courrier {courrier_id}: {e}")
+
+    def reconstruire(self, taille_lot=1000):
+        """Vide et reconstruit tout l'index. Retourne le nombre de courriers indexés."""
+        from courriers.models import Courrier
+
+        if not self.disponible:
+            return 0
+
+        with connection.cursor() as cursor:
+            cursor.execute(f"DELETE FROM {TABLE}")
+
+        total = 0
+        lot = []
+        champs = [champ for champ, _ in CHAMPS]
+        for ligne in Courrier.objects.order_by('pk').values_list('pk', *champs).iterator(chunk_size=taille_lot):
+            lot.append(ligne)
+            if len(lot) >= taille_lot:
+                total += self.indexer_lignes(lot)
+                lot = []
+        total += self.indexer_lignes(lot)
+
+        if self.vendor == 'sqlite':
+            with connection.cursor() as cursor:
+                cursor.execute(f"INSERT INTO {TABLE}({TABLE}) VALUES ('optimize')")
+        return total
+
+    # ------------------------------------------------------------------
+    # Requêtes
+    # ------------------------------------------------------------------
+    def _requete(self, texte):
+        """Traduit une saisie libre en requête FTS5 / tsquery (None si vide)."""
+        if self.vendor == 'sqlite':
+            racines = texte_indexe(texte).split()
+            return ' '.join(f'"{racine}"*' for racine in racines) or None
+        mots = tokeniser(texte, longueur_min=LONGUEUR_MIN)
+        return ' & '.join(f"{mot}:*" for mot in mots) or None
+
+    def _sql_correspondances(self):
+        if self.vendor == 'sqlite':
+            return f"SELECT rowid FROM {TABLE} WHERE {TABLE} MATCH %s"
+        return f"SELECT courrier_id FROM {TABLE} WHERE document @@ to_tsquery('french', unaccent(%s))"
+
+    def filtrer(self, queryset, texte):
+        """Restreint un queryset de courriers aux résultats de la recherche."""
+        if not self.disponible:
+            return queryset.filter(
+                Q(reference__icontains=texte) | Q(objet__icontains=texte) |
+                Q(expediteur_nom__icontains=texte) | Q(contenu_texte__icontains=texte)
+            )
+
+        requete = self._requete(texte)
+        if requete is None:
+            return queryset
+        return queryset.filter(pk__in=RawSQL(self._sql_correspondances(), [requete]))
+
+    def rechercher(self, texte, queryset=None, limite=20):
+        """
+        Recherche classée par pertinence, avec extrait surligné.
+        `queryset` restreint les courriers candidats (ex: droits d'accès).
+        Retourne: [{'id': 12, 'rang': 3.2, 'extrait': '... <mark>facture</mark> ...'}, ...]
+        """
+        requete = self._requete(texte)
+        if requete is None:
+            return []
+
+        if not self.disponible:
+            from courriers.models import Courrier
+            courriers = self.filtrer(queryset if queryset is not None else Courrier.objects.all(), texte).order_by('-created_at')[:limite]
+            return [{'id': c.pk, 'rang': 0.0, 'extrait': c.objet} for c in courriers]
+
+        params = [requete]
+        if self.vendor == 'sqlite':
+            poids = ', '.join(str(p) for _, p in CHAMPS)
+            sql = (
+                f"SELECT rowid, -bm25({TABLE}, {poids}) AS rang, NULL "
+                f"FROM {TABLE} WHERE {TABLE} MATCH %s"
+            )
+            cle = 'rowid'
+        else:
+            sql = (
+                "SELECT courrier_id, ts_rank_cd(document, q) AS rang, "
+                "ts_headline('french', texte, q, 'StartSel=<mark>, StopSel=</mark>, MaxFragments=2') "
+                f"FROM {TABLE}, to_tsquery('french', unaccent(%s)) q WHERE document @@ q"
+            )
+            cle = 'courrier_id'
+
+        if queryset is not None:
+            sous_requete, sous_params = queryset.order_by().values('pk').query.sql_with_params()
+            sql += f" AND {cle} IN ({sous_requete})"
+            params.extend(sous_params)
+
+        sql += " ORDER BY rang DESC LIMIT %s"
+        params.append(limite)
+
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            resultats = [
+                {'id': courrier_id, 'rang': round(rang, 4), 'extrait': extrait}
+                for courrier_id, rang, extrait in cursor.fetchall()
+            ]
+
+        if self.vendor == 'sqlite' and resultats:
+            extraits = self._extraits([r['id'] for r in resultats], texte)
+            for resultat in resultats:
+                resultat['extrait'] = extraits.get(resultat['id'], '')
+        return resultats
+
+    def _extraits(self, ids, texte):
+        """{id: extrait surligné} : l'index SQLite ne contient que des racines"""
+        from courriers.models import Courrier
+
+        racines = texte_indexe(texte).split()
+        champs = [champ for champ, _ in CHAMPS]
+        extraits = {}
+        for pk, *valeurs in Courrier.objects.filter(pk__in=ids).values_list('pk', *champs):
+            # Premier champ contenant un terme, par ordre objet, texte OCR, expéditeur, référence
+            candidats = [valeurs[1], valeurs[3], valeurs[2], valeurs[0]]
+            extraits[pk] = next(
+                (e for e in (surligner(v, racines) for v in candidats if v) if '<mark>' in e),
+                surligner(valeurs[1] or '', racines),
+            )
+        return extraits
+
+
+# Instance globale
+moteur_recherche = MoteurRecherche()
@@ -0,0 +1,33 @@
+# courriers/services/reference_generator.py
+import uuid
+
+from django.utils import timezone
+
+PREFIXES = {
+    'entrant': 'CE',
+    'sortant': 'CS',
+    'interne': 'CI',
+}
+
+
+def generer_reference(type_courrier):
+    """Référence unique : CE/2026/4F2A9C"""
+    prefix = PREFIXES.get(type_courrier, 'CR')
+    return f"{prefix}/{timezone.now().year}/{uuid.uuid4().hex[:6].upper()}"
+
+
+def generer_references(type_courrier, nombre, reservees=()):
+    """
+    `nombre` références distinctes, absentes de la base et de `reservees`
+    (une requête par tirage, collisions retirées puis complétées).
+    """
+    from courriers.models import Courrier
+
+    reservees = set(reservees)
+    references = set()
+    while len(references) < nombre:
+        tirage = {generer_reference(type_courrier) for _ in range(nombre - len(references))}
+        tirage -= reservees | references
+        tirage -= set(Courrier.objects.filter(reference__in=tirage).values_list('reference', flat=True))
+        references |= tirage
+    return list(references)
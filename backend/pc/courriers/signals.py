@@ -1,8 +1,15 @@
 # courriers/signals.py
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
-from courriers.models import Courrier
+from core.models import Category, Service
+from courriers.models import ActionHistorique, Courrier, Imputation, PieceJointe
+from courriers.services.acces import CHAMPS_ACCES, synchroniser_acces
+from courriers.services.cache_reponses import cache_reponses
+from courriers.services.recherche import moteur_recherche
+from ia.models import IAResult
 from ia.tasks import process_courrier_automatique
+from users.models import User
+from workflow.models import Workflow, WorkflowStep
 
 # @receiver(post_save, sender=Courrier)
 # def trigger_ia_workflow(sender, instance, created, **kwargs):
@@ -13,3 +20,65 @@ from ia.tasks import process_courrier_automatique
 def handle_courrier_created(sender, instance, **kwargs):
     from ia.tasks import process_courrier_automatique
     process_courrier_automatique(instance)
+
+
+@receiver(post_save, sender=Courrier)
+def indexer_recherche(sender, instance, update_fields=None, **kwargs):
+    champs = {'reference', 'objet', 'expediteur_nom', 'contenu_texte'}
+    if update_fields is not None and not champs.intersection(update_fields):
+        return
+    moteur_recherche.indexer(instance)
+
+
+@receiver(post_delete, sender=Courrier)
+def retirer_recherche(sender, instance, **kwargs):
+    moteur_recherche.retirer(instance.pk)
+
+
+@receiver(post_save, sender=Courrier)
+def synchroniser_acces_courrier(sender, instance, created, update_fields=None, **kwargs):
+    if not created and update_fields is not None and not CHAMPS_ACCES.intersection(update_fields):
+        return
+    synchroniser_acces([instance.pk])
+
+
+@receiver([post_save, post_delete], sender=Imputation)
+def synchroniser_acces_imputation(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Courrier):
+        return  # suppression du courrier lui-même (cascade)
+    synchroniser_acces([instance.courrier_id])
+
+
+# Version des courriers (ETag / cache des réponses)
+@receiver(post_save, sender=Courrier)
+def toucher_courrier(sender, instance, update_fields=None, **kwargs):
+    # save(update_fields=[...]) ne met pas à jour updated_at (auto_now)
+    if update_fields is not None and 'updated_at' not in update_fields:
+        cache_reponses.toucher(pk=instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Imputation)
+@receiver([post_save, post_delete], sender=PieceJointe)
+@receiver([post_save, post_delete], sender=ActionHistorique)
+@receiver([post_save, post_delete], sender=IAResult)
+@receiver([post_save, post_delete], sender=Workflow)
+def toucher_courrier_lie(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, Courrier):
+        return
+    cache_reponses.toucher(pk=instance.courrier_id)
+
+
+@receiver([post_save, post_delete], sender=WorkflowStep)
+def toucher_courrier_etape(sender, instance, origin=None, **kwargs):
+    if isinstance(origin, (Courrier, Workflow)):
+        return
+    cache_reponses.toucher(workflow__id=instance.workflow_id)
+
+
+@receiver([post_save, post_delete], sender=Service)
+@receiver([post_save, post_delete], sender=Category)
+@receiver([post_save, post_delete], sender=User)
+def invalider_referentiels(sender, update_fields=None, **kwargs):
+    if update_fields is not None and set(update_fields) <= {'last_login'}:
+        return
+    cache_reponses.invalider_referentiels()
@@ -3,14 +3,16 @@ from celery import shared_task
 from django.core.mail import send_mail
 from django.utils import timezone
 from django.db.models import Q
-from .models import Courrier, IAResult
-from .services.ocr_service import OCRService
-from .services.classification_service import ClassificationService
+from ia.models import IAResult
+from .models import Courrier
 
 
 @shared_task
 def process_courrier_async(courrier_id):
     """Traitement asynchrone d'un courrier"""
+    from .services.ocr_service import OCRService
+    from .services.classification_service import ClassificationService
+
     try:
         courrier = Courrier.objects.get(id=courrier_id)
         
@@ -104,4 +106,15 @@ def daily_maintenance():
         courrier.date_archivage = timezone.now()
         courrier.save()
     
-    return f"{courriers_a_archiver.count()} courriers archivés"
\ No newline at end of file
+    return f"{courriers_a_archiver.count()} courriers archivés"
+
+
+@shared_task
+def traiter_import(job_id):
+    """Import de courriers en arrière-plan (ImportJob)"""
+    from .services.import_courriers import executer_import
+
+    job = executer_import(job_id)
+    if job is None:
+        return f"Import {job_id} déjà pris en charge"
+    return f"Import {job_id} : {job.statut}, {job.importes} courriers importés"
@@ -1,3 +1,1020 @@
-from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+from django.db import connection
+from django.db.models.signals import post_init
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+
+from core.models import Category, Service
+from users.models import User
+from .models import ActionHistorique, Courrier, CourrierAcces, ImportJob, Imputation, PieceJointe
+from .serializers import CourrierDetailSerializer, CourrierListeRapide, CourrierListSerializer
+from .services.import_courriers import ImportCourriers, _nettoyer, executer_import
+from .services.recherche import moteur_recherche
+
+
+class CourrierListQueriesTest(TestCase):
+    """La liste des courriers coûte un nombre de requêtes indépendant du nombre de lignes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(email='admin@test.bf', password='x', nom='Admin', prenom='Test')
+        cls.categories = [Category.objects.create(name=f"Catégorie {i}") for i in range(3)]
+        cls.services = [Service.objects.create(nom=f"Service {i}") for i in range(3)]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def creer_courriers(self, nombre):
+        debut = Courrier.objects.count()
+        for i in range(debut, debut + nombre):
+            Courrier.objects.create(
+                reference=f"CE-TEST-{i:04d}",
+                type='entrant',
+                objet=f"Courrier {i}",
+                expediteur_nom="Jean Dupont",
+                contenu_texte="Texte OCR " * 50,
+                category=self.categories[i % 3],
+                service_impute=self.services[i % 3],
+            )
+
+    def compter_requetes(self):
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get('/api/courriers/courriers/')
+        self.assertEqual(response.status_code, 200)
+        return len(requetes), response.json()['results']
+
+    def test_nombre_de_requetes_constant(self):
+        self.creer_courriers(3)
+        requetes_petite_page, data = self.compter_requetes()
+        self.assertEqual(len(data), 3)
+
+        self.creer_courriers(30)
+        requetes_grande_page, data = self.compter_requetes()
+        self.assertEqual(len(data), 33)
+
+        self.assertEqual(requetes_petite_page, requetes_grande_page)
+        self.assertTrue(all(ligne['category_nom'] and ligne['service_impute_nom'] for ligne in data))
+
+    def test_colonnes_lourdes_differees(self):
+        self.creer_courriers(1)
+        with CaptureQueriesContext(connection) as requetes:
+            self.client.get('/api/courriers/courriers/')
+        sql = ' '.join(q['sql'] for q in requetes.captured_queries if 'courrier_courrier' in q['sql'])
+        self.assertNotIn('contenu_texte', sql)
+        self.assertNotIn('meta_analyse', sql)
+
+
+class CourrierListeRapideTest(TestCase):
+    """Le chemin rapide values() produit exactement la sortie de CourrierListSerializer"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(email='admin@test.bf', password='x', nom='Admin', prenom='Test')
+        category = Category.objects.create(name="Facture")
+        service = Service.objects.create(nom="Service Financier")
+        aujourd_hui = timezone.localdate()
+
+        variantes = [
+            # (expediteur_nom, date_echeance, statut, priorite, category, service)
+            ("Jean Dupont", aujourd_hui + timedelta(days=5), 'recu', 'normale', category, service),
+            ("Ministère", aujourd_hui - timedelta(days=3), 'traitement', 'urgente', None, service),
+            ("Élise Ouédraogo", aujourd_hui - timedelta(days=3), 'repondu', 'haute', category, None),
+            ("", None, 'impute', 'basse', None, None),
+            (None, aujourd_hui, 'archive', 'inconnue', category, service),
+            ("  ", aujourd_hui - timedelta(days=1), 'recu', 'normale', None, None),
+        ]
+        for i, (nom, echeance, statut, priorite, cat, svc) in enumerate(variantes):
+            Courrier.objects.create(
+                reference=f"CE-RAPIDE-{i}",
+                type='entrant' if i % 2 else 'sortant',
+                objet=f"Objet « {i} »",
+                expediteur_nom=nom,
+                date_reception=aujourd_hui - timedelta(days=i) if i != 3 else None,
+                date_echeance=echeance,
+                statut=statut,
+                priorite=priorite,
+                category=cat,
+                service_impute=svc,
+            )
+
+    def test_sortie_identique_au_serializer(self):
+        queryset = Courrier.objects.order_by('-created_at', '-id')
+
+        attendu = JSONRenderer().render(CourrierListSerializer(queryset, many=True).data)
+        obtenu = JSONRenderer().render(CourrierListeRapide.serialiser(CourrierListeRapide.valeurs(queryset)))
+
+        self.assertEqual(obtenu, attendu)
+
+    def test_liste_api_utilise_le_chemin_rapide(self):
+        queryset = Courrier.objects.order_by('-created_at', '-id')
+        attendu = json.loads(JSONRenderer().render(CourrierListSerializer(queryset, many=True).data))
+
+        client = APIClient()
+        client.force_authenticate(self.user)
+        instances = []
+        compter = lambda sender, instance, **kwargs: instances.append(instance)
+        post_init.connect(compter, sender=Courrier)
+        try:
+            with mock.patch.object(CourrierListSerializer, 'to_representation') as serializer, \
+                    mock.patch.object(CourrierListeRapide, 'serialiser', wraps=CourrierListeRapide.serialiser) as rapide, \
+                    self.assertNumQueries(2):  # version (ETag) + page en values()
+                response = client.get('/api/courriers/courriers/')
+        finally:
+            post_init.disconnect(compter, sender=Courrier)
+
+        self.assertEqual(response.status_code, 200)
+        rapide.assert_called_once()
+        serializer.assert_not_called()
+        self.assertEqual(instances, [])
+        self.assertEqual(response.json()['results'], attendu)
+
+
+class CourrierStatistiquesTest(TestCase):
+    """Les statistiques tiennent en une requête et donnent les mêmes chiffres que le calcul Python"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(email='admin@test.bf', password='x', nom='Admin', prenom='Test')
+        aujourd_hui = timezone.localdate()
+
+        variantes = [
+            # (type, statut, date_reception, date_cloture, date_echeance)
+            ('entrant', 'recu', aujourd_hui, None, aujourd_hui - timedelta(days=2)),
+            ('entrant', 'impute', aujourd_hui, None, aujourd_hui + timedelta(days=2)),
+            ('sortant', 'traitement', aujourd_hui, None, None),
+            ('entrant', 'repondu', aujourd_hui - timedelta(days=10), aujourd_hui - timedelta(days=9), None),
+            ('interne', 'repondu', aujourd_hui - timedelta(days=10), aujourd_hui - timedelta(days=8), None),
+            ('sortant', 'repondu', aujourd_hui - timedelta(days=5), aujourd_hui - timedelta(days=3), aujourd_hui - timedelta(days=1)),
+            ('entrant', 'repondu', None, aujourd_hui, None),
+            ('entrant', 'archive', aujourd_hui - timedelta(days=30), aujourd_hui, aujourd_hui - timedelta(days=20)),
+        ]
+        for i, (type_courrier, statut, reception, cloture, echeance) in enumerate(variantes):
+            Courrier.objects.create(
+                reference=f"CE-STATS-{i}",
+                type=type_courrier,
+                objet=f"Courrier {i}",
+                statut=statut,
+                date_reception=reception,
+                date_cloture=cloture,
+                date_echeance=echeance,
+            )
+
+    def statistiques_attendues(self):
+        """Calcul de référence, courrier par courrier"""
+        courriers = list(Courrier.objects.all())
+        en_cours = [c for c in courriers if c.statut in ('recu', 'impute', 'traitement')]
+        traites = [c for c in courriers if c.statut == 'repondu']
+        delais = [(c.date_cloture - c.date_reception).days for c in traites if c.date_reception and c.date_cloture]
+        return {
+            'total': len(courriers),
+            'entrants': sum(c.type == 'entrant' for c in courriers),
+            'sortants': sum(c.type == 'sortant' for c in courriers),
+            'internes': sum(c.type == 'interne' for c in courriers),
+            'en_cours': len(en_cours),
+            'en_retard': sum(bool(c.date_echeance and c.date_echeance < timezone.localdate()) for c in en_cours),
+            'traites': len(traites),
+            'taux_traitement': round(len(traites) / len(courriers) * 100, 2),
+            'delai_moyen': round(sum(delais) / len(delais), 2),
+        }
+
+    def test_une_requete_memes_chiffres(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+
+        with self.assertNumQueries(1):
+            response = client.get('/api/courriers/courriers/statistiques/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json(), self.statistiques_attendues())
+        self.assertEqual(response.json()['delai_moyen'], 1.67)
+
+
+class FiltresEcheancesTest(TestCase):
+    """?est_en_retard=, ?jours_restants_min/max= et tri sur les annotations d'échéance"""
+
+    URL = '/api/courriers/courriers/'
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(email='admin@test.bf', password='x', nom='Admin', prenom='Test')
+        aujourd_hui = timezone.localdate()
+
+        def jours(n):
+            return aujourd_hui + timedelta(days=n)
+
+        for reference, statut, reception, cloture, echeance in [
+            ('AUJOURDHUI', 'recu', jours(-3), None, jours(0)),
+            ('EN-RETARD', 'traitement', jours(-10), None, jours(-3)),
+            ('CLOS', 'repondu', jours(-20), jours(-1), jours(-5)),
+            ('SANS-ECHEANCE', 'recu', jours(-1), None, None),
+            ('A-VENIR', 'impute', jours(-2), None, jours(4)),
+        ]:
+            Courrier.objects.create(
+                reference=reference, type='entrant', objet=reference, statut=statut,
+                date_reception=reception, date_cloture=cloture, date_echeance=echeance,
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def references(self, **params):
+        response = self.client.get(self.URL, {'page_size': 100, **params})
+        self.assertEqual(response.status_code, 200)
+        return [ligne['reference'] for ligne in response.json()['results']]
+
+    def test_est_en_retard_identique_au_queryset(self):
+        en_retard = set(Courrier.objects.en_retard().values_list('reference', flat=True))
+        self.assertEqual(en_retard, {'EN-RETARD'})
+        self.assertEqual(set(self.references(est_en_retard='true')), en_retard)
+        self.assertEqual(
+            set(self.references(est_en_retard='false')),
+            set(Courrier.objects.values_list('reference', flat=True)) - en_retard,
+        )
+
+    def test_bornes_jours_restants(self):
+        self.assertEqual(set(self.references(jours_restants_min=0)), {'AUJOURDHUI', 'A-VENIR'})
+        self.assertEqual(set(self.references(jours_restants_max=0)), {'AUJOURDHUI', 'EN-RETARD', 'CLOS'})
+        self.assertEqual(set(self.references(jours_restants_min=-4, jours_restants_max=0)), {'AUJOURDHUI', 'EN-RETARD'})
+        # Sans échéance : jamais dans une borne
+        self.assertNotIn('SANS-ECHEANCE', self.references(jours_restants_max=1000))
+
+    def test_tri_sur_les_annotations(self):
+        references = self.references(ordering='jours_restants')
+        self.assertEqual(len(references), 5)
+        self.assertEqual([r for r in references if r != 'SANS-ECHEANCE'], ['CLOS', 'EN-RETARD', 'AUJOURDHUI', 'A-VENIR'])
+
+        self.assertEqual(
+            self.references(ordering='-delai_traitement'),
+            ['CLOS', 'EN-RETARD', 'AUJOURDHUI', 'A-VENIR', 'SANS-ECHEANCE'],
+        )
+
+
+class RechercheTest(TestCase):
+    """Index plein texte synchronisé par les signaux, même racinisation côté index et requête"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(email='admin@test.bf', password='x', nom='Admin', prenom='Test')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def creer(self, reference, objet, contenu=''):
+        return Courrier.objects.create(reference=reference, type='entrant', objet=objet, contenu_texte=contenu)
+
+    def ids_trouves(self, texte):
+        return [r['id'] for r in moteur_recherche.rechercher(texte)]
+
+    def test_index_suit_enregistrement_et_suppression(self):
+        courrier = self.creer("CE-FTS-1", "Réclamation du fournisseur")
+        self.assertEqual(self.ids_trouves("reclamation"), [courrier.id])
+
+        courrier.objet = "Demande de congé"
+        courrier.save()
+        self.assertEqual(self.ids_trouves("reclamation"), [])
+        self.assertEqual(self.ids_trouves("congés"), [courrier.id])
+
+        courrier.delete()
+        self.assertEqual(self.ids_trouves("conge"), [])
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM courrier_fts")
+            self.assertEqual(cursor.fetchone()[0], 0)
+
+    def test_racinisation_identique_index_et_requete(self):
+        courrier = self.creer("CE-FTS-2", "Facturation de l'électricité")
+        for saisie in ("facture", "factures", "facturations", "electricite", "ÉLECTRICITÉ"):
+            self.assertEqual(self.ids_trouves(saisie), [courrier.id], saisie)
+
+    def test_classement_et_extrait(self):
+        dans_texte = self.creer("CE-FTS-3", "Divers", contenu="Veuillez trouver ci-joint la facture du mois")
+        dans_objet = self.creer("CE-FTS-4", "Facture d'eau", contenu="Règlement attendu")
+
+        resultats = moteur_recherche.rechercher("factures")
+        self.assertEqual([r['id'] for r in resultats], [dans_objet.id, dans_texte.id])
+        self.assertEqual(resultats[0]['extrait'], "<mark>Facture</mark> d'eau")
+        self.assertIn("<mark>facture</mark>", resultats[1]['extrait'])
+
+    def test_filtre_search_de_la_liste(self):
+        trouve = self.creer("CE-FTS-5", "Recrutement des agents")
+        self.creer("CE-FTS-6", "Budget annuel")
+
+        response = self.client.get('/api/courriers/courriers/', {'search': 'recrutements'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([c['id'] for c in response.json()['results']], [trouve.id])
+
+        response = self.client.get('/api/courriers/courriers/search/', {'q': 'recrutement'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([c['id'] for c in response.json()['results']], [trouve.id])
+
+
+class PolitiqueAccesTest(TestCase):
+    """Visibilité par rôle (table CourrierAcces), contrôles objet en écriture, lignes d'accès maintenues"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.service_a = Service.objects.create(nom="Service A")
+        cls.service_b = Service.objects.create(nom="Service B")
+
+        def utilisateur(email, role, service=None, **extra):
+            return User.objects.create_user(email=email, password='x', nom=email, prenom='Test',
+                                            role=role, service=service, **extra)
+
+        cls.collaborateur_a = utilisateur('collab.a@test.bf', 'collaborateur', cls.service_a)
+        cls.sans_service = utilisateur('sans.service@test.bf', 'collaborateur')
+        cls.chef_b = utilisateur('chef.b@test.bf', 'chef')
+        cls.direction = utilisateur('direction@test.bf', 'direction')
+        cls.archiviste = utilisateur('archiviste@test.bf', 'archiviste')
+        cls.agent = utilisateur('agent@test.bf', 'agent_courrier', cls.service_a)
+        cls.admin = utilisateur('admin.role@test.bf', 'admin')
+        cls.superuser = User.objects.create_superuser(email='root@test.bf', password='x', nom='Root', prenom='Test')
+        cls.service_b.chef = cls.chef_b
+        cls.service_b.save()
+
+        def courrier(reference, **champs):
+            return Courrier.objects.create(reference=reference, type='entrant', objet=reference, **champs)
+
+        cls.du_service_a = courrier("CE-ACC-1", service_impute=cls.service_a)
+        cls.confidentiel_b = courrier("CE-ACC-2", service_impute=cls.service_b, confidentialite='confidentielle')
+        cls.cree_sans_service = courrier("CE-ACC-3", created_by=cls.sans_service)
+        cls.archive = courrier("CE-ACC-4", archived=True, confidentialite='confidentielle')
+        cls.concerne_a = courrier("CE-ACC-5", service_impute=cls.service_b)
+        Imputation.objects.create(courrier=cls.concerne_a, service=cls.service_a)
+        cls.tous = {c.id for c in (cls.du_service_a, cls.confidentiel_b, cls.cree_sans_service, cls.archive, cls.concerne_a)}
+
+    def client_de(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
+
+    def visibles(self, user):
+        response = self.client_de(user).get('/api/courriers/courriers/')
+        self.assertEqual(response.status_code, 200)
+        return {c['id'] for c in response.json()['results']}
+
+    def test_liste_filtree_par_role(self):
+        attendus = {
+            self.collaborateur_a: {self.du_service_a.id, self.concerne_a.id},
+            self.sans_service: {self.cree_sans_service.id},
+            self.chef_b: {self.confidentiel_b.id, self.concerne_a.id},
+            self.direction: {self.du_service_a.id, self.cree_sans_service.id, self.concerne_a.id},
+            self.archiviste: {self.archive.id},
+            self.agent: self.tous,
+            self.admin: self.tous,
+            self.superuser: self.tous,
+        }
+        for user, ids in attendus.items():
+            self.assertEqual(self.visibles(user), ids, user.email)
+
+    def test_ecriture_refusee_hors_perimetre(self):
+        client = self.client_de(self.agent)
+        response = client.patch(f'/api/courriers/courriers/{self.confidentiel_b.id}/', {'objet': "Modifié"}, format='json')
+        self.assertEqual(response.status_code, 403)
+        response = client.patch(f'/api/courriers/courriers/{self.du_service_a.id}/', {'objet': "Modifié"}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+        response = self.client_de(self.collaborateur_a).get(f'/api/courriers/courriers/{self.confidentiel_b.id}/')
+        self.assertEqual(response.status_code, 404)
+
+    def test_superutilisateur_ecrit_partout(self):
+        response = self.client_de(self.superuser).patch(
+            f'/api/courriers/courriers/{self.confidentiel_b.id}/', {'objet': "Modifié"}, format='json'
+        )
+        self.assertEqual(response.status_code, 200)
+        self.confidentiel_b.refresh_from_db()
+        self.assertEqual(self.confidentiel_b.objet, "Modifié")
+
+    def lignes(self, courrier):
+        return set(CourrierAcces.objects.filter(courrier=courrier).values_list('service_id', 'user_id', 'motif'))
+
+    def test_lignes_apres_imputation_et_reaffectation(self):
+        courrier = self.du_service_a
+        self.assertEqual(self.lignes(courrier), {(self.service_a.id, None, 'service')})
+
+        Imputation.objects.create(courrier=courrier, service=self.service_b)
+        self.assertEqual(self.lignes(courrier), {
+            (self.service_a.id, None, 'service'), (self.service_b.id, None, 'concerne'),
+        })
+
+        courrier.service_impute = self.service_b
+        courrier.responsable_actuel = self.collaborateur_a
+        courrier.save()
+        self.assertEqual(self.lignes(courrier), {
+            (self.service_b.id, None, 'service'), (None, self.collaborateur_a.id, 'responsable'),
+        })
+        self.assertIn(courrier.id, self.visibles(self.chef_b))
+
+        # Un courrier confidentiel n'ouvre pas l'accès aux services des imputations
+        Imputation.objects.create(courrier=self.confidentiel_b, service=self.service_a)
+        self.assertEqual(self.lignes(self.confidentiel_b), {(self.service_b.id, None, 'service')})
+
+    def test_enregistrement_sans_changement_ne_reecrit_pas(self):
+        courrier = Courrier.objects.get(pk=self.du_service_a.pk)
+        courrier.objet = "Nouvel objet"
+        with CaptureQueriesContext(connection) as requetes:
+            courrier.save()
+        ecritures = [q['sql'] for q in requetes.captured_queries
+                     if 'courrier_acces' in q['sql'] and not q['sql'].startswith('SELECT')]
+        self.assertEqual(ecritures, [])
+
+
+class ReponsesConditionnellesTest(TestCase):
+    """ETag / Last-Modified des lectures de courriers : 304 tant que rien n'a changé"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(email='admin@test.bf', password='x', nom='Admin', prenom='Test')
+        cls.service = Service.objects.create(nom="Service A")
+        cls.courrier = Courrier.objects.create(reference="CE-ETAG-1", type='entrant', objet="Objet")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.url = f'/api/courriers/courriers/{self.courrier.id}/'
+
+    def test_304_sur_if_none_match_et_if_modified_since(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('ETag', response)
+        self.assertIn('Last-Modified', response)
+
+        response_304 = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response_304.status_code, 304)
+        self.assertEqual(response_304.content, b'')
+
+        response_304 = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response_304.status_code, 304)
+
+    def test_etag_change_apres_ecriture_liee(self):
+        etag = self.client.get(self.url)['ETag']
+
+        Imputation.objects.create(courrier=self.courrier, service=self.service)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.json()['imputations']), 1)
+
+        etag = response['ETag']
+        PieceJointe.objects.create(courrier=self.courrier, fichier='courriers/pieces/test.pdf', taille=10)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(len(response.json()['pieces_jointes']), 1)
+
+    def test_liste_conditionnelle(self):
+        etag = self.client.get('/api/courriers/courriers/')['ETag']
+        self.assertEqual(self.client.get('/api/courriers/courriers/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        Imputation.objects.create(courrier=self.courrier, service=self.service)
+        response = self.client.get('/api/courriers/courriers/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_etag_propre_a_l_utilisateur(self):
+        autre = User.objects.create_superuser(email='autre@test.bf', password='x', nom='Autre', prenom='Test')
+        etag = self.client.get(self.url)['ETag']
+
+        client = APIClient()
+        client.force_authenticate(autre)
+        response = client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class ProjectionTest(TestCase):
+    """?fields= / ?expand= : sortie restreinte, colonnes lues et nombre de requêtes"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(email='admin@test.bf', password='x', nom='Admin', prenom='Test')
+        cls.service = Service.objects.create(nom="Service A")
+        cls.courriers = []
+        for i, nombre in enumerate((1, 5)):
+            courrier = Courrier.objects.create(
+                reference=f"CE-PROJ-{i}", type='entrant', objet=f"Objet {i}",
+                contenu_texte="Texte OCR", service_impute=cls.service, created_by=cls.user,
+            )
+            for j in range(nombre):
+                Imputation.objects.create(courrier=courrier, service=cls.service, responsable=cls.user)
+                PieceJointe.objects.create(courrier=courrier, fichier=f'courriers/pieces/{i}-{j}.pdf', taille=10)
+            cls.courriers.append(courrier)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def get(self, url, **params):
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get(url, params)
+        return response, requetes.captured_queries
+
+    def test_fields_restreint_sortie_et_colonnes(self):
+        response, requetes = self.get('/api/courriers/courriers/', fields='id,reference,statut')
+        self.assertEqual(response.status_code, 200)
+        for ligne in response.json()['results']:
+            self.assertEqual(set(ligne), {'id', 'reference', 'statut'})
+
+        sql = ' '.join(q['sql'] for q in requetes if 'FROM "courrier_courrier"' in q['sql'])
+        self.assertNotIn('"objet"', sql)
+        self.assertNotIn('contenu_texte', sql)
+
+        url = f'/api/courriers/courriers/{self.courriers[0].id}/'
+        response, requetes = self.get(url, fields='id,objet,service_impute_detail')
+        self.assertEqual(set(response.json()), {'id', 'objet', 'service_impute_detail'})
+        self.assertEqual(response.json()['service_impute_detail']['nom'], "Service A")
+        self.assertFalse(any('courrier_imputation' in q['sql'] for q in requetes))
+
+    def test_expand_choisit_les_champs_imbriques(self):
+        url = f'/api/courriers/courriers/{self.courriers[1].id}/'
+        response, requetes = self.get(url, expand='pieces_jointes')
+        data = response.json()
+        self.assertEqual(len(data['pieces_jointes']), 5)
+        for champ in ('imputations', 'historiques', 'service_impute_detail', 'created_by_detail'):
+            self.assertNotIn(champ, data)
+        self.assertIn('objet', data)
+        self.assertFalse(any('courrier_imputation' in q['sql'] for q in requetes))
+
+    def test_champs_inconnus_400(self):
+        response = self.client.get('/api/courriers/courriers/', {'fields': 'id,mot_de_passe'})
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('mot_de_passe', response.json()['fields'])
+        self.assertIn('reference', response.json()['disponibles'])
+
+        response = self.client.get(f'/api/courriers/courriers/{self.courriers[0].id}/', {'expand': 'objet'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_nombre_de_requetes_fixe(self):
+        comptes = []
+        for courrier in self.courriers:
+            response, requetes = self.get(f'/api/courriers/courriers/{courrier.id}/')
+            self.assertEqual(response.status_code, 200)
+            comptes.append(len(requetes))
+        self.assertEqual(comptes[0], comptes[1])
+
+        # Champs imbriqués seuls : aucune colonne différée rechargée ligne à ligne
+        response, etendu = self.get(
+            f'/api/courriers/courriers/{self.courriers[1].id}/', fields='id', expand='imputations,historiques'
+        )
+        self.assertEqual(response.json()['imputations'][0]['courrier_reference'], "CE-PROJ-1")
+        lectures_courrier = [q for q in etendu if q['sql'].startswith('SELECT "courrier_courrier"."id"')]
+        self.assertEqual(len(lectures_courrier), 1)
+
+        _, leger = self.get(f'/api/courriers/courriers/{self.courriers[0].id}/', fields='id,reference')
+        self.assertEqual(len(leger), 2)  # version (ETag) + courrier
+        self.assertLess(len(etendu), comptes[0])
+
+
+class CourrierDetailTest(TestCase):
+    """Détail d'un courrier : requêtes en nombre fixe, historique tronqué avec total et lien complet"""
+
+    @classmethod
+    def setUpTestData(cls):
+        from workflow.models import Workflow, WorkflowStep
+
+        cls.user = User.objects.create_superuser(email='admin@test.bf', password='x', nom='Admin', prenom='Test')
+        cls.service = Service.objects.create(nom="Service A")
+        cls.courriers = []
+        for i, nombre in enumerate((1, 30)):
+            courrier = Courrier.objects.create(
+                reference=f"CE-DET-{i}", type='entrant', objet=f"Objet {i}",
+                service_impute=cls.service, created_by=cls.user,
+            )
+            workflow = Workflow.objects.create(courrier=courrier)
+            for j in range(nombre):
+                PieceJointe.objects.create(courrier=courrier, fichier=f'courriers/pieces/det-{i}-{j}.pdf',
+                                           uploaded_by=cls.user, taille=10)
+                Imputation.objects.create(courrier=courrier, service=cls.service, responsable=cls.user)
+                ActionHistorique.objects.create(courrier=courrier, user=cls.user, action=f"ACTION_{j}")
+                WorkflowStep.objects.create(workflow=workflow, step_number=j + 1, label=f"Étape {j + 1}")
+            cls.courriers.append(courrier)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def detail(self, courrier):
+        response = self.client.get(f'/api/courriers/courriers/{courrier.id}/')
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_nombre_de_requetes_independant_des_collections(self):
+        petit, grand = self.courriers
+        with CaptureQueriesContext(connection) as requetes:
+            self.detail(petit)
+
+        with self.assertNumQueries(len(requetes)):
+            data = self.detail(grand)
+        self.assertEqual(len(data['pieces_jointes']), 30)
+        self.assertEqual(len(data['imputations']), 30)
+        self.assertEqual(data['workflow_statut'], {'current_step': 1, 'total_steps': 30})
+
+    def test_historique_tronque_avec_total_et_lien(self):
+        petit, grand = self.courriers
+        limite = CourrierDetailSerializer.HISTORIQUE_LIMITE
+        total = ActionHistorique.objects.filter(courrier=grand).count()
+        self.assertGreater(total, limite)
+
+        data = self.detail(grand)
+        self.assertEqual(len(data['historiques']), limite)
+        self.assertEqual(data['historiques_total'], total)
+        recentes = ActionHistorique.objects.filter(courrier=grand).order_by('-date', '-id')[:limite]
+        self.assertEqual([h['id'] for h in data['historiques']], [h.id for h in recentes])
+        self.assertTrue(data['historiques_url'].endswith(f'/api/courriers/courriers/{grand.id}/historique/'))
+
+        # Le lien donne l'historique complet
+        historique = self.client.get(data['historiques_url'], {'page_size': 100}).json()
+        self.assertEqual(len(historique['results']), total)
+
+        data = self.detail(petit)
+        self.assertEqual(len(data['historiques']), data['historiques_total'])
+
+
+class ImportEncodageTest(TestCase):
+    """L'encodage du CSV est déterminé avant le premier lot : jamais d'import à moitié écrit"""
+
+    def importer(self, contenu, encodage):
+        fichier = io.BytesIO(contenu.encode(encodage))
+        return ImportCourriers('entrant', taille_lot=10).importer(fichier, 'courriers.csv')
+
+    def lignes(self, accent_ligne):
+        lignes = ["objet;expediteur_nom"]
+        for numero in range(2, 31):
+            lignes.append(f"Courrier {numero};{'Hélène' if numero == accent_ligne else 'Paul'}")
+        return "\r\n".join(lignes) + "\r\n"
+
+    def test_latin1_avec_accent_apres_les_premiers_lots(self):
+        rapport = self.importer(self.lignes(accent_ligne=25), 'cp1252')
+
+        self.assertEqual((rapport['total'], rapport['importes'], rapport['erreurs']), (29, 29, []))
+        self.assertTrue(Courrier.objects.filter(objet="Courrier 25", expediteur_nom="Hélène").exists())
+
+    def test_utf8_avec_bom(self):
+        rapport = self.importer(self.lignes(accent_ligne=3), 'utf-8-sig')
+
+        self.assertEqual(rapport['importes'], 29)
+        self.assertTrue(Courrier.objects.filter(objet="Courrier 3", expediteur_nom="Hélène").exists())
+
+
+class ImportXlsxTest(TestCase):
+    """Cellules numériques d'Excel : converties en entier pour les seuls champs entiers"""
+
+    def importer(self, lignes):
+        from openpyxl import Workbook
+
+        classeur = Workbook()
+        for ligne in lignes:
+            classeur.active.append(ligne)
+        fichier = io.BytesIO()
+        classeur.save(fichier)
+        fichier.seek(0)
+        return ImportCourriers('entrant').importer(fichier, 'courriers.xlsx')
+
+    def test_colonnes_texte_non_converties(self):
+        telephone = Courrier._meta.get_field('expediteur_telephone')
+        self.assertEqual(_nettoyer(70123456.0, telephone), 70123456.0)
+        self.assertIsInstance(_nettoyer(70123456.0, telephone), float)
+        self.assertEqual(_nettoyer(" 0612345678 ", telephone), "0612345678")
+
+        entier = ImportJob._meta.get_field('importes')
+        self.assertEqual(_nettoyer(12.0, entier), 12)
+        self.assertIsInstance(_nettoyer(12.0, entier), int)
+        self.assertEqual(_nettoyer(12.5, entier), 12.5)
+
+    def test_import_xlsx_conserve_le_texte_des_cellules(self):
+        rapport = self.importer([
+            ['reference', 'objet', 'expediteur_telephone'],
+            ['CE-XLSX-0012', 'Courrier texte', '0612345678'],
+            ['CE-XLSX-2', 2024.5, '+226 70 12 34 56'],
+        ])
+
+        self.assertEqual((rapport['importes'], rapport['nb_erreurs']), (2, 0))
+        self.assertEqual(Courrier.objects.get(reference='CE-XLSX-0012').expediteur_telephone, '0612345678')
+        courrier = Courrier.objects.get(reference='CE-XLSX-2')
+        self.assertEqual((courrier.objet, courrier.expediteur_telephone), ('2024.5', '+226 70 12 34 56'))
+
+
+MEDIA_TEST = tempfile.mkdtemp()
+
+
+@override_settings(MEDIA_ROOT=MEDIA_TEST, COURRIER_IMPORT_EXECUTION='commande',
+                   COURRIER_IMPORT_TAILLE_LOT=10, COURRIER_IMPORT_DELAI_MAX=600)
+class ImportJobTest(TestCase):
+    """Import en arrière-plan : 202 + Location, progression, rapport d'erreurs, réservation et reprise"""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.addClassCleanup(shutil.rmtree, MEDIA_TEST, ignore_errors=True)
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(email='admin@test.bf', password='x', nom='Admin', prenom='Test')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def contenu(self):
+        """25 lignes dont 3 sans objet (lignes 4, 15 et 24 du fichier)"""
+        lignes = ["objet;expediteur_nom"]
+        for numero in range(2, 27):
+            lignes.append(f"{'' if numero in (4, 15, 24) else f'Courrier {numero}'};Paul")
+        return ("\n".join(lignes) + "\n").encode()
+
+    def deposer(self):
+        fichier = SimpleUploadedFile('courriers.csv', self.contenu(), content_type='text/csv')
+        return self.client.post('/api/courriers/courriers/import_csv/',
+                                {'fichier': fichier, 'type_courrier': 'entrant'}, format='multipart')
+
+    def erreurs_csv(self, job_id):
+        response = self.client.get(f'/api/courriers/imports/{job_id}/erreurs/')
+        self.assertEqual(response.status_code, 200)
+        return response.content.decode().splitlines()
+
+    def test_202_location_progression_et_rapport(self):
+        response = self.deposer()
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['statut'], 'en_attente')
+        self.assertTrue(response['Location'].endswith(f"/api/courriers/imports/{response.json()['id']}/"))
+
+        executer_import(response.json()['id'])
+        data = self.client.get(response['Location']).json()
+        self.assertEqual(
+            (data['statut'], data['progression'], data['total_estime'], data['lignes_traitees'],
+             data['importes'], data['nb_erreurs']),
+            ('termine', 100, 25, 25, 22, 3),
+        )
+        self.assertTrue(data['url_erreurs'].endswith('/erreurs/'))
+        self.assertEqual(self.erreurs_csv(data['id']), [
+            'ligne;champ;message',
+            '4;objet;Ce champ est obligatoire.',
+            '15;objet;Ce champ est obligatoire.',
+            '24;objet;Ce champ est obligatoire.',
+        ])
+        self.assertEqual(Courrier.objects.count(), 22)
+
+    def test_echec_conserve_progression_et_erreurs_puis_reprise(self):
+        job_id = self.deposer().json()['id']
+        importer_lot = ImportCourriers._importer_lot
+        appels = []
+
+        def lot_en_panne(importeur, lot, rapport):
+            appels.append(len(lot))
+            if len(appels) == 2:
+                raise RuntimeError("Worker arrêté")
+            return importer_lot(importeur, lot, rapport)
+
+        with mock.patch.object(ImportCourriers, '_importer_lot', lot_en_panne), \
+                self.assertLogs('courriers.services.import_courriers', 'ERROR'):
+            job = executer_import(job_id)
+
+        # Premier lot validé (lignes 2 à 11, dont la ligne 4 en erreur), second annulé
+        self.assertEqual((job.statut, job.lignes_traitees, job.importes, job.nb_erreurs), ('echec', 10, 9, 1))
+        self.assertEqual(self.erreurs_csv(job_id)[1:], ['4;objet;Ce champ est obligatoire.'])
+        self.assertEqual(Courrier.objects.count(), 9)
+
+        # Worker arrêté en route : le job reste en_cours, sans activité
+        ImportJob.objects.filter(pk=job_id).update(statut='en_cours', actif_le=timezone.now() - timedelta(seconds=601))
+        with self.assertLogs('courriers.services.import_courriers', 'WARNING'):
+            job = executer_import(job_id)
+        self.assertEqual((job.statut, job.lignes_traitees, job.importes, job.nb_erreurs), ('termine', 25, 22, 3))
+        self.assertEqual(Courrier.objects.count(), 22)  # aucun lot importé deux fois
+
+    def test_reservation_atomique(self):
+        job_id = self.deposer().json()['id']
+        ImportJob.objects.filter(pk=job_id).update(statut='en_cours', actif_le=timezone.now())
+        self.assertIsNone(executer_import(job_id))  # pris en charge par un autre worker
+
+        ImportJob.objects.filter(pk=job_id).update(statut='en_attente')
+        self.assertEqual(executer_import(job_id).statut, 'termine')
+        self.assertIsNone(executer_import(job_id))
+        self.assertEqual(Courrier.objects.count(), 22)
+
+    @override_settings(COURRIER_IMPORT_ERREURS_MAX=2)
+    def test_erreurs_plafonnees_et_ecrites_seulement_si_nouvelles(self):
+        job_id = self.deposer().json()['id']
+
+        with CaptureQueriesContext(connection) as requetes:
+            job = executer_import(job_id)
+
+        # 3 lots : le détail des erreurs n'est écrit qu'aux lots qui en ajoutent (lignes 4 puis 15)
+        progressions = [q['sql'] for q in requetes if q['sql'].startswith('UPDATE "courrier_import_job"')
+                        and '"actif_le" =' in q['sql']]
+        self.assertEqual(len([sql for sql in progressions if '"erreurs" =' in sql]), 2)
+        self.assertEqual((job.statut, job.nb_erreurs, len(job.erreurs)), ('termine', 3, 2))
+        self.assertIn("3 lignes en erreur", job.message)
+        self.assertEqual(self.erreurs_csv(job_id), [
+            'ligne;champ;message',
+            '4;objet;Ce champ est obligatoire.',
+            '15;objet;Ce champ est obligatoire.',
+            ';__all__;1 autres lignes en erreur non détaillées',
+        ])
+
+    @override_settings(COURRIER_IMPORT_EXECUTION='tache')
+    def test_import_interrompu_relance_a_la_consultation(self):
+        with mock.patch('courriers.views.lancer_tache') as lancer_tache:
+            job_id = self.deposer().json()['id']
+            self.assertEqual(lancer_tache.call_count, 1)
+
+            ImportJob.objects.filter(pk=job_id).update(statut='en_cours', actif_le=timezone.now())
+            self.client.get(f'/api/courriers/imports/{job_id}/')
+            self.assertEqual(lancer_tache.call_count, 1)
+
+            ImportJob.objects.filter(pk=job_id).update(actif_le=timezone.now() - timedelta(seconds=601))
+            self.client.get(f'/api/courriers/imports/{job_id}/')
+            self.assertEqual(lancer_tache.call_count, 2)
+
+
+class ExportTest(TestCase):
+    """Export en flux : CSV (BOM, ';'), NDJSON, tableau JSON, XLSX et colonnes validées"""
+
+    COLONNES = ['reference', 'objet', 'date_reception', 'service_impute_nom', 'est_en_retard']
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(email='admin@test.bf', password='x', nom='Admin', prenom='Test')
+        service = Service.objects.create(nom="Service RH")
+        # (objet, reçu il y a N jours, échéance dans N jours)
+        for numero, (objet, recu, echeance) in enumerate([("Demande de congé", 2, -1), ("Réclamation; urgente", 1, 3)]):
+            Courrier.objects.create(
+                reference=f"CE-EXP-{numero}", type='entrant', objet=objet,
+                date_reception=timezone.localdate() - timedelta(days=recu),
+                date_echeance=timezone.localdate() + timedelta(days=echeance),
+                service_impute=service if numero == 0 else None, created_by=cls.user,
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def exporter(self, format_export, **donnees):
+        donnees = {'format': format_export, 'colonnes': self.COLONNES, **donnees}
+        return self.client.post('/api/courriers/courriers/export/', donnees, format='json')
+
+    def contenu(self, response):
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('attachment;', response['Content-Disposition'])
+        return b''.join(response.streaming_content)
+
+    def test_csv(self):
+        response = self.exporter('csv')
+        self.assertEqual(response['Content-Type'], 'text/csv; charset=utf-8')
+        texte = self.contenu(response).decode('utf-8')
+
+        self.assertTrue(texte.startswith('\ufeffreference;objet;'))
+        lignes = texte[1:].splitlines()
+        jour = (timezone.localdate() - timedelta(days=1)).isoformat()
+        self.assertEqual(lignes[1:], [
+            f'CE-EXP-1;"Réclamation; urgente";{jour};;False',
+            f'CE-EXP-0;Demande de congé;{(timezone.localdate() - timedelta(days=2)).isoformat()};Service RH;True',
+        ])
+
+    def test_ndjson_et_json(self):
+        lignes = self.contenu(self.exporter('ndjson')).decode().splitlines()
+        self.assertEqual([json.loads(ligne)['reference'] for ligne in lignes], ['CE-EXP-1', 'CE-EXP-0'])
+        self.assertEqual(set(json.loads(lignes[0])), set(self.COLONNES))
+
+        donnees = json.loads(self.contenu(self.exporter('json')))
+        self.assertEqual([ligne['service_impute_nom'] for ligne in donnees], [None, "Service RH"])
+        self.assertEqual(json.loads(self.contenu(self.exporter('json', type_courrier='sortant'))), [])
+
+    def test_xlsx(self):
+        from openpyxl import load_workbook
+
+        response = self.exporter('excel')
+        self.assertTrue(response['Content-Disposition'].endswith('.xlsx"'))
+        feuille = load_workbook(io.BytesIO(self.contenu(response)), read_only=True).active
+        lignes = list(feuille.iter_rows(values_only=True))
+        self.assertEqual(list(lignes[0]), self.COLONNES)
+        self.assertEqual([ligne[0] for ligne in lignes[1:]], ['CE-EXP-1', 'CE-EXP-0'])
+
+    def test_colonnes_inconnues_400(self):
+        response = self.exporter('csv', colonnes=['reference', 'mot_de_passe'])
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('mot_de_passe', str(response.json()['colonnes']))
+
+        self.assertEqual(self.exporter('csv', colonnes=[]).status_code, 400)
+
+
+class PlansRequetesTest(TestCase):
+    """Listes paginées et file d'imputation servies par index, sans tri temporaire"""
+
+    def test_analyser_requetes_strict(self):
+        User.objects.create_user(email='agent@test.bf', password='x', nom='Agent', prenom='Test')
+        sortie = io.StringIO()
+        call_command('analyser_requetes', '--strict', stdout=sortie)
+
+        plans = sortie.getvalue()
+        self.assertIn('✔ courriers.list (périmètre service)', plans)
+        self.assertIn('courrier_acces_perimetre_idx', plans)
+        self.assertIn('✔ imputation-dashboard.list', plans)
+        self.assertIn('courrier_a_imputer_idx', plans)
+
+
+class AnalyseApercuTest(TestCase):
+    """analyze_ai / analyze_complete : même pipeline en mémoire, aucune écriture, fichiers temporaires supprimés"""
+
+    ENDPOINTS = ('/api/courriers/courriers/analyze_ai/', '/api/courriers/courriers/analyze_complete/')
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(email='admin@test.bf', password='x', nom='Admin', prenom='Test')
+        cls.service = Service.objects.create(nom="Service RH")
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.fichiers_ocr = []
+        analyse_gemini = {
+            'classification': {'categorie_suggeree': 'RH', 'service_suggere': 'service rh',
+                               'confiance_service': 0.9, 'confiance_categorie': 0.9},
+            'priorite': {'niveau': 'HAUTE', 'raison': 'Délai légal'},
+            'analyse': {'resume': 'Document confidentiel', 'mots_cles': ['salaire']},
+        }
+        for cible, valeur in (
+            ('ia.services.classifier.knn_router.suggerer_courrier', []),
+            ('workflow.services.gemini_courrier_service.gemini_courrier_service.analyser_courrier', analyse_gemini),
+        ):
+            patcher = mock.patch(cible, return_value=valeur)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def ocr(self, chemin, *args):
+        with open(chemin, 'rb') as f:
+            self.fichiers_ocr.append((chemin, f.read()))
+        return "Texte extrait"
+
+    def poster(self, url, ocr=None):
+        donnees = {
+            'objet': "Demande de régularisation", 'expediteur_nom': "M. Ouédraogo", 'ocr': 'true',
+            'pieces_jointes': [SimpleUploadedFile('scan.pdf', b'%PDF-1.4 contenu', content_type='application/pdf')],
+        }
+        with mock.patch('workflow.services.ocr.process_ocr', side_effect=ocr or self.ocr):
+            return self.client.post(url, donnees, format='multipart')
+
+    def compter_lignes(self):
+        from ia.models import IAResult
+        return Courrier.objects.count(), PieceJointe.objects.count(), IAResult.objects.count()
+
+    def test_aucune_ecriture_et_reponses_identiques(self):
+        avant = self.compter_lignes()
+        reponses = []
+        for url in self.ENDPOINTS:
+            response = self.poster(url)
+            self.assertEqual(response.status_code, 200, url)
+            reponses.append(response.json())
+
+        self.assertEqual(self.compter_lignes(), avant)
+        ai, complete = reponses
+        self.assertEqual(set(ai), set(complete))
+        self.assertEqual(set(ai['classification']), set(complete['classification']))
+        self.assertEqual(set(ai['metadata']), set(complete['metadata']))
+        for data in reponses:
+            self.assertEqual(data['classification']['service_id'], self.service.id)
+            self.assertEqual(data['priorite']['niveau'], 'HAUTE')
+            self.assertEqual(data['confidentialite_suggestion'], 'confidentielle')
+            self.assertEqual(data['metadata']['ocr_text_length'], len("\n--- scan.pdf ---\nTexte extrait\n"))
+
+        # L'OCR a lu une copie temporaire du fichier, supprimée ensuite
+        self.assertEqual(len(self.fichiers_ocr), 2)
+        for chemin, contenu in self.fichiers_ocr:
+            self.assertEqual(contenu, b'%PDF-1.4 contenu')
+            self.assertFalse(os.path.exists(chemin))
+
+    def test_fichiers_temporaires_supprimes_en_cas_erreur(self):
+        chemins = []
+
+        def ocr_en_echec(chemin, *args):
+            chemins.append(chemin)
+            raise RuntimeError("Tesseract indisponible")
+
+        avant = self.compter_lignes()
+        with self.assertLogs('courriers.services.courrier_service', 'ERROR'):
+            response = self.poster(self.ENDPOINTS[0], ocr=ocr_en_echec)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['metadata']['ocr_text_length'], 0)
+
+        # Échec de la classification après l'OCR
+        with mock.patch('courriers.services.courrier_service.classification_cascade.classifier',
+                        side_effect=RuntimeError("quota dépassé")), self.assertLogs('courriers.views', 'ERROR'):
+            response = self.poster(self.ENDPOINTS[1], ocr=lambda chemin, *args: chemins.append(chemin))
+        self.assertEqual(response.status_code, 500)
+
+        self.assertEqual(len(chemins), 2)
+        for chemin in chemins:
+            self.assertFalse(os.path.exists(chemin))
+        self.assertEqual(self.compter_lignes(), avant)
@@ -3,8 +3,7 @@ from rest_framework.routers import DefaultRouter
 from .views import (
     CourrierViewSet, ImputationViewSet,
     PieceJointeViewSet, ModeleCourrierViewSet,
-    ImputationDashboardViewSet
-    
+    ImputationDashboardViewSet, ImportJobViewSet
 )
 
 router = DefaultRouter()
@@ -13,6 +12,7 @@ router.register(r"imputations", ImputationViewSet, basename="imputation")
 router.register(r"pieces-jointes", PieceJointeViewSet, basename="piecejointe")
 router.register(r"modeles", ModeleCourrierViewSet, basename="modelecourrier")
 router.register(r"imputation-dashboard", ImputationDashboardViewSet, basename="imputation-dashboard")
+router.register(r"imports", ImportJobViewSet, basename="importjob")
 
 urlpatterns = [
     path('', include(router.urls)),
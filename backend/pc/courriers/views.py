@@ -1,97 +1,99 @@
+from django.conf import settings
+from django.http import HttpResponse
 from django.utils import timezone
 from django.db import transaction
-from django.db.models import Q, Count, Avg
+from django.db.models import Q, Count, Avg, Max, F
 from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_cache_control, patch_vary_headers
+from django.utils.http import http_date
 from rest_framework import viewsets, status, permissions, filters
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.parsers import  FormParser, JSONParser, MultiPartParser
+from rest_framework.reverse import reverse
 from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from django_filters.rest_framework import DjangoFilterBackend
 
-from .models import Courrier, Imputation, PieceJointe, ActionHistorique, ModeleCourrier
+from .models import Courrier, Imputation, ImportJob, PieceJointe, ActionHistorique, ModeleCourrier, A_IMPUTER, STATUTS_EN_COURS
 from .serializers import (
-    CourrierListSerializer, CourrierDetailSerializer,
+    CourrierListSerializer, CourrierListeRapide, CourrierDetailSerializer,
     CourrierCreateSerializer, CourrierUpdateSerializer,
     ImputationSerializer, ActionHistoriqueSerializer,
     PieceJointeSerializer, ModeleCourrierSerializer,
-    CourrierStatsSerializer, ImportCourrierSerializer,
+    CourrierStatsSerializer, ImportCourrierSerializer, ImportJobSerializer,
     ExportCourrierSerializer
 )
 from workflow.services.ocr import process_ocr
 from workflow.services.accuse_reception import send_accuse_reception_email
 from workflow.services.classifier import classifier_courrier
+from ia.services.classifier import classification_cascade
+from core.services.resolution_noms import resolveur_categories, resolveur_services
+from .services.courrier_service import analyser_apercu
+from .services.recherche import moteur_recherche
+from .services.cache_reponses import cache_reponses
+from .services.export_courriers import ExportCourriers
+from .services.import_courriers import erreurs_csv
+from .services.reference_generator import generer_reference
+from .filters import CourrierFilter, RechercheTexteFilter
+from .permissions import CourrierPermissions, politique_acces
 from core.models import Category, Service
-import uuid
+from core.expressions import JoursEntre
+from core.pagination import PaginationCurseur
+from core.projection import ProjectionMixin
+from core.services.taches import lancer_tache
+from .tasks import traiter_import
+import csv
+import io
 import logging
-import pandas as pd
 import json
-from datetime import datetime, timedelta
+from datetime import timedelta
 from rest_framework.decorators import api_view
-from rest_framework.response import Response
-from rest_framework import status
-from rest_framework.parsers import MultiPartParser, FormParser
-from django.utils import timezone
-from django.db import transaction
-from django.db.models import Q
 # from analyse_data import analyse_data
 
 logger = logging.getLogger(__name__)
 
 
-class CourrierViewSet(viewsets.ModelViewSet):
+class CourrierViewSet(ProjectionMixin, viewsets.ModelViewSet):
     """
     ViewSet complet pour la gestion des courriers
+    Lecture allégée : ?fields=id,reference,statut et ?expand=pieces_jointes
     """
-    permission_classes = [IsAuthenticated]
-    filter_backends = [DjangoFilterBackend, filters.SearchFilter, filters.OrderingFilter]
+    permission_classes = [IsAuthenticated, CourrierPermissions]
+    filter_backends = [DjangoFilterBackend, RechercheTexteFilter, filters.OrderingFilter]
     search_fields = ['reference', 'objet', 'expediteur_nom', 'contenu_texte']
-    ordering_fields = ['created_at', 'date_reception', 'date_echeance', 'priorite']
-    ordering = ['-created_at']
-    
-    filterset_fields = {
-        'type': ['exact', 'in'],
-        'statut': ['exact', 'in'],
-        'priorite': ['exact', 'in'],
-        'confidentialite': ['exact', 'in'],
-        'canal': ['exact', 'in'],
-        'category': ['exact', 'in'],
-        'service_impute': ['exact', 'in'],
-        'created_by': ['exact'],
-        'date_reception': ['gte', 'lte', 'exact'],
-        'date_echeance': ['gte', 'lte', 'exact'],
-    }
+    ordering_fields = [
+        'created_at', 'date_reception', 'date_echeance', 'priorite',
+        'jours_restants', 'delai_traitement',
+    ]
+    ordering = ['-created_at', '-id']
+    filterset_class = CourrierFilter
     
     def get_queryset(self):
-        queryset = Courrier.objects.all()
+        # jours_restants, est_en_retard, delai_traitement calculés en SQL (filtrables, triables)
+        queryset = Courrier.objects.with_deadlines()
         
         # Filtrage par type
         type_courrier = self.request.query_params.get("type")
         if type_courrier:
             queryset = queryset.filter(type=type_courrier)
         
-        # Filtrage par service de l'utilisateur
-        if not self.request.user.is_superuser:
-            user_service = self.request.user.service
-            if user_service:
-                queryset = queryset.filter(
-                    Q(service_impute=user_service) |
-                    Q(service_actuel=user_service) |
-                    Q(responsable_actuel=self.request.user)
-                )
+        # Visibilité de l'utilisateur (politique unique, table CourrierAcces)
+        queryset = politique_acces.filtrer(queryset, self.request.user)
         
         # Filtrage des courriers en retard
         if self.request.query_params.get("en_retard") == "true":
-            queryset = queryset.filter(
-                date_echeance__lt=timezone.now().date(),
-                statut__in=['recu', 'impute', 'traitement']
-            )
+            queryset = queryset.en_retard()
         
         # Filtrage des courriers urgents
         if self.request.query_params.get("urgent") == "true":
             queryset = queryset.filter(priorite='urgente')
         
+        # Colonnes et jointures limitées aux champs demandés (?fields=, ?expand=)
+        if self.action == 'search':
+            queryset = CourrierListSerializer.optimiser_queryset(queryset)
+        queryset = self.projeter(queryset)
+        
         return queryset
     
     def get_serializer_class(self):
@@ -106,6 +108,71 @@ class CourrierViewSet(viewsets.ModelViewSet):
             return [AllowAny()]
         return super().get_permissions()
     
+    def list(self, request, *args, **kwargs):
+        """
+        Liste avec ETag : tant que ni les courriers visibles ni la page demandée
+        n'ont changé, une seule requête d'agrégat (max(updated_at), count) est faite.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        version = queryset.order_by().aggregate(derniere=Max('updated_at'), nombre=Count('pk'))
+        etag = cache_reponses.etag(request, version['derniere'], version['nombre'])
+        return self._reponse_conditionnelle(request, etag, None, self._lister, queryset)
+    
+    def _lister(self, request, queryset):
+        """Page de la liste : chemin rapide values() (CourrierListeRapide), serializer si ?fields=/?expand="""
+        if self.champs_demandes() is not None:
+            page = self.paginate_queryset(queryset)
+            data = self.get_serializer(page if page is not None else queryset, many=True).data
+        else:
+            lignes = CourrierListeRapide.valeurs(queryset)
+            page = self.paginate_queryset(lignes)
+            data = CourrierListeRapide.serialiser(page if page is not None else lignes)
+        
+        if page is not None:
+            return self.get_paginated_response(data)
+        return Response(data)
+    
+    def retrieve(self, request, *args, **kwargs):
+        """
+        Détail avec ETag / Last-Modified : tant que le courrier n'a pas changé,
+        une seule lecture indexée de updated_at est faite (304 ou cache).
+        """
+        try:
+            updated_at = politique_acces.filtrer(
+                Courrier.objects.filter(pk=kwargs.get(self.lookup_url_kwarg or self.lookup_field)),
+                request.user,
+            ).values_list('updated_at', flat=True).first()
+        except (TypeError, ValueError):
+            updated_at = None
+        
+        if updated_at is None:
+            return super().retrieve(request, *args, **kwargs)  # 404 habituel
+        
+        etag = cache_reponses.etag(request, kwargs.get(self.lookup_url_kwarg or self.lookup_field), updated_at.isoformat())
+        derniere_modification = cache_reponses.derniere_modification(updated_at)
+        return self._reponse_conditionnelle(request, etag, derniere_modification, super().retrieve, *args, **kwargs)
+    
+    def _reponse_conditionnelle(self, request, etag, derniere_modification, produire, *args, **kwargs):
+        """304 si le client a déjà cette version, sinon représentation en cache ou recalculée"""
+        horodatage = int(derniere_modification.timestamp()) if derniere_modification else None
+        
+        response = get_conditional_response(request, etag=etag, last_modified=horodatage)
+        if response is None:
+            data = cache_reponses.lire(etag)
+            if data is None:
+                response = produire(request, *args, **kwargs)
+                if response.status_code == status.HTTP_200_OK:
+                    cache_reponses.ecrire(etag, response.data)
+            else:
+                response = Response(data)
+        
+        response['ETag'] = etag
+        if horodatage:
+            response['Last-Modified'] = http_date(horodatage)
+        patch_cache_control(response, private=True, no_cache=True)
+        patch_vary_headers(response, ('Authorization', 'Cookie'))
+        return response
+    
     @transaction.atomic
     def create(self, request, *args, **kwargs):
         """Création d'un courrier avec gestion des pièces jointes"""
@@ -306,42 +373,79 @@ class CourrierViewSet(viewsets.ModelViewSet):
             status=status.HTTP_200_OK
         )
     
+    @action(detail=True, methods=['get'])
+    def historique(self, request, pk=None):
+        """Historique complet d'un courrier, paginé par curseur (?cursor=... ou ?page=2)"""
+        courrier = self.get_object()
+        historiques = ActionHistorique.objects.filter(courrier=courrier).select_related('user', 'courrier')
+        
+        paginator = PaginationCurseur()
+        paginator.ordering = ('-date', '-id')
+        page = paginator.paginate_queryset(historiques, request)
+        serializer = ActionHistoriqueSerializer(page, many=True, context={'request': request})
+        return paginator.get_paginated_response(serializer.data)
+    
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        Recherche plein texte classée par pertinence, avec extraits surlignés
+        ?q=facture+electricite&limite=20
+        """
+        texte = request.query_params.get('q', '').strip()
+        if not texte:
+            return Response({"error": "Paramètre q requis"}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            limite = min(max(int(request.query_params.get('limite', 20)), 1), 100)
+        except ValueError:
+            return Response({"error": "limite invalide"}, status=status.HTTP_400_BAD_REQUEST)
+
+        resultats = moteur_recherche.rechercher(texte, queryset=self.get_queryset(), limite=limite)
+        courriers = CourrierListSerializer.optimiser_queryset(Courrier.objects.all()).in_bulk(
+            [r['id'] for r in resultats]
+        )
+
+        data = []
+        for resultat in resultats:
+            courrier = courriers.get(resultat['id'])
+            if courrier is None:
+                continue
+            data.append({
+                **CourrierListSerializer(courrier, context={'request': request}).data,
+                'rang': resultat['rang'],
+                'extrait': resultat['extrait'],
+            })
+
+        return Response({'count': len(data), 'results': data})
+    
     @action(detail=False, methods=['get'])
     def statistiques(self, request):
-        """Récupérer les statistiques des courriers"""
+        """Récupérer les statistiques des courriers (une seule requête d'agrégat)"""
         queryset = self.get_queryset()
         
-        stats = {
-            'total': queryset.count(),
-            'entrants': queryset.filter(type='entrant').count(),
-            'sortants': queryset.filter(type='sortant').count(),
-            'internes': queryset.filter(type='interne').count(),
-            'en_cours': queryset.filter(statut__in=['recu', 'impute', 'traitement']).count(),
-            'en_retard': queryset.filter(
-                date_echeance__lt=timezone.now().date(),
-                statut__in=['recu', 'impute', 'traitement']
-            ).count(),
-            'traites': queryset.filter(statut='repondu').count(),
-            'taux_traitement': 0,
-            'delai_moyen': 0
-        }
+        en_cours = Q(statut__in=STATUTS_EN_COURS)
+        traites = Q(statut='repondu')
+        stats = queryset.order_by().aggregate(
+            total=Count('pk'),
+            entrants=Count('pk', filter=Q(type='entrant')),
+            sortants=Count('pk', filter=Q(type='sortant')),
+            internes=Count('pk', filter=Q(type='interne')),
+            en_cours=Count('pk', filter=en_cours),
+            en_retard=Count('pk', filter=en_cours & Q(date_echeance__lt=timezone.localdate())),
+            traites=Count('pk', filter=traites),
+            # Délai moyen de traitement (jours) calculé en base
+            delai_moyen=Avg(
+                JoursEntre(F('date_reception'), F('date_cloture')),
+                filter=traites & Q(date_reception__isnull=False, date_cloture__isnull=False),
+            ),
+        )
         
         # Calcul du taux de traitement
+        stats['taux_traitement'] = 0
         if stats['total'] > 0:
             stats['taux_traitement'] = round((stats['traites'] / stats['total']) * 100, 2)
         
-        # Calcul du délai moyen de traitement
-        courriers_traites = queryset.filter(
-            statut='repondu',
-            date_reception__isnull=False,
-            date_cloture__isnull=False
-        )
-        if courriers_traites.exists():
-            delais = [
-                (c.date_cloture - c.date_reception).days 
-                for c in courriers_traites
-            ]
-            stats['delai_moyen'] = round(sum(delais) / len(delais), 2)
+        stats['delai_moyen'] = round(float(stats['delai_moyen']), 2) if stats['delai_moyen'] is not None else 0
         
         serializer = CourrierStatsSerializer(stats)
         return Response(serializer.data)
@@ -356,56 +460,23 @@ class CourrierViewSet(viewsets.ModelViewSet):
         type_courrier = serializer.validated_data['type_courrier']
         mapping = serializer.validated_data.get('mapping', {})
         
-        try:
-            # Lire le fichier
-            if fichier.name.endswith('.csv'):
-                df = pd.read_csv(fichier)
-            elif fichier.name.endswith(('.xlsx', '.xls')):
-                df = pd.read_excel(fichier)
-            else:
-                return Response(
-                    {"error": "Format de fichier non supporté"},
-                    status=status.HTTP_400_BAD_REQUEST
-                )
-            
-            # Appliquer le mapping
-            if mapping:
-                df = df.rename(columns=mapping)
-            
-            # Importer les courriers
-            resultats = []
-            for _, row in df.iterrows():
-                try:
-                    courrier = Courrier.objects.create(
-                        reference=self._generate_reference(type_courrier),
-                        type=type_courrier,
-                        objet=row.get('objet', ''),
-                        expediteur_nom=row.get('expediteur_nom', ''),
-                        expediteur_email=row.get('expediteur_email', ''),
-                        date_reception=row.get('date_reception') or timezone.now().date(),
-                        created_by=request.user
-                    )
-                    resultats.append({
-                        'reference': courrier.reference,
-                        'status': 'success'
-                    })
-                except Exception as e:
-                    resultats.append({
-                        'ligne': _ + 1,
-                        'status': 'error',
-                        'error': str(e)
-                    })
-            
-            return Response({
-                "message": f"Import terminé: {len([r for r in resultats if r['status'] == 'success'])} succès",
-                "resultats": resultats
-            })
-            
-        except Exception as e:
-            return Response(
-                {"error": f"Erreur import: {str(e)}"},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
+        if not fichier.name.lower().endswith(('.csv', '.xlsx')):
+            return Response({"error": "Format de fichier non supporté (CSV ou XLSX)"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Traitement en arrière-plan : suivre la progression sur /imports/<id>/
+        job = ImportJob.objects.create(
+            fichier=fichier,
+            nom_fichier=fichier.name,
+            type_courrier=type_courrier,
+            mapping=mapping,
+            created_by=request.user,
+        )
+        if getattr(settings, 'COURRIER_IMPORT_EXECUTION', 'tache') == 'tache':
+            lancer_tache(traiter_import, job.pk)
+        
+        data = ImportJobSerializer(job, context={'request': request}).data
+        data['url'] = reverse('importjob-detail', args=[job.pk], request=request)
+        return Response(data, status=status.HTTP_202_ACCEPTED, headers={'Location': data['url']})
     
     @action(detail=False, methods=['post'])
     def export(self, request):
@@ -428,50 +499,20 @@ class CourrierViewSet(viewsets.ModelViewSet):
         if type_courrier != 'tous':
             queryset = queryset.filter(type=type_courrier)
         
-        # Préparer les données
-        data = []
-        for courrier in queryset:
-            item = {}
-            for colonne in colonnes:
-                if hasattr(courrier, colonne):
-                    value = getattr(courrier, colonne)
-                    if isinstance(value, datetime):
-                        value = value.strftime('%Y-%m-%d %H:%M')
-                    item[colonne] = value
-                elif colonne == 'category_nom' and courrier.category:
-                    item[colonne] = courrier.category.name
-                elif colonne == 'service_impute_nom' and courrier.service_impute:
-                    item[colonne] = courrier.service_impute.nom
-            data.append(item)
-        
-        # Exporter selon le format
-        if format == 'json':
-            return Response(data)
-        elif format == 'csv':
-            # Implémenter la génération CSV
-            pass
-        elif format == 'excel':
-            # Implémenter la génération Excel
-            pass
-        elif format == 'pdf':
-            # Implémenter la génération PDF
-            pass
-        
-        return Response(
-            {"message": "Export non implémenté pour ce format"},
-            status=status.HTTP_501_NOT_IMPLEMENTED
-        )
+        if format == 'pdf':
+            return Response(
+                {"message": "Export non implémenté pour ce format"},
+                status=status.HTTP_501_NOT_IMPLEMENTED
+            )
+
+        # Lecture en flux : lignes par lots, ordre stable pour les exports volumineux
+        queryset = queryset.prefetch_related(None).order_by('-date_reception', '-id')
+        return ExportCourriers(queryset, colonnes).reponse(format)
     
     # Méthodes utilitaires
     def _generate_reference(self, type_courrier):
         """Générer une référence unique"""
-        prefixes = {
-            'entrant': 'CE',
-            'sortant': 'CS',
-            'interne': 'CI'
-        }
-        prefix = prefixes.get(type_courrier, 'CR')
-        return f"{prefix}/{timezone.now().year}/{uuid.uuid4().hex[:6].upper()}"
+        return generer_reference(type_courrier)
     
     def _process_pieces_jointes(self, fichiers, courrier, user, ocr_enabled):
         """Traiter les pièces jointes et OCR"""
@@ -496,41 +537,42 @@ class CourrierViewSet(viewsets.ModelViewSet):
         return texte_ocr_global
     
     def _process_classification_ia(self, courrier, user):
-        """Traiter la classification IA"""
+        """Traiter la classification IA (cascade règles -> k-NN -> Gemini)"""
         try:
-            result = classifier_courrier(courrier)
+            analyse = classification_cascade.classifier(courrier)
+            result = analyse.get('classification', {})
             
-            if result and 'category' in result:
-                # Mettre à jour la catégorie
-                category_name = result['category']
-                category = Category.objects.filter(name__icontains=category_name).first()
-                if category:
-                    courrier.category = category
+            # Résoudre les noms suggérés en ids (dictionnaire en mémoire, pas de LIKE)
+            result['categorie_id'] = result.get('categorie_id') or resolveur_categories.resoudre(result.get('categorie_suggeree'))
+            result['service_id'] = result.get('service_id') or resolveur_services.resoudre(result.get('service_suggere'))
             
-            if result and 'service_impute' in result:
-                # Mettre à jour le service
-                service_name = result['service_impute']
-                service = Service.objects.filter(nom__icontains=service_name).first()
-                if service:
-                    courrier.service_impute = service
-                    courrier.statut = 'impute'
-                    
-                    # Créer l'imputation
-                    Imputation.objects.create(
-                        courrier=courrier,
-                        service=service,
-                        responsable=user,
-                        suggestion_ia=True,
-                        score_ia=result.get('confidence', 0.0)
-                    )
+            # Mettre à jour la catégorie
+            if result['categorie_id']:
+                courrier.category_id = result['categorie_id']
+            
+            # Mettre à jour le service
+            if result['service_id']:
+                courrier.service_impute_id = result['service_id']
+                courrier.statut = 'impute'
+                
+                # Créer l'imputation
+                Imputation.objects.create(
+                    courrier=courrier,
+                    service_id=result['service_id'],
+                    responsable=user,
+                    suggestion_ia=True,
+                    score_ia=result.get('confiance_service', 0.0)
+                )
             
             courrier.save()
+            classification_cascade.enregistrer(courrier, analyse)
             
             ActionHistorique.objects.create(
                 courrier=courrier,
                 user=user,
                 action="CLASSIFICATION_IA",
-                commentaire=f"Catégorie: {result.get('category', 'N/A')}"
+                commentaire=f"Catégorie: {result.get('categorie_suggeree') or 'N/A'} "
+                            f"(niveau {analyse['cascade']['niveau']})"
             )
             
         except Exception as e:
@@ -862,119 +904,22 @@ class CourrierViewSet(viewsets.ModelViewSet):
         """
         Analyse d'un courrier avec IA sans le créer
         """
+        return self._analyser_apercu(request)
+    
+    @action(detail=False, methods=['post'], parser_classes=[MultiPartParser, FormParser])
+    def analyze_complete(self, request):
+        """
+        Analyse complète d'un courrier avec IA pour suggestions
+        """
+        return self._analyser_apercu(request)
+    
+    def _analyser_apercu(self, request):
+        """Pipeline de prévisualisation commun : tout en mémoire, aucune écriture en base"""
         try:
-            # Créer un objet courrier temporaire pour l'analyse
-            courrier_data = {
-                'objet': request.data.get('objet', ''),
-                'expediteur_nom': request.data.get('expediteur_nom', ''),
-                'expediteur_email': request.data.get('expediteur_email', ''),
-                'expediteur_adresse': request.data.get('expediteur_adresse', ''),
-                'date_reception': request.data.get('date_reception'),
-                'canal': request.data.get('canal', 'physique'),
-                'confidentialite': request.data.get('confidentialite', 'normale'),
-                'priorite': request.data.get('priorite', 'normale'),
-                'type': 'entrant'
-            }
-            
-            # Traiter l'OCR si demandé
-            texte_ocr = ""
-            if request.data.get('ocr') == 'true':
-                for fichier in request.FILES.getlist('pieces_jointes', []):
-                    try:
-                        import tempfile
-                        with tempfile.NamedTemporaryFile(delete=False, suffix=fichier.name) as tmp:
-                            for chunk in fichier.chunks():
-                                tmp.write(chunk)
-                            tmp_path = tmp.name
-                        
-                        from workflow.services.ocr import process_ocr
-                        texte = process_ocr(tmp_path, None)
-                        if texte:
-                            texte_ocr += f"\n--- {fichier.name} ---\n{texte}\n"
-                        
-                        import os
-                        os.unlink(tmp_path)
-                        
-                    except Exception as e:
-                        logger.error(f"Erreur OCR fichier {fichier.name}: {e}")
-            
-            # Créer un courrier temporaire en base de données
-            from courriers.models import Courrier
-            from django.utils import timezone
-            
-            temp_courrier = Courrier.objects.create(
-                reference="TEMP_ANALYSE_" + str(uuid.uuid4())[:8],
-                type='entrant',
-                objet=courrier_data.get('objet', ''),
-                expediteur_nom=courrier_data.get('expediteur_nom', ''),
-                expediteur_email=courrier_data.get('expediteur_email', ''),
-                expediteur_adresse=courrier_data.get('expediteur_adresse', ''),
-                date_reception=courrier_data.get('date_reception') or timezone.now().date(),
-                canal=courrier_data.get('canal', 'physique'),
-                confidentialite=courrier_data.get('confidentialite', 'normale'),
-                priorite=courrier_data.get('priorite', 'normale'),
-                created_by=request.user,
-                contenu_texte=texte_ocr
+            analyse_data = analyser_apercu(
+                request.data,
+                request.FILES.getlist('pieces_jointes', [])
             )
-            
-            analyse_data = None
-            
-            try:
-                # Utiliser le service Gemini
-                from workflow.services.gemini_courrier_service import gemini_courrier_service
-                analyse_data = gemini_courrier_service.analyser_courrier(temp_courrier)
-            except Exception as e:
-                logger.error(f"Erreur lors de l'appel à Gemini: {e}")
-                # En cas d'erreur, utiliser le classifieur local
-                from workflow.services.classifier import classifier_courrier
-                result = classifier_courrier(temp_courrier)
-                
-                # Formater la réponse
-                analyse_data = {
-                    "classification": {
-                        "categorie_suggeree": result.get('category', 'ADMINISTRATIF'),
-                        "service_suggere": result.get('service_impute', 'Secrétariat Général'),
-                        "confiance_categorie": result.get('confidence', 0.5),
-                        "confiance_service": result.get('confidence', 0.5)
-                    },
-                    "priorite": {
-                        "niveau": result.get('priorite', 'NORMALE'),
-                        "raison": "Analyse locale (Gemini indisponible)"
-                    }
-                }
-            
-            # Rechercher les IDs pour la catégorie et le service à partir des noms
-            from core.models import Category, Service
-            
-            categorie_nom = analyse_data.get("classification", {}).get("categorie_suggeree")
-            service_nom = analyse_data.get("classification", {}).get("service_suggere")
-            
-            categorie_id = None
-            service_id = None
-            
-            if categorie_nom:
-                try:
-                    categorie = Category.objects.filter(name__icontains=categorie_nom).first()
-                    categorie_id = categorie.id if categorie else None
-                except Exception as e:
-                    logger.error(f"Erreur recherche catégorie {categorie_nom}: {e}")
-            
-            if service_nom:
-                try:
-                    service = Service.objects.filter(nom__icontains=service_nom).first()
-                    service_id = service.id if service else None
-                except Exception as e:
-                    logger.error(f"Erreur recherche service {service_nom}: {e}")
-            
-            # Mettre à jour l'analyse_data avec les IDs
-            if 'classification' not in analyse_data:
-                analyse_data['classification'] = {}
-            analyse_data['classification']['categorie_id'] = categorie_id
-            analyse_data['classification']['service_id'] = service_id
-            
-            # Supprimer le courrier temporaire
-            temp_courrier.delete()
-            
             return Response(analyse_data, status=status.HTTP_200_OK)
                 
         except Exception as e:
@@ -1037,9 +982,10 @@ class CourrierViewSet(viewsets.ModelViewSet):
 
 class ImputationViewSet(viewsets.ModelViewSet):
     """ViewSet pour la gestion des imputations"""
-    queryset = Imputation.objects.all().order_by('-date_imputation')
+    queryset = Imputation.objects.select_related('courrier', 'service__chef', 'responsable').order_by('-date_imputation', '-id')
     serializer_class = ImputationSerializer
     permission_classes = [IsAuthenticated]
+    pagination_ordering = ('-date_imputation', '-id')
     
     def get_queryset(self):
         queryset = super().get_queryset()
@@ -1064,9 +1010,10 @@ class ImputationViewSet(viewsets.ModelViewSet):
 
 class PieceJointeViewSet(viewsets.ModelViewSet):
     """ViewSet pour la gestion des pièces jointes"""
-    queryset = PieceJointe.objects.all().order_by('-uploaded_at')
+    queryset = PieceJointe.objects.select_related('courrier', 'uploaded_by').order_by('-uploaded_at', '-id')
     serializer_class = PieceJointeSerializer
     permission_classes = [IsAuthenticated]
+    pagination_ordering = ('-uploaded_at', '-id')
     parser_classes = [MultiPartParser, FormParser]
     
     def get_queryset(self):
@@ -1116,6 +1063,40 @@ class ModeleCourrierViewSet(viewsets.ModelViewSet):
             "modele": modele.nom
         })
     
+class ImportJobViewSet(viewsets.ReadOnlyModelViewSet):
+    """
+    Suivi des imports de courriers lancés par CourrierViewSet.import_csv :
+    progression (GET /imports/<id>/) et rapport d'erreurs CSV (/imports/<id>/erreurs/).
+    En exécution 'tache', un import interrompu (thread ou worker arrêté) est
+    relancé quand sa progression est consultée ; il reprend après le dernier lot validé.
+    """
+    serializer_class = ImportJobSerializer
+    permission_classes = [IsAuthenticated]
+    
+    def get_queryset(self):
+        queryset = ImportJob.objects.select_related('created_by').defer('erreurs')
+        if not self.request.user.is_superuser:
+            queryset = queryset.filter(created_by=self.request.user)
+        return queryset
+    
+    def retrieve(self, request, *args, **kwargs):
+        job = self.get_object()
+        if job.est_interrompu and getattr(settings, 'COURRIER_IMPORT_EXECUTION', 'tache') == 'tache':
+            lancer_tache(traiter_import, job.pk)
+        return Response(self.get_serializer(job).data)
+    
+    @action(detail=True, methods=['get'])
+    def erreurs(self, request, pk=None):
+        """Rapport d'erreurs de l'import (CSV : ligne, champ, message)"""
+        job = get_object_or_404(self.get_queryset().defer(None), pk=pk)
+        
+        tampon = io.StringIO()
+        csv.writer(tampon, delimiter=';').writerows(erreurs_csv(job))
+        response = HttpResponse(tampon.getvalue(), content_type='text/csv; charset=utf-8')
+        response['Content-Disposition'] = f'attachment; filename="erreurs_import_{job.pk}.csv"'
+        return response
+
+
 # Dans views.py, ajoutez cette classe
 class ImputationDashboardViewSet(viewsets.ViewSet):
     """
@@ -1129,10 +1110,9 @@ class ImputationDashboardViewSet(viewsets.ViewSet):
         """
         try:
             # Courriers en attente d'imputation (statut = 'recu')
-            courriers_en_attente = Courrier.objects.filter(
-                Q(statut='recu') | Q(service_impute__isnull=True),
-                archived=False
-            ).select_related('category', 'service_impute').order_by('-date_reception')
+            courriers_en_attente = Courrier.objects.filter(A_IMPUTER).select_related(
+                'category', 'service_impute', 'ia_result', 'ia_result__service_suggere'
+            ).defer('meta_analyse')
             
             # Filtrer par type si spécifié
             type_courrier = request.query_params.get('type')
@@ -1142,23 +1122,28 @@ class ImputationDashboardViewSet(viewsets.ViewSet):
             # Appliquer d'autres filtres
             search = request.query_params.get('search')
             if search:
-                courriers_en_attente = courriers_en_attente.filter(
-                    Q(objet__icontains=search) |
-                    Q(reference__icontains=search) |
-                    Q(expediteur_nom__icontains=search)
-                )
+                courriers_en_attente = moteur_recherche.filtrer(courriers_en_attente, search)
+            
+            # Pagination par curseur (created_at, id)
+            paginator = PaginationCurseur()
+            page = paginator.paginate_queryset(courriers_en_attente, request)
             
             # Serializer pour l'imputation
             data = []
-            for courrier in courriers_en_attente:
-                # Analyser les suggestions IA si disponibles
+            for courrier in page:
+                # Suggestions IA précalculées (colonnes d'IAResult, jointure)
                 suggestions_ia = []
-                if courrier.meta_analyse and 'classification' in courrier.meta_analyse:
+                ia_result = getattr(courrier, 'ia_result', None)
+                if ia_result and ia_result.service_suggere_id:
                     suggestions_ia = [
                         {
-                            'service_id': courrier.meta_analyse['classification'].get('service_id'),
-                            'service_nom': courrier.meta_analyse['classification'].get('service_suggere'),
-                            'confiance': courrier.meta_analyse['classification'].get('confiance_service', 0)
+                            'service_id': ia_result.service_suggere_id,
+                            'service_nom': ia_result.service_suggere.nom,
+                            'confiance': ia_result.confiance_service,
+                            'categorie_id': ia_result.categorie_predite_id,
+                            'confiance_categorie': ia_result.confiance_categorie,
+                            'modele': ia_result.modele,
+                            'date_analyse': ia_result.date_analyse,
                         }
                     ]
                 
@@ -1178,12 +1163,11 @@ class ImputationDashboardViewSet(viewsets.ViewSet):
                     'statut': courrier.statut,
                     'confidentialite': courrier.confidentialite,
                     'priorite': courrier.priorite,
-                    'meta_analyse': courrier.meta_analyse,
                     'suggestions_ia': suggestions_ia,
                     'has_ia_suggestion': bool(suggestions_ia)
                 })
             
-            return Response(data, status=status.HTTP_200_OK)
+            return paginator.get_paginated_response(data)
             
         except Exception as e:
             logger.error(f"Erreur récupération dashboard imputation: {e}")
@@ -1219,7 +1203,7 @@ class ImputationDashboardViewSet(viewsets.ViewSet):
                     archived=False
                 ).count(),
                 'avec_suggestion_ia': Courrier.objects.filter(
-                    meta_analyse__isnull=False,
+                    ia_result__service_suggere__isnull=False,
                     archived=False
                 ).count(),
             }
@@ -1229,129 +1213,3 @@ class ImputationDashboardViewSet(viewsets.ViewSet):
         except Exception as e:
             logger.error(f"Erreur statistiques imputation: {e}")
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
-
-# Dans views.py, ajoutez cette action dans CourrierViewSet
-@action(detail=False, methods=['post'], parser_classes=[MultiPartParser, FormParser])
-def analyze_complete(self, request):
-    """
-    Analyse complète d'un courrier avec IA pour suggestions
-    """
-    try:
-        # Extraire les données du formulaire
-        data = {
-            'objet': request.data.get('objet', ''),
-            'expediteur_nom': request.data.get('expediteur_nom', ''),
-            'expediteur_email': request.data.get('expediteur_email', ''),
-            'expediteur_adresse': request.data.get('expediteur_adresse', ''),
-            'date_reception': request.data.get('date_reception'),
-            'canal': request.data.get('canal', 'physique'),
-            'confidentialite': request.data.get('confidentialite', 'normale'),
-            'priorite': request.data.get('priorite', 'normale'),
-            'type': 'entrant'
-        }
-        
-        # Traiter l'OCR si demandé
-        texte_ocr = ""
-        if request.data.get('ocr') == 'true':
-            for fichier in request.FILES.getlist('pieces_jointes', []):
-                try:
-                    import tempfile
-                    import os
-                    with tempfile.NamedTemporaryFile(delete=False, suffix=fichier.name) as tmp:
-                        for chunk in fichier.chunks():
-                            tmp.write(chunk)
-                        tmp_path = tmp.name
-                    
-                    from workflow.services.ocr import process_ocr
-                    texte = process_ocr(tmp_path, None)
-                    if texte:
-                        texte_ocr += f"\n--- {fichier.name} ---\n{texte}\n"
-                    
-                    os.unlink(tmp_path)
-                    
-                except Exception as e:
-                    logger.error(f"Erreur OCR fichier {fichier.name}: {e}")
-        
-        # Analyser avec IA
-        from workflow.services.gemini_courrier_service import gemini_courrier_service
-        
-        # Créer un objet courrier factice
-        class MockCourrier:
-            def __init__(self, data, texte_ocr):
-                self.id = 0
-                self.reference = "TEMP_ANALYSE"
-                self.objet = data.get('objet', '')
-                self.contenu_texte = texte_ocr
-                self.expediteur_nom = data.get('expediteur_nom', '')
-                self.expediteur_email = data.get('expediteur_email', '')
-                self.expediteur_adresse = data.get('expediteur_adresse', '')
-                self.date_reception = data.get('date_reception')
-                self.canal = data.get('canal', 'physique')
-                self.confidentialite = data.get('confidentialite', 'normale')
-                self.type = data.get('type', 'entrant')
-        
-        mock_courrier = MockCourrier(data, texte_ocr)
-        analyse_data = gemini_courrier_service.analyser_courrier(mock_courrier)
-        
-        if not analyse_data:
-            return Response(
-                {"error": "L'analyse IA a échoué"},
-                status=status.HTTP_500_INTERNAL_SERVER_ERROR
-            )
-        
-        # Enrichir avec les IDs des objets
-        from core.models import Category, Service
-        
-        # Chercher la catégorie correspondante
-        categorie_nom = analyse_data.get("classification", {}).get("categorie_suggeree")
-        category = None
-        if categorie_nom:
-            category = Category.objects.filter(name__icontains(categorie_nom)).first()
-        
-        # Chercher le service correspondant
-        service_nom = analyse_data.get("classification", {}).get("service_suggere")
-        service = None
-        if service_nom:
-            service = Service.objects.filter(nom__icontains(service_nom)).first()
-        
-        # Préparer la réponse
-        response_data = {
-            "success": True,
-            "analyse": analyse_data.get("analyse", {}),
-            "classification": {
-                "categorie_suggeree": categorie_nom,
-                "service_suggere": service_nom,
-                "categorie_id": category.id if category else None,
-                "service_id": service.id if service else None,
-                "confiance_categorie": analyse_data.get("classification", {}).get("confiance_categorie", 0),
-                "confiance_service": analyse_data.get("classification", {}).get("confiance_service", 0)
-            },
-            "priorite": {
-                "niveau": analyse_data.get("priorite", {}).get("niveau", "NORMALE"),
-                "raison": analyse_data.get("priorite", {}).get("raison", ""),
-                "confiance": 0.8  # Valeur par défaut
-            },
-            "metadata": {
-                "timestamp": timezone.now().isoformat(),
-                "ocr_applied": request.data.get('ocr') == 'true',
-                "ocr_text_length": len(texte_ocr)
-            }
-        }
-        
-        # Ajouter une suggestion de confidentialité basée sur l'analyse
-        confidentialite_suggestion = "normale"
-        if "confidentiel" in (analyse_data.get("analyse", {}).get("resume", "") + analyse_data.get("analyse", {}).get("mots_cles", "")).lower():
-            confidentialite_suggestion = "confidentielle"
-        elif "restreint" in (analyse_data.get("analyse", {}).get("resume", "") + analyse_data.get("analyse", {}).get("mots_cles", "")).lower():
-            confidentialite_suggestion = "restreinte"
-        
-        response_data["confidentialite_suggestion"] = confidentialite_suggestion
-        
-        return Response(response_data, status=status.HTTP_200_OK)
-        
-    except Exception as e:
-        logger.error(f"Erreur analyse complète: {e}", exc_info=True)
-        return Response(
-            {"error": f"Erreur lors de l'analyse: {str(e)}"},
-            status=status.HTTP_500_INTERNAL_SERVER_ERROR
-        )
\ No newline at end of file
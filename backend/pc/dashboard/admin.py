@@ -1,10 +1,18 @@
 from django.contrib import admin
-from .models import RapportStatistique
+from .models import RapportStatistique, StatJour
 
 
 @admin.register(RapportStatistique)
 class RapportAdmin(admin.ModelAdmin):
-    list_display = ("titre", "periode_debut", "periode_fin", "created_at", "generated_by")
+    list_display = ("titre", "periode_debut", "periode_fin", "statut", "created_at", "generated_by")
     search_fields = ("titre", "generated_by")
     list_filter = ("periode_debut", "periode_fin")
     ordering = ("-created_at",)
+
+
+@admin.register(StatJour)
+class StatJourAdmin(admin.ModelAdmin):
+    list_display = ("date", "service", "type", "statut", "priorite", "archived", "nombre", "nombre_delais", "somme_delais")
+    list_filter = ("type", "statut", "priorite", "archived", "service")
+    date_hierarchy = "date"
+    ordering = ("-date",)
@@ -0,0 +1,35 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from dashboard.services.cache_dashboard import cache_dashboard
+from dashboard.services.statistiques import agregat_journalier
+
+
+class Command(BaseCommand):
+    help = "Réconcilie la table StatJour avec les courriers (à planifier chaque nuit)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--jours', type=int, default=None,
+                            help="Limite aux N derniers jours de réception (par défaut : tout l'historique)")
+        parser.add_argument('--verifier', action='store_true', help="Affiche les écarts sans rien corriger")
+
+    def handle(self, *args, **options):
+        debut = None
+        if options['jours'] is not None:
+            debut = timezone.now().date() - timedelta(days=options['jours'])
+
+        ecarts = agregat_journalier.ecarts(debut=debut)
+        for cle, (stocke, attendu) in sorted(ecarts.items(), key=lambda e: str(e[0])):
+            self.stdout.write(f"{cle} : stocké {stocke} -> attendu {attendu}")
+
+        if options['verifier']:
+            style = self.style.WARNING if ecarts else self.style.SUCCESS
+            self.stdout.write(style(f"{len(ecarts)} écart(s)"))
+            return
+
+        total = agregat_journalier.reconstruire(debut=debut)
+        if ecarts:
+            cache_dashboard.invalider()
+        self.stdout.write(self.style.SUCCESS(f"✔ {len(ecarts)} écart(s) corrigé(s), {total} lignes StatJour"))
@@ -0,0 +1,84 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Count, F, Func, IntegerField, Q, Sum
+from django.db.models.functions import Coalesce
+
+
+# Copie figée de core.expressions.JoursEntre : jours entre deux dates (fin - debut)
+class JoursEntre(Func):
+    output_field = IntegerField()
+    arity = 2
+
+    template = "(CAST({fin} AS date) - CAST({debut} AS date))"
+    templates = {
+        'sqlite': "CAST(julianday({fin}) - julianday({debut}) AS integer)",
+        'mysql': "DATEDIFF({fin}, {debut})",
+    }
+
+    def as_sql(self, compiler, connection, **extra_context):
+        template = self.templates.get(connection.vendor, self.template)
+        debut_sql, debut_params = compiler.compile(self.source_expressions[0])
+        fin_sql, fin_params = compiler.compile(self.source_expressions[1])
+        if template.index('{fin}') < template.index('{debut}'):
+            params = (*fin_params, *debut_params)
+        else:
+            params = (*debut_params, *fin_params)
+        return template.format(debut=debut_sql, fin=fin_sql), params
+
+
+def remplir_stats(apps, schema_editor):
+    Courrier = apps.get_model('courriers', 'Courrier')
+    StatJour = apps.get_model('dashboard', 'StatJour')
+
+    lignes = Courrier.objects.filter(date_reception__isnull=False).values(
+        'date_reception', 'service_impute', 'type', 'statut', 'priorite', 'archived'
+    ).annotate(
+        nombre=Count('pk'),
+        nombre_delais=Count('pk', filter=Q(date_cloture__isnull=False)),
+        somme_delais=Coalesce(Sum(JoursEntre(F('date_reception'), F('date_cloture'))), 0),
+    ).order_by()
+
+    StatJour.objects.bulk_create([
+        StatJour(
+            date=l['date_reception'], service_id=l['service_impute'], type=l['type'], statut=l['statut'],
+            priorite=l['priorite'], archived=l['archived'], nombre=l['nombre'],
+            nombre_delais=l['nombre_delais'], somme_delais=l['somme_delais'],
+        )
+        for l in lignes
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_initial'),
+        ('courriers', '0011_courrier_acces'),
+        ('dashboard', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StatJour',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('type', models.CharField(max_length=20)),
+                ('statut', models.CharField(max_length=30)),
+                ('priorite', models.CharField(max_length=20)),
+                ('archived', models.BooleanField(default=False)),
+                ('nombre', models.IntegerField(default=0)),
+                ('nombre_delais', models.IntegerField(default=0)),
+                ('somme_delais', models.IntegerField(default=0)),
+                ('service', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='stats_jour', to='core.service')),
+            ],
+            options={
+                'verbose_name': 'Statistique journalière',
+                'verbose_name_plural': 'Statistiques journalières',
+                'db_table': 'dashboard_stat_jour',
+                'indexes': [models.Index(fields=['date', 'service'], name='stat_jour_date_service_idx'), models.Index(fields=['service', 'date'], name='stat_jour_service_date_idx')],
+            },
+        ),
+        migrations.RunPython(remplir_stats, migrations.RunPython.noop),
+    ]
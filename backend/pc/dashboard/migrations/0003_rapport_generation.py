@@ -0,0 +1,32 @@
+# Generated by Django 5.2.18 on 2026-10-19 15:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0002_stat_jour'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='rapportstatistique',
+            name='erreur',
+            field=models.TextField(blank=True, default=''),
+        ),
+        migrations.AddField(
+            model_name='rapportstatistique',
+            name='statut',
+            field=models.CharField(choices=[('en_attente', 'En attente'), ('en_cours', 'En cours'), ('termine', 'Terminé'), ('echec', 'Échec')], default='termine', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='rapportstatistique',
+            name='termine_le',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='rapportstatistique',
+            index=models.Index(fields=['periode_debut', 'periode_fin', 'statut'], name='rapport_periode_statut_idx'),
+        ),
+    ]
@@ -2,6 +2,13 @@ from django.db import models
 
 
 class RapportStatistique(models.Model):
+    STATUT_CHOICES = [
+        ('en_attente', 'En attente'),
+        ('en_cours', 'En cours'),
+        ('termine', 'Terminé'),
+        ('echec', 'Échec'),
+    ]
+
     titre = models.CharField(max_length=255)
     periode_debut = models.DateField()
     periode_fin = models.DateField()
@@ -9,11 +16,53 @@ class RapportStatistique(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     generated_by = models.CharField(max_length=255, blank=True, null=True)  # nom de l'utilisateur ou service
 
+    # Génération en arrière-plan (dashboard/tasks.py)
+    statut = models.CharField(max_length=20, choices=STATUT_CHOICES, default='termine')
+    erreur = models.TextField(blank=True, default='')
+    termine_le = models.DateTimeField(null=True, blank=True)
+
     class Meta:
         db_table = 'dashboard_rapport'
         verbose_name = "Rapport statistique"
         verbose_name_plural = "Rapports statistiques"
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['periode_debut', 'periode_fin', 'statut'], name='rapport_periode_statut_idx'),
+        ]
 
     def __str__(self):
         return f"{self.titre} ({self.periode_debut} → {self.periode_fin})"
+
+
+class StatJour(models.Model):
+    """
+    Agrégat journalier des courriers, par date de réception et dimensions.
+
+    Tenu à jour à chaque écriture de courrier (dashboard/signals.py) et
+    reconstruit chaque nuit par `manage.py reconcilier_stats`. Les lectures
+    additionnent toujours les lignes : une même clé présente deux fois
+    (création concurrente) ne fausse pas les totaux.
+    """
+    date = models.DateField()
+    service = models.ForeignKey('core.Service', on_delete=models.SET_NULL, null=True, blank=True, related_name='stats_jour')
+    type = models.CharField(max_length=20)
+    statut = models.CharField(max_length=30)
+    priorite = models.CharField(max_length=20)
+    archived = models.BooleanField(default=False)
+
+    nombre = models.IntegerField(default=0)
+    # Courriers clôturés (date_reception et date_cloture renseignées) et somme de leurs délais en jours
+    nombre_delais = models.IntegerField(default=0)
+    somme_delais = models.IntegerField(default=0)
+
+    class Meta:
+        db_table = 'dashboard_stat_jour'
+        verbose_name = "Statistique journalière"
+        verbose_name_plural = "Statistiques journalières"
+        indexes = [
+            models.Index(fields=['date', 'service'], name='stat_jour_date_service_idx'),
+            models.Index(fields=['service', 'date'], name='stat_jour_service_date_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.date} {self.type}/{self.statut} : {self.nombre}"
@@ -13,5 +13,15 @@ class RapportStatistiqueSerializer(serializers.ModelSerializer):
             "data",
             "created_at",
             "generated_by",
+            "statut",
+            "erreur",
+            "termine_le",
         ]
-        read_only_fields = ["created_at"]
+        read_only_fields = ["data", "created_at", "generated_by", "statut", "erreur", "termine_le"]
+
+
+class RapportStatistiqueListSerializer(RapportStatistiqueSerializer):
+    """Liste des rapports, sans le contenu"""
+
+    class Meta(RapportStatistiqueSerializer.Meta):
+        fields = [f for f in RapportStatistiqueSerializer.Meta.fields if f != "data"]
@@ -0,0 +1,88 @@
+# dashboard/services/cache_dashboard.py
+import hashlib
+import logging
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+logger = logging.getLogger(__name__)
+
+
+class CacheDashboard:
+    """
+    Cache des réponses du tableau de bord, par action et paramètres de
+    requête (période, dates, service...).
+
+    Les clés contiennent une version globale, avancée par les signaux après
+    le commit de chaque écriture de courrier, d'imputation ou de service
+    (dashboard/signals.py) :
+    une écriture rend toutes les entrées existantes inatteignables, elles
+    expirent ensuite d'elles-mêmes. La date du jour fait aussi partie de la
+    clé (périodes relatives, retards).
+    """
+
+    PREFIXE = 'dashboard:reponse'
+    CLE_VERSION = 'dashboard:version'
+
+    @property
+    def duree(self):
+        return getattr(settings, 'DASHBOARD_CACHE_DUREE', 300)
+
+    def version(self):
+        return cache.get_or_set(self.CLE_VERSION, 0, timeout=None)
+
+    def invalider(self):
+        try:
+            cache.set(self.CLE_VERSION, timezone.now().timestamp(), timeout=None)
+        except Exception as e:
+            logger.warning(f"Cache du tableau de bord indisponible: {e}")
+
+    def cle(self, action, request):
+        parametres = sorted(request.query_params.lists())
+        empreinte = hashlib.sha1(repr(parametres).encode()).hexdigest()
+        return f"{self.PREFIXE}:{action}:{self.version()}:{timezone.now().date().isoformat()}:{empreinte}"
+
+    def lire(self, cle):
+        try:
+            return cache.get(cle)
+        except Exception as e:  # un cache indisponible ne doit pas faire échouer le tableau de bord
+            logger.warning(f"Cache du tableau de bord indisponible: {e}")
+            return None
+
+    def ecrire(self, cle, data):
+        try:
+            cache.set(cle, data, timeout=self.duree)
+        except Exception as e:
+            logger.warning(f"Cache du tableau de bord indisponible: {e}")
+
+
+# Instance globale
+cache_dashboard = CacheDashboard()
+
+
+def en_cache(methode):
+    """
+    Décorateur d'action du DashboardViewSet : sert la réponse depuis le cache,
+    sinon la calcule et la met en cache (réponses 200 uniquement).
+    """
+    @wraps(methode)
+    def wrapper(self, request, *args, **kwargs):
+        try:
+            cle = cache_dashboard.cle(methode.__name__, request)
+        except Exception as e:
+            logger.warning(f"Cache du tableau de bord indisponible: {e}")
+            return methode(self, request, *args, **kwargs)
+
+        data = cache_dashboard.lire(cle)
+        if data is not None:
+            return Response(data, status=status.HTTP_200_OK)
+
+        response = methode(self, request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache_dashboard.ecrire(cle, response.data)
+        return response
+    return wrapper
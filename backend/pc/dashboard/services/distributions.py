@@ -0,0 +1,83 @@
+# dashboard/services/distributions.py
+import numpy as np
+
+CENTILES = (50, 90, 99)
+
+# Tranches de dépassement d'échéance (jours) : bornes supérieures incluses
+TRANCHES_RETARD = (
+    (0, 'dans_delai'),
+    (3, '1-3j'),
+    (7, '4-7j'),
+    (14, '8-14j'),
+    (30, '15-30j'),
+)
+TRANCHE_AU_DELA = '>30j'
+
+
+def charger(valeurs, taille_lot=2000):
+    """
+    Tableau NumPy des valeurs d'un values_list(..., flat=True), lues par
+    lots (iterator) sans instancier de modèles. Les NULL sont ignorés.
+    """
+    return np.fromiter(
+        (v for v in valeurs.iterator(chunk_size=taille_lot) if v is not None),
+        dtype=np.float64,
+    )
+
+
+def charger_groupes(lignes, nb_cles, taille_lot=2000):
+    """
+    Lignes (clé..., valeur...) d'un values_list lues par lots et regroupées
+    par clé : {clé: tableau (n, nb_valeurs)}, les NULL devenant NaN.
+    """
+    cles, codes, valeurs = {}, [], []
+    for ligne in lignes.iterator(chunk_size=taille_lot):
+        codes.append(cles.setdefault(ligne[:nb_cles], len(cles)))
+        valeurs.append(ligne[nb_cles:])
+    if not codes:
+        return {}
+
+    codes = np.asarray(codes)
+    valeurs = np.array(valeurs, dtype=np.float64)
+    ordre = np.argsort(codes, kind='stable')
+    codes, valeurs = codes[ordre], valeurs[ordre]
+    debuts = np.concatenate(([0], np.flatnonzero(np.diff(codes)) + 1))
+
+    par_code = {code: cle for cle, code in cles.items()}
+    return {
+        par_code[int(codes[debut])]: groupe
+        for debut, groupe in zip(debuts, np.split(valeurs, debuts[1:]))
+    }
+
+
+def resume(tableau, centiles=CENTILES):
+    """Effectif, moyenne, centiles et maximum d'une distribution (NaN ignorés)"""
+    tableau = tableau[~np.isnan(tableau)]
+    if not tableau.size:
+        return {'nombre': 0, 'moyenne': 0, **{f'p{c}': 0 for c in centiles}, 'max': 0}
+    valeurs = np.percentile(tableau, centiles)
+    return {
+        'nombre': int(tableau.size),
+        'moyenne': round(float(tableau.mean()), 2),
+        **{f'p{c}': round(float(v), 2) for c, v in zip(centiles, valeurs)},
+        'max': round(float(tableau.max()), 2),
+    }
+
+
+def histogramme_retards(depassements):
+    """
+    Dépassements d'échéance en jours (négatif ou nul : dans les délais) :
+    effectifs par tranche et taux de dépassement (NaN ignorés).
+    """
+    depassements = depassements[~np.isnan(depassements)]
+    bornes = [borne for borne, _ in TRANCHES_RETARD]
+    libelles = [libelle for _, libelle in TRANCHES_RETARD] + [TRANCHE_AU_DELA]
+    effectifs = np.bincount(np.searchsorted(bornes, depassements, side='left'), minlength=len(libelles))
+
+    hors_delai = int(np.count_nonzero(depassements > 0))
+    return {
+        'avec_echeance': int(depassements.size),
+        'hors_delai': hors_delai,
+        'taux_hors_delai': round(hors_delai / depassements.size * 100, 1) if depassements.size else 0,
+        'histogramme': {libelle: int(n) for libelle, n in zip(libelles, effectifs)},
+    }
@@ -0,0 +1,196 @@
+# dashboard/services/rapports.py
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Count, F, Q, Sum
+from django.utils import timezone
+
+from core.expressions import JoursEntre
+from dashboard.services.distributions import charger, resume
+
+logger = logging.getLogger(__name__)
+
+
+class MoteurRapports:
+    """
+    Rapports statistiques d'une période de réception, calculés en arrière-plan
+    (dashboard/tasks.py) puis conservés dans RapportStatistique.data.
+
+    Toutes les sections sont des agrégats SQL ; les délais de traitement sont
+    lus en flux (values_list + iterator) pour les centiles.
+    """
+
+    # ------------------------------------------------------------------
+    # Cycle de vie
+    # ------------------------------------------------------------------
+    @property
+    def delai_max(self):
+        return getattr(settings, 'DASHBOARD_RAPPORT_DELAI_MAX', 900)
+
+    def expirer(self, debut=None, fin=None):
+        """
+        Passe en échec les rapports en préparation depuis plus de delai_max
+        (tâche perdue : redémarrage du worker ou du processus). Retourne leur nombre.
+        """
+        from dashboard.models import RapportStatistique
+
+        rapports = RapportStatistique.objects.filter(
+            statut__in=['en_attente', 'en_cours'],
+            created_at__lt=timezone.now() - timedelta(seconds=self.delai_max),
+        )
+        if debut is not None:
+            rapports = rapports.filter(periode_debut=debut, periode_fin=fin)
+        nombre = rapports.update(statut='echec', erreur="Génération interrompue", termine_le=timezone.now())
+        if nombre:
+            logger.warning(f"{nombre} rapport(s) en préparation depuis plus de {self.delai_max} s passés en échec")
+        return nombre
+
+    def demander(self, debut, fin, titre=None, utilisateur=None, forcer=False):
+        """
+        Rapport de la période : le dernier rapport terminé (ou en préparation
+        depuis moins de delai_max) s'il existe, sinon un nouveau rapport dont
+        la génération est lancée. Retourne (rapport, cree).
+        """
+        from dashboard.models import RapportStatistique
+        from dashboard.tasks import generer_rapport
+        from core.services.taches import lancer_tache
+
+        self.expirer(debut, fin)
+        if not forcer:
+            existant = RapportStatistique.objects.filter(
+                periode_debut=debut, periode_fin=fin, statut__in=['termine', 'en_attente', 'en_cours']
+            ).order_by('-created_at').first()
+            if existant:
+                return existant, False
+
+        rapport = RapportStatistique.objects.create(
+            titre=titre or f"Rapport du {debut:%d/%m/%Y} au {fin:%d/%m/%Y}",
+            periode_debut=debut,
+            periode_fin=fin,
+            statut='en_attente',
+            generated_by=getattr(utilisateur, 'email', None),
+        )
+        lancer_tache(generer_rapport, rapport.pk)
+        return rapport, True
+
+    def generer(self, rapport_id):
+        """Calcule et enregistre le rapport (exécuté par la tâche)"""
+        from dashboard.models import RapportStatistique
+
+        rapport = RapportStatistique.objects.get(pk=rapport_id)
+        rapport.statut = 'en_cours'
+        rapport.save(update_fields=['statut'])
+        try:
+            rapport.data = self.calculer(rapport.periode_debut, rapport.periode_fin)
+            rapport.statut = 'termine'
+            rapport.erreur = ''
+        except Exception as e:
+            logger.error(f"Génération du rapport {rapport_id} en échec: {e}", exc_info=True)
+            rapport.statut = 'echec'
+            rapport.erreur = str(e)
+        rapport.termine_le = timezone.now()
+        rapport.save(update_fields=['data', 'statut', 'erreur', 'termine_le'])
+        return rapport
+
+    # ------------------------------------------------------------------
+    # Calcul
+    # ------------------------------------------------------------------
+    def calculer(self, debut, fin):
+        return {
+            'periode': {'debut': debut.isoformat(), 'fin': fin.isoformat()},
+            'volumes': self.volumes(debut, fin),
+            'services': self.services(debut, fin),
+            'sla': self.sla(debut, fin),
+            'delais': self.delais(debut, fin),
+            'workflow': self.workflow(debut, fin),
+            'genere_le': timezone.now().isoformat(),
+        }
+
+    def _courriers(self, debut, fin):
+        from courriers.models import Courrier
+        return Courrier.objects.filter(date_reception__gte=debut, date_reception__lte=fin)
+
+    def volumes(self, debut, fin):
+        """Courriers reçus par type, statut et priorité (agrégat journalier)"""
+        from dashboard.models import StatJour
+
+        stats = StatJour.objects.filter(date__gte=debut, date__lte=fin)
+        volumes = {'total': stats.aggregate(total=Sum('nombre'))['total'] or 0}
+        for dimension in ('type', 'statut', 'priorite'):
+            volumes[f'par_{dimension}'] = {
+                ligne[dimension]: ligne['total']
+                for ligne in stats.values(dimension).annotate(total=Sum('nombre')).order_by(dimension)
+                if ligne['total']
+            }
+        return volumes
+
+    def services(self, debut, fin):
+        """Volumes, traitements et dépassements d'échéance par service imputé"""
+        from courriers.models import STATUTS_EN_COURS
+
+        aujourd_hui = timezone.now().date()
+        lignes = self._courriers(debut, fin).values('service_impute', 'service_impute__nom').annotate(
+            total=Count('id'),
+            traites=Count('id', filter=Q(statut='repondu')),
+            clos_hors_delai=Count('id', filter=Q(date_cloture__gt=F('date_echeance'))),
+            ouverts_en_retard=Count('id', filter=Q(date_echeance__lt=aujourd_hui, statut__in=STATUTS_EN_COURS)),
+        ).order_by('-total')
+        return [
+            {
+                'service_id': ligne['service_impute'],
+                'service': ligne['service_impute__nom'] or 'Non imputé',
+                'total': ligne['total'],
+                'traites': ligne['traites'],
+                'clos_hors_delai': ligne['clos_hors_delai'],
+                'ouverts_en_retard': ligne['ouverts_en_retard'],
+            }
+            for ligne in lignes
+        ]
+
+    def sla(self, debut, fin):
+        """Respect des échéances"""
+        from courriers.models import STATUTS_EN_COURS
+
+        aujourd_hui = timezone.now().date()
+        avec_echeance = Q(date_echeance__isnull=False)
+        sla = self._courriers(debut, fin).aggregate(
+            avec_echeance=Count('id', filter=avec_echeance),
+            clos_dans_delai=Count('id', filter=Q(date_cloture__lte=F('date_echeance'))),
+            clos_hors_delai=Count('id', filter=Q(date_cloture__gt=F('date_echeance'))),
+            ouverts_en_retard=Count('id', filter=Q(date_echeance__lt=aujourd_hui, statut__in=STATUTS_EN_COURS)),
+        )
+        clos = sla['clos_dans_delai'] + sla['clos_hors_delai']
+        sla['taux_respect'] = round(sla['clos_dans_delai'] / clos * 100, 1) if clos else 0
+        return sla
+
+    def delais(self, debut, fin):
+        """Distribution des délais de traitement (jours) des courriers clôturés"""
+        delais = self._courriers(debut, fin).filter(date_cloture__isnull=False).annotate(
+            delai=JoursEntre(F('date_reception'), F('date_cloture'))
+        ).values_list('delai', flat=True).order_by()
+        return resume(charger(delais))
+
+    def workflow(self, debut, fin):
+        """Workflows des courriers de la période et décisions de validation"""
+        from workflow.models import Workflow, WorkflowStep
+
+        workflows = Workflow.objects.filter(courrier__date_reception__gte=debut, courrier__date_reception__lte=fin)
+        stats = workflows.aggregate(
+            total=Count('id', distinct=True),
+            termines=Count('id', distinct=True, filter=Q(courrier__statut__in=['repondu', 'archive'])),
+            bloques=Count('id', distinct=True, filter=Q(steps__statut='rejete')),
+        )
+        etapes = dict(
+            WorkflowStep.objects.filter(workflow__in=workflows)
+            .values('statut').annotate(total=Count('id')).order_by().values_list('statut', 'total')
+        )
+        decisions = etapes.get('valide', 0) + etapes.get('rejete', 0)
+        stats['etapes'] = etapes
+        stats['taux_validation'] = round(etapes.get('valide', 0) / decisions * 100, 1) if decisions else 0
+        stats['taux_achevement'] = round(stats['termines'] / stats['total'] * 100, 1) if stats['total'] else 0
+        return stats
+
+
+# Instance globale
+moteur_rapports = MoteurRapports()
@@ -0,0 +1,210 @@
+# dashboard/services/statistiques.py
+import logging
+
+from django.db import transaction
+from django.db.models import Count, F, Q, Sum
+from django.db.models.functions import Coalesce
+
+from core.expressions import JoursEntre
+
+logger = logging.getLogger(__name__)
+
+# Champs du courrier qui déterminent sa contribution à StatJour
+CHAMPS_STAT = {
+    'date_reception', 'date_cloture', 'service_impute', 'service_impute_id',
+    'type', 'statut', 'priorite', 'archived',
+}
+DIMENSIONS = ('date', 'service_id', 'type', 'statut', 'priorite', 'archived')
+MESURES = ('nombre', 'nombre_delais', 'somme_delais')
+
+
+class AgregatJournalier:
+    """
+    Maintenance de la table StatJour.
+
+    Chaque courrier reçu (date_reception renseignée) compte pour 1 dans la
+    ligne de ses dimensions ; s'il est clôturé, son délai de traitement
+    s'ajoute à somme_delais. Une modification retire l'ancienne contribution
+    (relue en pre_save, colonnes de stat seulement) et ajoute la nouvelle, par
+    mises à jour F() ; un save() qui ne change aucune dimension n'écrit rien.
+    """
+
+    # ------------------------------------------------------------------
+    # Contributions
+    # ------------------------------------------------------------------
+    def contribution(self, courrier):
+        """(clé, mesures) d'un courrier, ou None s'il n'est pas compté"""
+        from courriers.models import Courrier
+
+        date_reception = Courrier._meta.get_field('date_reception').to_python(courrier.date_reception)
+        if date_reception is None:
+            return None
+        date_cloture = Courrier._meta.get_field('date_cloture').to_python(courrier.date_cloture)
+
+        cle = (date_reception, courrier.service_impute_id, courrier.type, courrier.statut,
+               courrier.priorite, bool(courrier.archived))
+        if date_cloture is None:
+            return cle, (1, 0, 0)
+        return cle, (1, 1, (date_cloture - date_reception).days)
+
+    def memoriser(self, courrier, update_fields=None):
+        """
+        pre_save : contribution actuellement enregistrée du courrier, relue
+        par une requête limitée aux colonnes de stat. Rien n'est fait au
+        chargement : les listes, exports et imports ne paient que leurs save().
+        """
+        if courrier._state.adding or courrier.pk is None:
+            return
+        if update_fields is not None and not CHAMPS_STAT.intersection(update_fields):
+            return
+
+        from courriers.models import Courrier
+        avant = Courrier.objects.filter(pk=courrier.pk).only(*CHAMPS_STAT - {'service_impute_id'}).first()
+        courrier._stat_avant = self.contribution(avant) if avant else None
+
+    def enregistrer(self, courrier, update_fields=None):
+        """post_save : remplace l'ancienne contribution par la nouvelle"""
+        if update_fields is not None and not CHAMPS_STAT.intersection(update_fields):
+            return
+        avant = courrier.__dict__.pop('_stat_avant', None)
+        apres = self.contribution(courrier)
+        if avant == apres:
+            return
+        with transaction.atomic():
+            self._appliquer(avant, -1)
+            self._appliquer(apres, 1)
+
+    def retirer(self, courrier):
+        """post_delete"""
+        self._appliquer(self.contribution(courrier), -1)
+
+    def ajouter_lot(self, courriers):
+        """
+        Contributions de courriers créés sans signaux (bulk_create) :
+        regroupées par clé, une mise à jour par ligne StatJour touchée.
+        """
+        totaux = {}
+        for courrier in courriers:
+            contribution = self.contribution(courrier)
+            if contribution is None:
+                continue
+            cle, mesures = contribution
+            cumul = totaux.get(cle, (0, 0, 0))
+            totaux[cle] = tuple(a + b for a, b in zip(cumul, mesures))
+
+        if not totaux:
+            return 0
+
+        from dashboard.models import StatJour
+        existantes = {}
+        for ligne in StatJour.objects.filter(date__in={cle[0] for cle in totaux}).values('pk', *DIMENSIONS):
+            existantes.setdefault(tuple(ligne[d] for d in DIMENSIONS), ligne['pk'])
+
+        with transaction.atomic():
+            nouvelles = []
+            for cle, mesures in totaux.items():
+                mesures = dict(zip(MESURES, mesures))
+                if cle in existantes:
+                    StatJour.objects.filter(pk=existantes[cle]).update(**{m: F(m) + v for m, v in mesures.items()})
+                else:
+                    nouvelles.append(StatJour(**dict(zip(DIMENSIONS, cle)), **mesures))
+            StatJour.objects.bulk_create(nouvelles)
+        return len(totaux)
+
+    def _appliquer(self, contribution, signe):
+        from dashboard.models import StatJour
+
+        if contribution is None:
+            return
+        cle, mesures = contribution
+        cle = dict(zip(DIMENSIONS, cle))
+        mesures = dict(zip(MESURES, mesures))
+
+        # Une seule ligne mise à jour, même si la clé existe en double
+        pk = StatJour.objects.filter(**cle).values_list('pk', flat=True).first()
+        if pk is not None:
+            StatJour.objects.filter(pk=pk).update(**{m: F(m) + signe * v for m, v in mesures.items()})
+        elif signe > 0:
+            StatJour.objects.create(**cle, **mesures)
+        else:
+            logger.warning(f"StatJour absente pour {cle}, corrigée à la prochaine réconciliation")
+
+    # ------------------------------------------------------------------
+    # Réconciliation
+    # ------------------------------------------------------------------
+    def calculer(self, debut=None, fin=None):
+        """Agrégat recalculé depuis les courriers : {clé: (nombre, nombre_delais, somme_delais)}"""
+        from courriers.models import Courrier
+
+        courriers = Courrier.objects.filter(date_reception__isnull=False)
+        if debut:
+            courriers = courriers.filter(date_reception__gte=debut)
+        if fin:
+            courriers = courriers.filter(date_reception__lte=fin)
+
+        lignes = courriers.values(
+            'date_reception', 'service_impute', 'type', 'statut', 'priorite', 'archived'
+        ).annotate(
+            nombre=Count('pk'),
+            nombre_delais=Count('pk', filter=Q(date_cloture__isnull=False)),
+            somme_delais=Coalesce(Sum(JoursEntre(F('date_reception'), F('date_cloture'))), 0),
+        ).order_by()
+
+        return {
+            (l['date_reception'], l['service_impute'], l['type'], l['statut'], l['priorite'], l['archived']):
+                (l['nombre'], l['nombre_delais'], l['somme_delais'])
+            for l in lignes
+        }
+
+    def lire(self, debut=None, fin=None):
+        """Contenu actuel de StatJour, clés en double additionnées (lignes à zéro omises)"""
+        from dashboard.models import StatJour
+
+        stats = StatJour.objects.all()
+        if debut:
+            stats = stats.filter(date__gte=debut)
+        if fin:
+            stats = stats.filter(date__lte=fin)
+
+        lignes = stats.values(*DIMENSIONS).annotate(
+            **{f'total_{m}': Sum(m) for m in MESURES}
+        ).order_by()
+        return {
+            tuple(l[d] for d in DIMENSIONS): tuple(l[f'total_{m}'] for m in MESURES)
+            for l in lignes
+            if any(l[f'total_{m}'] for m in MESURES)
+        }
+
+    def ecarts(self, debut=None, fin=None):
+        """Clés dont StatJour diffère des courriers : {clé: (stocké, attendu)}"""
+        stocke = self.lire(debut, fin)
+        attendu = self.calculer(debut, fin)
+        zero = (0, 0, 0)
+        return {
+            cle: (stocke.get(cle, zero), attendu.get(cle, zero))
+            for cle in stocke.keys() | attendu.keys()
+            if stocke.get(cle, zero) != attendu.get(cle, zero)
+        }
+
+    def reconstruire(self, debut=None, fin=None, taille_lot=1000):
+        """Remplace les lignes StatJour de la période par l'agrégat recalculé. Retourne le nombre de lignes."""
+        from dashboard.models import StatJour
+
+        with transaction.atomic():
+            attendu = self.calculer(debut, fin)
+            stats = StatJour.objects.all()
+            if debut:
+                stats = stats.filter(date__gte=debut)
+            if fin:
+                stats = stats.filter(date__lte=fin)
+            stats.delete()
+            StatJour.objects.bulk_create(
+                (StatJour(**dict(zip(DIMENSIONS, cle)), **dict(zip(MESURES, mesures)))
+                 for cle, mesures in attendu.items()),
+                batch_size=taille_lot,
+            )
+        return len(attendu)
+
+
+# Instance globale
+agregat_journalier = AgregatJournalier()
@@ -0,0 +1,41 @@
+# dashboard/signals.py
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from core.models import Service
+from courriers.models import Courrier, Imputation
+from dashboard.services.cache_dashboard import cache_dashboard
+from dashboard.services.statistiques import agregat_journalier
+
+
+# Agrégat journalier (StatJour)
+@receiver(pre_save, sender=Courrier)
+def memoriser_stat_courrier(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+    agregat_journalier.memoriser(instance, update_fields)
+
+
+@receiver(post_save, sender=Courrier)
+def enregistrer_stat_courrier(sender, instance, update_fields=None, raw=False, **kwargs):
+    if raw:
+        return
+    agregat_journalier.enregistrer(instance, update_fields)
+
+
+@receiver(post_delete, sender=Courrier)
+def retirer_stat_courrier(sender, instance, **kwargs):
+    agregat_journalier.retirer(instance)
+
+
+# Version du cache des réponses du tableau de bord : avancée après le commit,
+# sinon une requête concurrente mettrait les anciennes données en cache sous
+# la nouvelle version
+@receiver([post_save, post_delete], sender=Courrier)
+@receiver([post_save, post_delete], sender=Imputation)
+@receiver([post_save, post_delete], sender=Service)
+def invalider_cache_dashboard(sender, raw=False, **kwargs):
+    if raw:
+        return
+    transaction.on_commit(cache_dashboard.invalider)
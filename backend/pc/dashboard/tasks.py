@@ -0,0 +1,11 @@
+# dashboard/tasks.py
+from celery import shared_task
+
+from .services.rapports import moteur_rapports
+
+
+@shared_task
+def generer_rapport(rapport_id):
+    """Génère un RapportStatistique en attente"""
+    rapport = moteur_rapports.generer(rapport_id)
+    return f"Rapport {rapport_id} : {rapport.statut}"
@@ -1,3 +1,495 @@
-from django.test import TestCase
+from datetime import date, timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+
+from django.core.cache import cache
+from django.db import connection
+from django.db.models.signals import post_init
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.models import Service
+from courriers.models import Courrier, Imputation
+from users.models import User
+from .models import RapportStatistique, StatJour
+from .services.cache_dashboard import cache_dashboard
+from .services.distributions import histogramme_retards, resume
+from .services.rapports import moteur_rapports
+from .services.statistiques import agregat_journalier
+
+
+class StatJourSignauxTest(TestCase):
+    """Les lignes StatJour tenues par les signaux égalent l'agrégat recalculé (reconcilier_stats)"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(email='admin@test.bf', password='x', nom='Admin', prenom='Test')
+        cls.rh = Service.objects.create(nom="Service RH")
+        cls.finances = Service.objects.create(nom="Service Financier")
+
+    def creer(self, numero, **champs):
+        champs = {'date_reception': date(2026, 3, 2), 'service_impute': self.rh, **champs}
+        return Courrier.objects.create(
+            reference=f"CE-STAT-{numero}", type='entrant', objet=f"Courrier {numero}", created_by=self.user, **champs
+        )
+
+    def assertReconcilie(self):
+        self.assertEqual(agregat_journalier.ecarts(), {})
+
+    def test_creation_modification_cloture_suppression(self):
+        premier = self.creer(1)
+        self.creer(2, priorite='urgente')
+        self.creer(3, date_reception=None)  # non compté
+        self.assertReconcilie()
+        self.assertEqual(sum(StatJour.objects.values_list('nombre', flat=True)), 2)
+
+        premier.service_impute = self.finances
+        premier.date_reception = date(2026, 3, 5)
+        premier.save()
+        self.assertReconcilie()
+
+        recharge = Courrier.objects.get(pk=premier.pk)
+        recharge.statut = 'repondu'
+        recharge.date_cloture = date(2026, 3, 9)
+        recharge.save(update_fields=['statut', 'date_cloture'])
+        self.assertReconcilie()
+        ligne = StatJour.objects.get(statut='repondu')
+        self.assertEqual((ligne.nombre_delais, ligne.somme_delais), (1, 4))
+
+        # Chargement partiel : l'ancienne contribution est relue en base
+        partiel = Courrier.objects.only('id', 'archived').get(pk=premier.pk)
+        partiel.archived = True
+        partiel.save(update_fields=['archived'])
+        self.assertReconcilie()
+
+        Courrier.objects.get(pk=premier.pk).delete()
+        self.assertReconcilie()
+        self.assertEqual(sum(StatJour.objects.values_list('nombre', flat=True)), 1)
+
+    def test_save_sans_changement_de_dimension_sans_ecriture(self):
+        courrier = Courrier.objects.get(pk=self.creer(1).pk)
+        courrier.objet = "Objet modifié"
+
+        with CaptureQueriesContext(connection) as complet:
+            courrier.save()
+        with CaptureQueriesContext(connection) as partiel:
+            courrier.objet = "Objet encore modifié"
+            courrier.save(update_fields=['objet'])
+
+        sql = [q['sql'] for q in complet.captured_queries + partiel.captured_queries]
+        self.assertFalse([s for s in sql if 'dashboard_stat_jour' in s])
+        # save() complet : une relecture des seules colonnes de stat ; update_fields hors stat : aucune
+        relectures = [s for s in sql if s.startswith('SELECT') and '"courrier_courrier"."date_cloture"' in s]
+        self.assertEqual(len(relectures), 1)
+        self.assertIn(relectures[0], [q['sql'] for q in complet.captured_queries])
+        self.assertNotIn('"courrier_courrier"."objet"', relectures[0])
+        self.assertReconcilie()
+
+    def test_chargement_sans_cout(self):
+        # Aucun traitement à l'instanciation : listes, exports et imports chargent des courriers sans payer StatJour
+        self.assertFalse(post_init.has_listeners(Courrier))
+
+        courrier = Courrier.objects.get(pk=self.creer(1).pk)
+        with mock.patch.object(agregat_journalier, 'memoriser', wraps=agregat_journalier.memoriser) as memoriser:
+            list(Courrier.objects.all())
+            courrier.save()
+        memoriser.assert_called_once_with(courrier, None)
+
+
+class CacheDashboardTest(TestCase):
+    """Réponses du tableau de bord servies depuis le cache, rafraîchies après le commit d'une écriture"""
+
+    PARAMS = {'period': 'custom', 'start_date': '2026-03-01', 'end_date': '2026-03-31'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(email='admin@test.bf', password='x', nom='Admin', prenom='Test')
+        cls.service = Service.objects.create(nom="Service RH")
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def stats(self):
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get('/api/dashboard/stats/', self.PARAMS)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(requetes)
+
+    def creer(self, numero):
+        return Courrier.objects.create(
+            reference=f"CE-CACHE-{numero}", type='entrant', objet=f"Courrier {numero}",
+            date_reception=date(2026, 3, 2), service_impute=self.service, created_by=self.user,
+        )
+
+    def test_reponse_en_cache_puis_rafraichie(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.creer(1)
+        data, _ = self.stats()
+        self.assertEqual(data['total'], 1)
+
+        data, requetes = self.stats()
+        self.assertEqual((data['total'], requetes), (1, 0))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            courrier = self.creer(2)
+        data, _ = self.stats()
+        self.assertEqual(data['total'], 2)
+
+        self.stats()
+        with self.captureOnCommitCallbacks(execute=True):
+            Imputation.objects.create(courrier=courrier, service=self.service, responsable=self.user)
+        _, requetes = self.stats()
+        self.assertGreater(requetes, 0)
+
+    def test_version_avancee_seulement_au_commit(self):
+        version = cache_dashboard.version()
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.creer(1)
+            self.assertEqual(cache_dashboard.version(), version)
+        self.assertEqual(cache_dashboard.version(), version)
+
+        for callback in callbacks:
+            callback()
+        self.assertNotEqual(cache_dashboard.version(), version)
+
+
+@override_settings(DASHBOARD_RAPPORT_DELAI_MAX=600)
+class RapportsTest(TestCase):
+    """Demande de rapport (200 / 202 / forcer), rapports interrompus et sections calculées"""
+
+    PERIODE = {'periode_debut': '2026-03-01', 'periode_fin': '2026-03-31'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(email='admin@test.bf', password='x', nom='Admin', prenom='Test')
+        cls.service = Service.objects.create(nom="Service RH")
+        for numero, (cloture, echeance, statut) in enumerate([
+            (date(2026, 3, 4), date(2026, 3, 10), 'repondu'),   # 2 j, dans les délais
+            (date(2026, 3, 12), date(2026, 3, 5), 'repondu'),   # 10 j, hors délai
+            (None, None, 'recu'),
+        ]):
+            Courrier.objects.create(
+                reference=f"CE-RAP-{numero}", type='entrant', objet=f"Courrier {numero}",
+                date_reception=date(2026, 3, 2), date_cloture=cloture, date_echeance=echeance,
+                statut=statut, service_impute=cls.service, created_by=cls.user,
+            )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        patcher = mock.patch('core.services.taches.lancer_tache')
+        self.lancer_tache = patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def generer(self, **donnees):
+        return self.client.post('/api/dashboard/rapports/generer/', {**self.PERIODE, **donnees}, format='json')
+
+    def test_demande_puis_rapport_existant(self):
+        response = self.generer()
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(response.json()['statut'], 'en_attente')
+        self.lancer_tache.assert_called_once()
+        rapport_id = response.json()['id']
+
+        # En préparation : même rapport, pas de nouvelle tâche
+        response = self.generer()
+        self.assertEqual((response.status_code, response.json()['id']), (200, rapport_id))
+        self.assertEqual(self.lancer_tache.call_count, 1)
+
+        moteur_rapports.generer(rapport_id)
+        response = self.generer()
+        self.assertEqual((response.status_code, response.json()['statut']), (200, 'termine'))
+
+        response = self.generer(forcer=True)
+        self.assertEqual(response.status_code, 202)
+        self.assertNotEqual(response.json()['id'], rapport_id)
+        self.assertEqual(self.lancer_tache.call_count, 2)
+
+    def test_rapport_interrompu_passe_en_echec(self):
+        rapport_id = self.generer().json()['id']
+        RapportStatistique.objects.filter(pk=rapport_id).update(
+            statut='en_cours', created_at=timezone.now() - timedelta(seconds=601)
+        )
+
+        with self.assertLogs('dashboard.services.rapports', 'WARNING'):
+            response = self.generer()
+        self.assertEqual(response.status_code, 202)
+        self.assertNotEqual(response.json()['id'], rapport_id)
+        self.assertEqual(RapportStatistique.objects.get(pk=rapport_id).statut, 'echec')
+
+    def test_sections(self):
+        rapport = moteur_rapports.generer(self.generer().json()['id'])
+        self.assertEqual(rapport.statut, 'termine')
+
+        data = rapport.data
+        self.assertEqual(data['volumes']['total'], 3)
+        self.assertEqual(data['volumes']['par_statut'], {'recu': 1, 'repondu': 2})
+        self.assertEqual([(s['service'], s['total'], s['traites'], s['clos_hors_delai']) for s in data['services']],
+                         [("Service RH", 3, 2, 1)])
+        self.assertEqual((data['sla']['clos_dans_delai'], data['sla']['clos_hors_delai'], data['sla']['taux_respect']),
+                         (1, 1, 50.0))
+        self.assertEqual((data['delais']['nombre'], data['delais']['p50'], data['delais']['max']), (2, 6.0, 10.0))
+        self.assertEqual(data['workflow']['total'], 0)
+
+
+class DistributionsTest(TestCase):
+    """Centiles des délais et tranches de dépassement (bornes 0 / 3 / 7 / 14 / 30 incluses)"""
+
+    def test_resume(self):
+        self.assertEqual(resume(np.arange(1, 101, dtype=np.float64)), {
+            'nombre': 100, 'moyenne': 50.5, 'p50': 50.5, 'p90': 90.1, 'p99': 99.01, 'max': 100.0,
+        })
+        self.assertEqual(resume(np.array([np.nan, 4.0])), {
+            'nombre': 1, 'moyenne': 4.0, 'p50': 4.0, 'p90': 4.0, 'p99': 4.0, 'max': 4.0,
+        })
+        self.assertEqual(resume(np.array([]))['nombre'], 0)
+
+    def test_histogramme_bornes(self):
+        depassements = np.array([-2, 0, 1, 3, 4, 7, 8, 14, 15, 30, 31, np.nan], dtype=np.float64)
+        self.assertEqual(histogramme_retards(depassements), {
+            'avec_echeance': 11,
+            'hors_delai': 9,
+            'taux_hors_delai': 81.8,
+            'histogramme': {'dans_delai': 2, '1-3j': 2, '4-7j': 2, '8-14j': 2, '15-30j': 2, '>30j': 1},
+        })
+
+
+class DelaisApiTest(TestCase):
+    """Action delais : synthèse globale, groupes et validation de group_by"""
+
+    PARAMS = {'period': 'custom', 'start_date': '2026-03-01', 'end_date': '2026-03-31'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(email='admin@test.bf', password='x', nom='Admin', prenom='Test')
+        cls.rh = Service.objects.create(nom="Service RH")
+        cls.finances = Service.objects.create(nom="Service Financier")
+        # (service, type, délai de traitement, dépassement d'échéance)
+        for numero, (service, type_courrier, delai, depassement) in enumerate([
+            (cls.rh, 'entrant', 2, -1),
+            (cls.rh, 'entrant', 4, 3),
+            (cls.rh, 'sortant', 10, 8),
+            (cls.finances, 'entrant', 20, 31),
+        ]):
+            cloture = date(2026, 3, 1) + timedelta(days=delai)
+            Courrier.objects.create(
+                reference=f"CE-DEL-{numero}", type=type_courrier, objet=f"Courrier {numero}",
+                date_reception=date(2026, 3, 1), date_cloture=cloture,
+                date_echeance=cloture - timedelta(days=depassement), statut='repondu',
+                service_impute=service, created_by=cls.user,
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def delais(self, **params):
+        return self.client.get('/api/dashboard/delais/', {**self.PARAMS, **params})
+
+    def test_global_et_par_service(self):
+        response = self.delais()
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+
+        self.assertEqual(data['global']['nombre'], 4)
+        self.assertEqual(data['global']['delais'], {
+            'nombre': 4, 'moyenne': 9.0, 'p50': 7.0, 'p90': 17.0, 'p99': 19.7, 'max': 20.0,
+        })
+        self.assertEqual(data['global']['retards']['histogramme'],
+                         {'dans_delai': 1, '1-3j': 1, '4-7j': 0, '8-14j': 1, '15-30j': 0, '>30j': 1})
+
+        groupes = {groupe['label']: groupe for groupe in data['groupes']}
+        self.assertEqual([groupe['label'] for groupe in data['groupes']], ["Service RH", "Service Financier"])
+        self.assertEqual(groupes["Service RH"]['delais']['p50'], 4.0)
+        self.assertEqual(groupes["Service Financier"]['retards']['taux_hors_delai'], 100.0)
+
+    def test_groupes_combines(self):
+        data = self.delais(group_by='service,type').json()
+        self.assertEqual(
+            sorted((g['label'], g['nombre']) for g in data['groupes']),
+            [("Service Financier / Entrant", 1), ("Service RH / Entrant", 2), ("Service RH / Sortant", 1)],
+        )
+
+    def test_group_by_invalide(self):
+        for group_by in ('statut', 'service,priorite', ','):
+            response = self.delais(group_by=group_by)
+            self.assertEqual(response.status_code, 400, group_by)
+            self.assertIn('error', response.json())
+
+
+class SeriesTest(TestCase):
+    """Action series : périodes vides à zéro, regroupements, validation et totaux de StatJour"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(email='admin@test.bf', password='x', nom='Admin', prenom='Test')
+        cls.rh = Service.objects.create(nom="Service RH")
+        cls.finances = Service.objects.create(nom="Service Financier")
+        for numero, (jour, type_courrier, service, statut, archive) in enumerate([
+            (date(2026, 3, 2), 'entrant', cls.rh, 'recu', False),
+            (date(2026, 3, 2), 'sortant', cls.finances, 'repondu', False),
+            (date(2026, 3, 10), 'entrant', cls.rh, 'recu', False),
+            (date(2026, 4, 1), 'interne', None, 'recu', False),
+            (date(2026, 3, 3), 'entrant', cls.rh, 'recu', True),
+        ]):
+            Courrier.objects.create(
+                reference=f"CE-SER-{numero}", type=type_courrier, objet=f"Courrier {numero}", date_reception=jour,
+                service_impute=service, statut=statut, archived=archive, created_by=cls.user,
+            )
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def series(self, debut, fin, **params):
+        return self.client.get('/api/dashboard/series/', {'start_date': debut, 'end_date': fin, **params})
+
+    def donnees(self, response):
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        return data['labels'], {serie['label']: serie['data'] for serie in data['series']}, data['totals']
+
+    def test_buckets_completes_a_zero(self):
+        labels, series, totaux = self.donnees(self.series('2026-03-01', '2026-03-04'))
+        self.assertEqual(labels, ['2026-03-01', '2026-03-02', '2026-03-03', '2026-03-04'])
+        self.assertEqual((series, totaux), ({'Total': [0, 2, 0, 0]}, [0, 2, 0, 0]))
+
+        labels, _, totaux = self.donnees(self.series('2026-03-01', '2026-03-15', bucket='week'))
+        self.assertEqual(labels, ['2026-02-23', '2026-03-02', '2026-03-09'])  # lundis
+        self.assertEqual(totaux, [0, 2, 1])
+
+        labels, _, totaux = self.donnees(self.series('2026-03-01', '2026-04-30', bucket='month'))
+        self.assertEqual((labels, totaux), (['2026-03-01', '2026-04-01'], [3, 1]))
+
+        # Période sans aucun courrier : une série à zéro
+        _, series, totaux = self.donnees(self.series('2025-01-01', '2025-01-03'))
+        self.assertEqual((series, totaux), ({'Total': [0, 0, 0]}, [0, 0, 0]))
+
+    def test_regroupements(self):
+        par_mois = {'bucket': 'month'}
+        _, series, _ = self.donnees(self.series('2026-03-01', '2026-04-30', group_by='type', **par_mois))
+        self.assertEqual(series, {'Entrant': [2, 0], 'Interne': [0, 1], 'Sortant': [1, 0]})
+
+        _, series, _ = self.donnees(self.series('2026-03-01', '2026-04-30', group_by='service', **par_mois))
+        self.assertEqual(series, {'Non imputé': [0, 1], 'Service Financier': [1, 0], 'Service RH': [2, 0]})
+
+        _, series, _ = self.donnees(self.series('2026-03-01', '2026-04-30', group_by='statut', **par_mois))
+        self.assertEqual(series, {'Reçu': [2, 1], 'Répondu': [1, 0]})
+
+        _, _, totaux = self.donnees(self.series('2026-03-01', '2026-04-30', archived='all', **par_mois))
+        self.assertEqual(totaux, [4, 1])
+
+    def test_totaux_egaux_a_statjour(self):
+        for bucket in ('day', 'week', 'month'):
+            for archived in ('false', 'true', 'all'):
+                _, _, totaux = self.donnees(self.series('2026-02-01', '2026-04-30', bucket=bucket, archived=archived))
+                stats = StatJour.objects.filter(date__gte=date(2026, 2, 1), date__lte=date(2026, 4, 30))
+                if archived != 'all':
+                    stats = stats.filter(archived=archived == 'true')
+                self.assertEqual(sum(totaux), sum(stats.values_list('nombre', flat=True)), (bucket, archived))
+
+    def test_parametres_invalides(self):
+        for params in (
+            {'bucket': 'hour'},
+            {'group_by': 'priorite'},
+            {'start_date': '2026-03-10', 'end_date': '2026-03-01'},
+            {'start_date': '2020-01-01', 'end_date': '2026-01-01'},  # plus de SERIES_POINTS_MAX jours
+            {'start_date': '2026-03-01', 'end_date': ''},
+            {'start_date': '2026-13-01', 'end_date': '2026-03-01'},
+        ):
+            params = {'start_date': '2026-03-01', 'end_date': '2026-03-31', **params}
+            response = self.client.get('/api/dashboard/series/', params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn('error', response.json())
+
+        # Même période en semaines : sous la limite
+        response = self.series('2020-01-01', '2026-01-01', bucket='week')
+        self.assertEqual(response.status_code, 200)
+
+
+class PerformanceTest(TestCase):
+    """Action performance : une requête groupée, mêmes chiffres que la boucle par service d'origine"""
+
+    PARAMS = {'period': 'custom', 'start_date': '2026-03-01', 'end_date': '2026-03-31'}
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(email='admin@test.bf', password='x', nom='Admin', prenom='Test')
+
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def performance(self):
+        cache.clear()
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get('/api/dashboard/performance/', self.PARAMS)
+        self.assertEqual(response.status_code, 200)
+        return response.json(), len(requetes)
+
+    def peupler(self, service, decalage):
+        """Courriers de mars (traités, en retard, ouverts), hors période et archivé"""
+        for numero, (recu, cloture, echeance, statut, archive) in enumerate([
+            (date(2026, 3, 2), date(2026, 3, 4 + decalage), None, 'repondu', False),
+            (date(2026, 3, 5), date(2026, 3, 12), None, 'repondu', False),
+            (date(2026, 3, 6), None, date(2026, 3, 8), 'traitement', False),
+            (date(2026, 3, 7), None, None, 'recu', False),
+            (date(2026, 2, 7), date(2026, 2, 9), None, 'repondu', False),
+            (date(2026, 3, 9), date(2026, 3, 10), None, 'repondu', True),
+        ][:3 + decalage]):
+            Courrier.objects.create(
+                reference=f"CE-PERF-{service.pk}-{numero}", type='entrant', objet=f"Courrier {numero}",
+                date_reception=recu, date_cloture=cloture, date_echeance=echeance, statut=statut,
+                archived=archive, service_impute=service, created_by=self.user,
+            )
+
+    def reference(self, service):
+        """Calcul de la boucle par service remplacée (requêtes et délais en Python)"""
+        courriers = Courrier.objects.filter(
+            date_reception__gte=date(2026, 3, 1), date_reception__lte=date(2026, 3, 31),
+            service_impute=service, archived=False,
+        )
+        total = courriers.count()
+        processed = courriers.filter(statut='repondu').count()
+        late = courriers.filter(date_echeance__lt=timezone.now().date(), statut__in=['recu', 'impute', 'traitement']).count()
+        traites = courriers.filter(statut='repondu', date_reception__isnull=False, date_cloture__isnull=False)
+        delais = [(c.date_cloture - c.date_reception).days for c in traites]
+        return {
+            'service': service.nom, 'service_id': service.id, 'processed': processed, 'total': total, 'late': late,
+            'completionRate': round(processed / total * 100, 1) if total else 0,
+            'averageTime': round(sum(delais) / len(delais), 1) if delais else 0,
+        }
+
+    def test_chiffres_identiques_a_la_boucle_par_service(self):
+        services = [Service.objects.create(nom=f"Service {i}") for i in range(4)]
+        for decalage, service in enumerate(services[:3]):
+            self.peupler(service, decalage)
+
+        data, _ = self.performance()
+        self.assertEqual(data, [self.reference(service) for service in services])
+
+        # Service sans courrier : présent, à zéro
+        self.assertEqual(data[-1], {
+            'service': "Service 3", 'service_id': services[3].id, 'processed': 0, 'total': 0, 'late': 0,
+            'completionRate': 0, 'averageTime': 0,
+        })
+        self.assertEqual((data[2]['total'], data[2]['processed'], data[2]['late']), (4, 2, 1))
+
+    def test_nombre_de_requetes_independant_du_nombre_de_services(self):
+        self.peupler(Service.objects.create(nom="Service 0"), 0)
+        data, requetes_un_service = self.performance()
+        self.assertEqual(len(data), 1)
+
+        for i in range(1, 6):
+            self.peupler(Service.objects.create(nom=f"Service {i}"), i % 3)
+        data, requetes_six_services = self.performance()
+        self.assertEqual(len(data), 6)
+        self.assertEqual(requetes_un_service, requetes_six_services)
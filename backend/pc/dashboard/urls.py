@@ -1,15 +1,16 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import DashboardViewSet
+from .views import DashboardViewSet, RapportStatistiqueViewSet
 
 router = DefaultRouter()
-# router.register(r"rapports", RapportStatistiqueViewSet)
-# router.register(r"rapports", RapportStatistiqueViewSet, basename="rapportstatistique")
+router.register(r"rapports", RapportStatistiqueViewSet, basename="rapportstatistique")
 
 
 urlpatterns = [
     path('', include(router.urls)),
     path('stats/', DashboardViewSet.as_view({'get': 'stats'}), name='dashboard-stats'),
     path('trends/', DashboardViewSet.as_view({'get': 'trends'}), name='dashboard-trends'),
-    path('performance/', DashboardViewSet.as_view({'get': 'performance'}), name='dashboard-performance')
+    path('performance/', DashboardViewSet.as_view({'get': 'performance'}), name='dashboard-performance'),
+    path('series/', DashboardViewSet.as_view({'get': 'series'}), name='dashboard-series'),
+    path('delais/', DashboardViewSet.as_view({'get': 'delais'}), name='dashboard-delais'),
 ]
@@ -1,86 +1,22 @@
-# from datetime import date
-# from rest_framework import viewsets, permissions, status
-# from rest_framework.decorators import action
-# from rest_framework.response import Response
-
-# from .models import RapportStatistique
-# from .serializers import RapportStatistiqueSerializer
-
-
-# class RapportStatistiqueViewSet(viewsets.ModelViewSet):
-#     queryset = RapportStatistique.objects.all()
-#     serializer_class = RapportStatistiqueSerializer
-#     permission_classes = [permissions.IsAuthenticated]
-
-#     # Filtrer par période : ?start=2024-01-01&end=2024-01-31
-#     def get_queryset(self):
-#         qs = super().get_queryset()
-
-#         start = self.request.query_params.get("start")
-#         end = self.request.query_params.get("end")
-
-#         if start:
-#             qs = qs.filter(periode_debut__gte=start)
-#         if end:
-#             qs = qs.filter(periode_fin__lte=end)
-
-#         return qs
-
-#     @action(detail=False, methods=["post"])
-#     def generer(self, request):
-#         """
-#         Génère un rapport automatique – exemple d’analyse :
-#         - nombre de courriers entrants / sortants
-#         - workflow stats
-#         - services les plus actifs
-#         - etc.
-#         """
-
-#         titre = request.data.get("titre", "Rapport Automatique")
-#         periode_debut = request.data.get("periode_debut")
-#         periode_fin = request.data.get("periode_fin")
-
-#         if not (periode_debut and periode_fin):
-#             return Response({"detail": "Veuillez fournir les dates."}, status=400)
-
-#         # ⚠️ Exemple de données fictives (à connecter avec tes modèles réels)
-#         data = {
-#             "nombre_courriers": 128,
-#             "courriers_par_service": {
-#                 "RH": 35,
-#                 "Finance": 50,
-#                 "Direction": 43,
-#             },
-#             "workflow_stats": {
-#                 "validés": 105,
-#                 "rejetés": 8,
-#                 "en_attente": 15,
-#             }
-#         }
-
-#         rapport = RapportStatistique.objects.create(
-#             titre=titre,
-#             periode_debut=periode_debut,
-#             periode_fin=periode_fin,
-#             data=data,
-#             generated_by=request.user.email
-#         )
-
-#         return Response(RapportStatistiqueSerializer(rapport).data, status=201)
-
-
-
 # dashboard/views.py
-from rest_framework import viewsets, status
+from rest_framework import mixins, viewsets, status
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
-from django.db.models import Count, Q, Avg, F, ExpressionWrapper, DurationField
+from django.db.models import Count, Q, Avg, F, Sum, Case, When, Value, DateField, IntegerField, ExpressionWrapper, DurationField
+from django.db.models.functions import Coalesce, Trunc
 from django.utils import timezone
 from datetime import timedelta, datetime
 import logging
-from courriers.models import Courrier, Imputation
+import numpy as np
+from courriers.models import STATUTS_EN_COURS, Courrier, Imputation, StatusCourrier, TypeCourrier
+from core.expressions import JoursEntre
 from core.models import Service
+from .models import RapportStatistique, StatJour
+from .serializers import RapportStatistiqueListSerializer, RapportStatistiqueSerializer
+from .services.rapports import moteur_rapports
+from .services.cache_dashboard import en_cache
+from .services.distributions import charger_groupes, histogramme_retards, resume
 
 logger = logging.getLogger(__name__)
 
@@ -90,7 +26,16 @@ class DashboardViewSet(viewsets.ViewSet):
     """
     permission_classes = [IsAuthenticated]
     
+    # Séries temporelles (action series)
+    SERIES_BUCKETS = ('day', 'week', 'month')
+    SERIES_GROUP_BY = ('type', 'service', 'statut')
+    SERIES_POINTS_MAX = 1000
+    
+    # Distributions des délais (action delais) : dimension -> colonne
+    DELAIS_GROUP_BY = {'service': 'service_impute', 'type': 'type'}
+    
     @action(detail=False, methods=['get'])
+    @en_cache
     def stats(self, request):
         """
         Statistiques générales du dashboard
@@ -106,61 +51,51 @@ class DashboardViewSet(viewsets.ViewSet):
             today = timezone.now().date()
             date_filters = self._get_date_filters(period, start_date, end_date)
             
-            # Base queryset
-            queryset = Courrier.objects.filter(**date_filters, archived=False)
-            
             # Filtrer par service si spécifié
+            service_q = Q()
             if service_filter != 'all':
                 service = Service.objects.filter(nom=service_filter).first()
                 if service:
-                    queryset = queryset.filter(service_impute=service)
+                    service_q = Q(service=service)
             
-            # Calculer les statistiques
-            total = queryset.count()
-            entrants = queryset.filter(type='entrant').count()
-            sortants = queryset.filter(type='sortant').count()
-            internes = queryset.filter(type='interne').count()
-            
-            received = queryset.count()
-            in_progress = queryset.filter(statut__in=['recu', 'impute', 'traitement']).count()
-            late = queryset.filter(
-                date_echeance__lt=today,
-                statut__in=['recu', 'impute', 'traitement']
-            ).count()
-            archived = Courrier.objects.filter(
-                **date_filters, 
-                archived=True
-            ).count()
+            # Compteurs lus dans l'agrégat journalier (une requête)
+            actifs = Q(archived=False) & service_q
+            en_cours = Q(statut__in=STATUTS_EN_COURS)
+            traites = Q(statut='repondu')
+            totaux = StatJour.objects.filter(**self._filtres_stat(date_filters)).aggregate(
+                total=self._somme('nombre', actifs),
+                entrants=self._somme('nombre', actifs & Q(type='entrant')),
+                sortants=self._somme('nombre', actifs & Q(type='sortant')),
+                internes=self._somme('nombre', actifs & Q(type='interne')),
+                in_progress=self._somme('nombre', actifs & en_cours),
+                urgent=self._somme('nombre', actifs & Q(priorite='urgente')),
+                archived=self._somme('nombre', Q(archived=True)),
+                jours_traitement=self._somme('somme_delais', traites),
+                nombre_traitements=self._somme('nombre_delais', traites),
+            )
             
-            # Courriers urgents
-            urgent = queryset.filter(priorite='urgente').count()
+            # Le retard dépend de la date du jour : compté sur les courriers
+            # ouverts (index statut / date_echeance)
+            late = Courrier.objects.en_retard(today).filter(**date_filters, archived=False)
+            if service_q:
+                late = late.filter(service_impute=service)
+            late = late.count()
             
             # Délai moyen de traitement
-            processed_courriers = Courrier.objects.filter(
-                **date_filters,
-                statut='repondu',
-                date_reception__isnull=False,
-                date_cloture__isnull=False
-            )
-            
             average_processing_time = 0
-            if processed_courriers.exists():
-                total_days = sum([
-                    (c.date_cloture - c.date_reception).days 
-                    for c in processed_courriers
-                ])
-                average_processing_time = round(total_days / processed_courriers.count(), 1)
+            if totaux['nombre_traitements']:
+                average_processing_time = round(totaux['jours_traitement'] / totaux['nombre_traitements'], 1)
             
             stats_data = {
-                'received': received,
-                'in_progress': in_progress,
+                'received': totaux['total'],
+                'in_progress': totaux['in_progress'],
                 'late': late,
-                'archived': archived,
-                'urgent': urgent,
-                'total': total,
-                'entrants': entrants,
-                'sortants': sortants,
-                'internes': internes,
+                'archived': totaux['archived'],
+                'urgent': totaux['urgent'],
+                'total': totaux['total'],
+                'entrants': totaux['entrants'],
+                'sortants': totaux['sortants'],
+                'internes': totaux['internes'],
                 'average_processing_time': average_processing_time,
                 'period': period,
                 'start_date': start_date,
@@ -178,6 +113,7 @@ class DashboardViewSet(viewsets.ViewSet):
             )
     
     @action(detail=False, methods=['get'])
+    @en_cache
     def trends(self, request):
         """
         Tendances des courriers
@@ -189,12 +125,20 @@ class DashboardViewSet(viewsets.ViewSet):
             
             date_filters = self._get_date_filters(period, start_date, end_date)
             
-            # Courriers cette période
-            current_period = Courrier.objects.filter(**date_filters, archived=False).count()
-            
-            # Courriers période précédente
             previous_filters = self._get_previous_period_filters(period, start_date, end_date)
-            previous_period = Courrier.objects.filter(**previous_filters, archived=False).count()
+            courante = Q(**self._filtres_stat(date_filters))
+            precedente = Q(**self._filtres_stat(previous_filters))
+            
+            # Périodes courante et précédente lues dans l'agrégat journalier (une requête)
+            totaux = StatJour.objects.filter(courante | precedente, archived=False).aggregate(
+                current_period=self._somme('nombre', courante),
+                previous_period=self._somme('nombre', precedente),
+                entrants=self._somme('nombre', courante & Q(type='entrant')),
+                sortants=self._somme('nombre', courante & Q(type='sortant')),
+                internes=self._somme('nombre', courante & Q(type='interne')),
+            )
+            current_period = totaux['current_period']
+            previous_period = totaux['previous_period']
             
             # Calculer la tendance
             received_trend = 0
@@ -208,9 +152,9 @@ class DashboardViewSet(viewsets.ViewSet):
                 'previousPeriod': previous_period,
                 'dailyData': self._get_daily_trends(period),
                 'typeDistribution': {
-                    'entrants': Courrier.objects.filter(**date_filters, type='entrant', archived=False).count(),
-                    'sortants': Courrier.objects.filter(**date_filters, type='sortant', archived=False).count(),
-                    'internes': Courrier.objects.filter(**date_filters, type='interne', archived=False).count(),
+                    'entrants': totaux['entrants'],
+                    'sortants': totaux['sortants'],
+                    'internes': totaux['internes'],
                 }
             }
             
@@ -221,6 +165,7 @@ class DashboardViewSet(viewsets.ViewSet):
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
     @action(detail=False, methods=['get'])
+    @en_cache
     def performance(self, request):
         """
         Performance par service
@@ -232,50 +177,44 @@ class DashboardViewSet(viewsets.ViewSet):
             
             date_filters = self._get_date_filters(period, start_date, end_date)
             
-            performance_data = []
-            services = Service.objects.all()
+            # Une requête groupée par service : LEFT JOIN vers les courriers
+            # de la période, les services sans courrier sortent à zéro
+            periode = Q(**{f'courrier__{cle}': valeur for cle, valeur in date_filters.items()}, courrier__archived=False)
+            traites = periode & Q(courrier__statut='repondu')
+            en_retard = periode & Q(
+                courrier__date_echeance__lt=timezone.now().date(),
+                courrier__statut__in=STATUTS_EN_COURS,
+            )
+            services = Service.objects.order_by('id').values('id', 'nom').annotate(
+                total=Count('courrier', filter=periode),
+                processed=Count('courrier', filter=traites),
+                late=Count('courrier', filter=en_retard),
+                average_time=Avg(
+                    JoursEntre(F('courrier__date_reception'), F('courrier__date_cloture')),
+                    filter=traites & Q(courrier__date_reception__isnull=False, courrier__date_cloture__isnull=False),
+                ),
+            )
             
+            performance_data = []
             for service in services:
-                # Courriers imputés à ce service
-                courriers_service = Courrier.objects.filter(
-                    **date_filters,
-                    service_impute=service,
-                    archived=False
-                )
-                
-                total = courriers_service.count()
-                processed = courriers_service.filter(statut='repondu').count()
-                late = courriers_service.filter(
-                    date_echeance__lt=timezone.now().date(),
-                    statut__in=['recu', 'impute', 'traitement']
-                ).count()
+                total = service['total']
+                processed = service['processed']
                 
                 # Taux de complétion
                 completion_rate = 0
                 if total > 0:
                     completion_rate = round((processed / total) * 100, 1)
                 
-                # Délai moyen de traitement pour ce service
-                processed_by_service = courriers_service.filter(
-                    statut='repondu',
-                    date_reception__isnull=False,
-                    date_cloture__isnull=False
-                )
-                
                 average_time = 0
-                if processed_by_service.exists():
-                    total_days = sum([
-                        (c.date_cloture - c.date_reception).days 
-                        for c in processed_by_service
-                    ])
-                    average_time = round(total_days / processed_by_service.count(), 1)
+                if service['average_time'] is not None:
+                    average_time = round(float(service['average_time']), 1)
                 
                 performance_data.append({
-                    'service': service.nom,
-                    'service_id': service.id,
+                    'service': service['nom'],
+                    'service_id': service['id'],
                     'processed': processed,
                     'total': total,
-                    'late': late,
+                    'late': service['late'],
                     'completionRate': completion_rate,
                     'averageTime': average_time
                 })
@@ -286,6 +225,219 @@ class DashboardViewSet(viewsets.ViewSet):
             logger.error(f"Erreur performance dashboard: {e}")
             return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
     
+    @action(detail=False, methods=['get'])
+    @en_cache
+    def series(self, request):
+        """
+        Série temporelle des courriers reçus, lue dans l'agrégat journalier
+        en une requête (Trunc + Sum), périodes sans courrier à zéro.
+        
+        ?bucket=day|week|month (défaut: day)
+        ?period=week|month|quarter|... ou ?start_date=AAAA-MM-JJ&end_date=AAAA-MM-JJ
+        ?group_by=type|service|statut (optionnel)
+        ?service=<nom> ?archived=false|true|all (défaut: false)
+        """
+        bucket = request.query_params.get('bucket', 'day')
+        group_by = request.query_params.get('group_by')
+        archived = request.query_params.get('archived', 'false')
+        start_date = request.query_params.get('start_date')
+        end_date = request.query_params.get('end_date')
+        period = 'custom' if start_date or end_date else request.query_params.get('period', 'month')
+        
+        if bucket not in self.SERIES_BUCKETS:
+            return Response({"error": f"bucket invalide (valeurs: {', '.join(self.SERIES_BUCKETS)})"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if group_by and group_by not in self.SERIES_GROUP_BY:
+            return Response({"error": f"group_by invalide (valeurs: {', '.join(self.SERIES_GROUP_BY)})"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if period == 'custom' and not (start_date and end_date):
+            return Response({"error": "start_date et end_date sont requis ensemble"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            debut, fin = self._bornes(self._get_date_filters(period, start_date, end_date))
+        except ValueError:
+            return Response({"error": "Dates invalides (format AAAA-MM-JJ)"}, status=status.HTTP_400_BAD_REQUEST)
+        if debut > fin:
+            return Response({"error": "start_date doit précéder end_date"}, status=status.HTTP_400_BAD_REQUEST)
+        
+        periodes = self._periodes(bucket, debut, fin)
+        if len(periodes) > self.SERIES_POINTS_MAX:
+            return Response({"error": f"Plus de {self.SERIES_POINTS_MAX} points : réduire la période ou élargir le bucket"},
+                            status=status.HTTP_400_BAD_REQUEST)
+        
+        try:
+            stats = StatJour.objects.filter(date__gte=debut, date__lte=fin)
+            if archived != 'all':
+                stats = stats.filter(archived=archived == 'true')
+            service_filter = request.query_params.get('service', 'all')
+            if service_filter != 'all':
+                stats = stats.filter(service__nom=service_filter)
+            
+            dimensions = ['periode']
+            if group_by:
+                dimensions.append(group_by)
+            if group_by == 'service':
+                dimensions.append('service__nom')
+            lignes = (
+                stats.annotate(periode=Trunc('date', bucket, output_field=DateField()))
+                .values(*dimensions).annotate(count=Sum('nombre')).order_by()
+            )
+            
+            position = {periode: i for i, periode in enumerate(periodes)}
+            totaux = [0] * len(periodes)
+            series = {}
+            for ligne in lignes:
+                cle = ligne[group_by] if group_by else 'total'
+                serie = series.get(cle)
+                if serie is None:
+                    serie = series[cle] = {
+                        'key': cle,
+                        'label': self._libelle_serie(group_by, cle, ligne),
+                        'data': [0] * len(periodes),
+                    }
+                i = position[ligne['periode']]
+                serie['data'][i] += ligne['count']
+                totaux[i] += ligne['count']
+            
+            if not group_by and not series:
+                series['total'] = {'key': 'total', 'label': 'Total', 'data': totaux}
+            
+            return Response({
+                'bucket': bucket,
+                'start_date': debut,
+                'end_date': fin,
+                'group_by': group_by,
+                'labels': periodes,
+                'series': sorted(series.values(), key=lambda serie: str(serie['label'])),
+                'totals': totaux,
+            }, status=status.HTTP_200_OK)
+        
+        except Exception as e:
+            logger.error(f"Erreur series dashboard: {e}", exc_info=True)
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    @action(detail=False, methods=['get'])
+    @en_cache
+    def delais(self, request):
+        """
+        Distribution des délais de traitement (p50/p90/p99, jours) et
+        histogramme des dépassements d'échéance, au global et par groupe.
+        
+        ?period=... (comme stats) ?service=<nom>
+        ?group_by=service|type|service,type (défaut: service)
+        
+        Les délais sont lus en flux (values_list) et agrégés avec NumPy :
+        SQLite n'a pas de fonction de centile.
+        """
+        try:
+            period = request.query_params.get('period', 'today')
+            start_date = request.query_params.get('start_date')
+            end_date = request.query_params.get('end_date')
+            service_filter = request.query_params.get('service', 'all')
+            group_by = [g for g in request.query_params.get('group_by', 'service').split(',') if g]
+            
+            if not group_by or set(group_by) - set(self.DELAIS_GROUP_BY):
+                return Response({"error": f"group_by invalide (valeurs: {', '.join(self.DELAIS_GROUP_BY)})"},
+                                status=status.HTTP_400_BAD_REQUEST)
+            
+            today = timezone.now().date()
+            date_filters = self._get_date_filters(period, start_date, end_date)
+            courriers = Courrier.objects.filter(**date_filters, archived=False)
+            if service_filter != 'all':
+                courriers = courriers.filter(service_impute__nom=service_filter)
+            
+            # Dépassement : clôture - échéance, ou aujourd'hui - échéance pour un courrier ouvert
+            colonnes = [self.DELAIS_GROUP_BY[g] for g in group_by]
+            lignes = courriers.annotate(
+                delai=JoursEntre(F('date_reception'), F('date_cloture')),
+                depassement=Case(
+                    When(date_cloture__isnull=False, then=JoursEntre(F('date_echeance'), F('date_cloture'))),
+                    When(statut__in=STATUTS_EN_COURS, then=JoursEntre(F('date_echeance'), Value(today))),
+                    default=None,
+                    output_field=IntegerField(),
+                ),
+            ).values_list(*colonnes, 'delai', 'depassement').order_by()
+            
+            groupes = charger_groupes(lignes, len(colonnes))
+            noms_services = {}
+            if 'service' in group_by:
+                position = group_by.index('service')
+                noms_services = dict(Service.objects.filter(
+                    pk__in=[cle[position] for cle in groupes if cle[position] is not None]
+                ).values_list('id', 'nom'))
+            
+            def synthese(valeurs):
+                return {
+                    'nombre': int(valeurs.shape[0]),
+                    'delais': resume(valeurs[:, 0]),
+                    'retards': histogramme_retards(valeurs[:, 1]),
+                }
+            
+            resultat = []
+            for cle, valeurs in groupes.items():
+                libelles = [
+                    noms_services.get(valeur, 'Non imputé') if dimension == 'service'
+                    else TypeCourrier(valeur).label if valeur in TypeCourrier.values else valeur
+                    for dimension, valeur in zip(group_by, cle)
+                ]
+                resultat.append({
+                    'key': dict(zip(group_by, cle)),
+                    'label': ' / '.join(str(libelle) for libelle in libelles),
+                    **synthese(valeurs),
+                })
+            resultat.sort(key=lambda groupe: -groupe['nombre'])
+            
+            tout = np.vstack(list(groupes.values())) if groupes else np.empty((0, 2))
+            return Response({
+                'period': period,
+                'service': service_filter,
+                'group_by': group_by,
+                'global': synthese(tout),
+                'groupes': resultat,
+            }, status=status.HTTP_200_OK)
+        
+        except Exception as e:
+            logger.error(f"Erreur delais dashboard: {e}", exc_info=True)
+            return Response({"error": str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    def _bornes(self, date_filters):
+        """
+        (début, fin) d'un filtre de _get_date_filters
+        """
+        if 'date_reception' in date_filters:
+            return date_filters['date_reception'], date_filters['date_reception']
+        return date_filters['date_reception__gte'], date_filters['date_reception__lte']
+    
+    def _periodes(self, bucket, debut, fin):
+        """
+        Début de chaque période (jour, lundi, 1er du mois) couvrant [debut, fin]
+        """
+        if bucket == 'week':
+            courante = debut - timedelta(days=debut.weekday())
+        elif bucket == 'month':
+            courante = debut.replace(day=1)
+        else:
+            courante = debut
+        
+        periodes = []
+        while courante <= fin and len(periodes) <= self.SERIES_POINTS_MAX:
+            periodes.append(courante)
+            if bucket == 'month':
+                courante = (courante + timedelta(days=32)).replace(day=1)
+            else:
+                courante += timedelta(days=7 if bucket == 'week' else 1)
+        return periodes
+    
+    def _libelle_serie(self, group_by, cle, ligne):
+        if group_by == 'service':
+            return ligne['service__nom'] or 'Non imputé'
+        if group_by == 'type':
+            return TypeCourrier(cle).label if cle in TypeCourrier.values else cle
+        if group_by == 'statut':
+            return StatusCourrier(cle).label if cle in StatusCourrier.values else cle
+        return 'Total'
+    
     def _get_date_filters(self, period, start_date_str, end_date_str):
         """
         Retourne les filtres de date selon la période
@@ -350,36 +502,108 @@ class DashboardViewSet(viewsets.ViewSet):
             start_of_previous_month = end_of_previous_month.replace(day=1)
             return {'date_reception__gte': start_of_previous_month, 'date_reception__lte': end_of_previous_month}
     
+    def _filtres_stat(self, date_filters):
+        """
+        Filtres de date sur Courrier.date_reception -> filtres sur StatJour.date
+        """
+        return {cle.replace('date_reception', 'date', 1): valeur for cle, valeur in date_filters.items()}
+    
+    def _somme(self, champ, condition):
+        return Coalesce(Sum(champ, filter=condition), 0)
+    
     def _get_daily_trends(self, period):
         """
         Génère des données quotidiennes pour les graphiques
+        (une requête groupée par jour sur l'agrégat journalier)
         """
         today = timezone.now().date()
-        daily_data = []
         
         if period == 'week':
-            for i in range(7):
-                day = today - timedelta(days=6 - i)
-                count = Courrier.objects.filter(
-                    date_reception=day,
-                    archived=False
-                ).count()
-                daily_data.append({
-                    'date': day.strftime('%d/%m'),
-                    'count': count
-                })
+            # 7 derniers jours
+            debut, buckets = today - timedelta(days=6), [
+                (day.strftime('%d/%m'), day, day)
+                for day in (today - timedelta(days=6 - i) for i in range(7))
+            ]
         elif period == 'month':
-            for i in range(4):
-                week_start = today - timedelta(days=28 - i*7)
-                week_end = week_start + timedelta(days=6)
-                count = Courrier.objects.filter(
-                    date_reception__gte=week_start,
-                    date_reception__lte=week_end,
-                    archived=False
-                ).count()
-                daily_data.append({
-                    'date': f'Sem {i+1}',
-                    'count': count
-                })
+            # 4 semaines glissantes
+            debut, buckets = today - timedelta(days=28), [
+                (f'Sem {i+1}', today - timedelta(days=28 - i*7), today - timedelta(days=22 - i*7))
+                for i in range(4)
+            ]
+        else:
+            return []
         
-        return daily_data
\ No newline at end of file
+        fin = max(bucket[2] for bucket in buckets)
+        par_jour = dict(
+            StatJour.objects.filter(date__gte=debut, date__lte=fin, archived=False)
+            .values('date').annotate(count=Sum('nombre')).order_by().values_list('date', 'count')
+        )
+        
+        return [
+            {
+                'date': libelle,
+                'count': sum(n for jour, n in par_jour.items() if premier <= jour <= dernier),
+            }
+            for libelle, premier, dernier in buckets
+        ]
+
+
+class RapportStatistiqueViewSet(mixins.DestroyModelMixin, viewsets.ReadOnlyModelViewSet):
+    """
+    Rapports statistiques générés en arrière-plan.
+    Un rapport déjà calculé pour la période est servi tel quel.
+    """
+    queryset = RapportStatistique.objects.all()
+    serializer_class = RapportStatistiqueSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_serializer_class(self):
+        if self.action == 'list':
+            return RapportStatistiqueListSerializer
+        return RapportStatistiqueSerializer
+
+    # Filtrer par période : ?start=2024-01-01&end=2024-01-31
+    def get_queryset(self):
+        qs = super().get_queryset()
+        if self.action == 'list':
+            qs = qs.defer('data')
+
+        start = self.request.query_params.get("start")
+        end = self.request.query_params.get("end")
+
+        if start:
+            qs = qs.filter(periode_debut__gte=start)
+        if end:
+            qs = qs.filter(periode_fin__lte=end)
+
+        return qs
+
+    @action(detail=False, methods=["post"])
+    def generer(self, request):
+        """
+        Demande le rapport d'une période (periode_debut, periode_fin, titre) :
+        - 200 avec le rapport existant (terminé, ou en préparation depuis moins
+          de DASHBOARD_RAPPORT_DELAI_MAX ; au-delà il passe en échec) ;
+        - 202 avec le rapport créé, calculé en arrière-plan (suivre `statut`).
+        `forcer=true` recalcule même si un rapport existe.
+        """
+        try:
+            periode_debut = datetime.strptime(str(request.data.get("periode_debut")), '%Y-%m-%d').date()
+            periode_fin = datetime.strptime(str(request.data.get("periode_fin")), '%Y-%m-%d').date()
+        except ValueError:
+            return Response({"error": "Veuillez fournir periode_debut et periode_fin (AAAA-MM-JJ)."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if periode_debut > periode_fin:
+            return Response({"error": "periode_debut doit précéder periode_fin"}, status=status.HTTP_400_BAD_REQUEST)
+
+        forcer = str(request.data.get("forcer", "")).lower() in ("1", "true", "oui")
+        rapport, cree = moteur_rapports.demander(
+            periode_debut, periode_fin,
+            titre=request.data.get("titre"),
+            utilisateur=request.user,
+            forcer=forcer,
+        )
+        return Response(
+            RapportStatistiqueSerializer(rapport).data,
+            status=status.HTTP_202_ACCEPTED if cree else status.HTTP_200_OK,
+        )
@@ -4,7 +4,7 @@ from .models import IAResult
 
 @admin.register(IAResult)
 class IAResultAdmin(admin.ModelAdmin):
-    list_display = ("courrier", "categorie_predite", "service_suggere", "fiabilite", "processed_at")
-    list_filter = ("categorie_predite", "service_suggere")
+    list_display = ("courrier", "categorie_predite", "service_suggere", "confiance_service", "modele", "date_analyse")
+    list_filter = ("modele", "categorie_predite", "service_suggere")
     search_fields = ("courrier__reference",)
     ordering = ("-processed_at",)
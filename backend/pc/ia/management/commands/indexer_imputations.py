@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from ia.services.knn_router import knn_router
+
+
+class Command(BaseCommand):
+    help = "Construit (ou met à jour) l'index k-NN des imputations et affiche sa précision top-1/top-3."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--complet', action='store_true', help="Reconstruire l'index depuis zéro")
+        parser.add_argument('--sans-evaluation', action='store_true', help="Ne pas calculer la précision")
+        parser.add_argument('--echantillon', type=int, default=500, help="Nombre de documents évalués")
+
+    def handle(self, *args, **options):
+        resultat = knn_router.construire(complet=options['complet'])
+        self.stdout.write(self.style.SUCCESS(
+            f"✔ {resultat['ajoutes']} documents indexés "
+            f"({resultat['total']} au total) en {resultat['duree']:.2f}s"
+        ))
+
+        if options['sans_evaluation']:
+            return
+
+        rapport = knn_router.evaluer(echantillon=options['echantillon'])
+        if not rapport['documents']:
+            self.stdout.write(self.style.WARNING("Index vide, aucune évaluation possible."))
+            return
+
+        self.stdout.write(f"Documents évalués : {rapport['documents']}")
+        self.stdout.write(f"Précision top-1   : {rapport['top1']:.1%}")
+        self.stdout.write(f"Précision top-3   : {rapport['top3']:.1%}")
+        self.stdout.write(f"Latence moyenne   : {rapport['latence_ms']:.2f} ms")
@@ -0,0 +1,86 @@
+# Generated by Django 5.2.18 on 2026-10-19 14:40
+
+from django.db import migrations, models
+
+
+def remplir_colonnes_analyse(apps, schema_editor):
+    """Reprend les analyses existantes (IAResult.meta et Courrier.meta_analyse) dans les colonnes."""
+    IAResult = apps.get_model('ia', 'IAResult')
+    Courrier = apps.get_model('courriers', 'Courrier')
+    Category = apps.get_model('core', 'Category')
+    Service = apps.get_model('core', 'Service')
+
+    for ia_result in IAResult.objects.all().iterator():
+        meta = ia_result.meta or {}
+        ia_result.confiance_service = ia_result.fiabilite
+        ia_result.confiance_categorie = ia_result.fiabilite
+        ia_result.modele = (meta.get('cascade') or {}).get('niveau') or ('spacy' if 'cat_scores' in meta else '')
+        ia_result.date_analyse = ia_result.processed_at
+        ia_result.save(update_fields=['confiance_service', 'confiance_categorie', 'modele', 'date_analyse'])
+
+    categories = set(Category.objects.values_list('id', flat=True))
+    services = set(Service.objects.values_list('id', flat=True))
+    courriers = (
+        Courrier.objects.filter(meta_analyse__has_key='classification', ia_result__isnull=True)
+        .values_list('id', 'meta_analyse', 'updated_at')
+    )
+    for courrier_id, meta_analyse, updated_at in courriers.iterator():
+        classification = meta_analyse.get('classification') or {}
+        categorie_id = classification.get('categorie_id')
+        service_id = classification.get('service_id')
+        confiance_service = float(classification.get('confiance_service') or 0.0)
+        IAResult.objects.create(
+            courrier_id=courrier_id,
+            categorie_predite_id=categorie_id if categorie_id in categories else None,
+            service_suggere_id=service_id if service_id in services else None,
+            fiabilite=confiance_service,
+            confiance_service=confiance_service,
+            confiance_categorie=float(classification.get('confiance_categorie') or 0.0),
+            modele=(meta_analyse.get('cascade') or {}).get('niveau') or 'gemini',
+            date_analyse=updated_at,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0002_initial'),
+        ('courriers', '0006_courrier_expediteur_telephone'),
+        ('ia', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='iaresult',
+            name='confiance_categorie',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='iaresult',
+            name='confiance_service',
+            field=models.FloatField(default=0.0),
+        ),
+        migrations.AddField(
+            model_name='iaresult',
+            name='date_analyse',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='iaresult',
+            name='modele',
+            field=models.CharField(blank=True, max_length=50),
+        ),
+        migrations.AddIndex(
+            model_name='iaresult',
+            index=models.Index(fields=['service_suggere', 'confiance_service'], name='ia_result_service_conf_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='iaresult',
+            index=models.Index(fields=['categorie_predite', 'confiance_categorie'], name='ia_result_categorie_conf_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='iaresult',
+            index=models.Index(fields=['date_analyse'], name='ia_result_date_analyse_idx'),
+        ),
+        migrations.RunPython(remplir_colonnes_analyse, migrations.RunPython.noop),
+    ]
@@ -10,6 +10,10 @@ class IAResult(models.Model):
     categorie_predite = models.ForeignKey(Category, on_delete=models.SET_NULL, null=True, blank=True)
     service_suggere = models.ForeignKey(Service, on_delete=models.SET_NULL, null=True, blank=True)
     fiabilite = models.FloatField(default=0.0)  # 0.0 -> 1.0
+    confiance_categorie = models.FloatField(default=0.0)
+    confiance_service = models.FloatField(default=0.0)
+    modele = models.CharField(max_length=50, blank=True)  # regles, knn, gemini, spacy...
+    date_analyse = models.DateTimeField(null=True, blank=True)
     meta = models.JSONField(default=dict, blank=True)  # stockage des scores, tokens, highlights...
     processed_at = models.DateTimeField(auto_now=True)
 
@@ -17,6 +21,11 @@ class IAResult(models.Model):
         db_table = 'ia_result'
         verbose_name = "Résultat IA"
         verbose_name_plural = "Résultats IA"
+        indexes = [
+            models.Index(fields=['service_suggere', 'confiance_service'], name='ia_result_service_conf_idx'),
+            models.Index(fields=['categorie_predite', 'confiance_categorie'], name='ia_result_categorie_conf_idx'),
+            models.Index(fields=['date_analyse'], name='ia_result_date_analyse_idx'),
+        ]
 
     def __str__(self):
         return f"IA - {self.courrier.reference} ({self.fiabilite:.2f})"
@@ -0,0 +1,215 @@
+# ia/services/classifier.py
+import logging
+import time
+
+from django.conf import settings
+from django.utils import timezone
+
+from core.models import Category, Service
+from core.services.classification_rules import appliquer_regles
+from ia.services.knn_router import knn_router, texte_courrier
+from workflow.services.classifier import classifier_courrier
+
+logger = logging.getLogger(__name__)
+
+SEUILS_PAR_DEFAUT = {
+    'regles': 0.8,
+    'knn': 0.6,
+}
+
+
+class ClassificationCascade:
+    """
+    Classification en cascade : règles -> modèle local k-NN -> Gemini.
+
+    Chaque niveau est essayé dans l'ordre et la cascade s'arrête au premier
+    dont la confiance atteint son seuil (settings.IA_CASCADE_SEUILS).
+    Gemini, dernier niveau, n'est appelé que si aucun niveau local ne suffit ;
+    s'il échoue ou répond avec une confiance moindre, le meilleur résultat
+    local est conservé. Règles et repli par mots-clés partagent la même
+    échelle de confiance (classification_rules.confiance_votes).
+    """
+
+    NIVEAUX = ('regles', 'knn', 'gemini')
+
+    @property
+    def seuils(self):
+        return {**SEUILS_PAR_DEFAUT, **getattr(settings, 'IA_CASCADE_SEUILS', {})}
+
+    def classifier(self, courrier):
+        """
+        Retourne une analyse au format Gemini, enrichie de la trace de la cascade :
+        {
+            "classification": {...},
+            "priorite": {...},
+            "cascade": {"niveau": "knn", "latence_ms": 1.4, "essais": [...]}
+        }
+        """
+        debut_total = time.perf_counter()
+        seuils = self.seuils
+        essais = []
+        meilleur = None
+        retenu = None
+
+        for niveau in self.NIVEAUX:
+            debut = time.perf_counter()
+            try:
+                analyse = getattr(self, f'_niveau_{niveau}')(courrier, meilleur)
+            except Exception as e:
+                logger.error(f"Erreur classification niveau {niveau}: {e}")
+                analyse = None
+            latence = round((time.perf_counter() - debut) * 1000, 2)
+
+            confiance = analyse['classification']['confiance_service'] if analyse else None
+            essais.append({'niveau': niveau, 'confiance': confiance, 'latence_ms': latence})
+
+            if not analyse:
+                continue
+            if niveau == 'gemini':
+                # Le repli de Gemini (réponse illisible : 0.1 / 0.3) ne remplace pas un résultat local plus sûr
+                if meilleur is None or confiance >= meilleur['classification']['confiance_service']:
+                    meilleur = analyse
+                retenu = meilleur
+                break
+            if meilleur is None or confiance > meilleur['classification']['confiance_service']:
+                meilleur = analyse
+            if confiance >= seuils.get(niveau, 1.0):
+                retenu = analyse
+                break
+
+        retenu = retenu or meilleur or self._analyse_par_defaut()
+        retenu['cascade'] = {
+            'niveau': retenu.pop('_niveau', None),
+            'latence_ms': round((time.perf_counter() - debut_total) * 1000, 2),
+            'essais': essais,
+        }
+        logger.info(
+            f"Cascade: niveau {retenu['cascade']['niveau']} "
+            f"({retenu['classification']['confiance_service']:.2f}) en {retenu['cascade']['latence_ms']} ms"
+        )
+        return retenu
+
+    def enregistrer(self, courrier, analyse, modele=None):
+        """
+        Enregistre une analyse terminée dans les colonnes indexées d'IAResult
+        (écrit une seule fois, relu par jointure dans le dashboard d'imputation).
+        L'analyse peut venir du client : les identifiants de catégorie et de
+        service inconnus sont ignorés.
+        """
+        from ia.models import IAResult
+
+        classification = analyse.get('classification', {})
+        cascade = analyse.get('cascade', {})
+        confiance_service = float(classification.get('confiance_service') or 0.0)
+        ia_result, _ = IAResult.objects.get_or_create(courrier=courrier)
+        ia_result.categorie_predite_id = self._id_existant(Category, classification.get('categorie_id'))
+        ia_result.service_suggere_id = self._id_existant(Service, classification.get('service_id'))
+        ia_result.fiabilite = confiance_service
+        ia_result.confiance_service = confiance_service
+        ia_result.confiance_categorie = float(classification.get('confiance_categorie') or 0.0)
+        ia_result.modele = modele or cascade.get('niveau') or ''
+        ia_result.date_analyse = timezone.now()
+        ia_result.meta = {**(ia_result.meta or {}), 'cascade': cascade}
+        ia_result.save()
+        return ia_result
+
+    # ------------------------------------------------------------------
+    # Niveaux
+    # ------------------------------------------------------------------
+    def _niveau_regles(self, courrier, precedent):
+        texte = texte_courrier(courrier)
+        result = appliquer_regles(texte) or classifier_courrier(courrier)
+        return self._formater(
+            'regles',
+            categorie=result.get('category'),
+            categorie_id=result.get('category_id'),
+            service=result.get('service_impute'),
+            service_id=result.get('service_id'),
+            confiance=result.get('confidence', 0.0),
+            courrier=courrier,
+        )
+
+    def _niveau_knn(self, courrier, precedent):
+        suggestions = knn_router.suggerer_courrier(courrier)
+        if not suggestions:
+            return None
+
+        meilleure = suggestions[0]
+        service_nom = Service.objects.filter(id=meilleure['service_id']).values_list('nom', flat=True).first()
+        classification_precedente = (precedent or {}).get('classification', {})
+        analyse = self._formater(
+            'knn',
+            categorie=classification_precedente.get('categorie_suggeree'),
+            categorie_id=classification_precedente.get('categorie_id'),
+            service=service_nom,
+            service_id=meilleure['service_id'],
+            confiance=meilleure['confidence'],
+            courrier=courrier,
+        )
+        analyse['classification']['alternatives'] = suggestions[1:]
+        return analyse
+
+    def _niveau_gemini(self, courrier, precedent):
+        from workflow.services.gemini_courrier_service import gemini_courrier_service
+
+        analyse = gemini_courrier_service.analyser_courrier(courrier)
+        if not analyse or 'classification' not in analyse:
+            return None
+
+        classification = analyse['classification']
+        for cle in ('confiance_service', 'confiance_categorie'):
+            try:
+                classification[cle] = float(classification.get(cle, 0.5))
+            except (TypeError, ValueError):
+                classification[cle] = 0.0
+        analyse['_niveau'] = 'gemini'
+        return analyse
+
+    # ------------------------------------------------------------------
+    # Utilitaires
+    # ------------------------------------------------------------------
+    def _formater(self, niveau, categorie, categorie_id, service, service_id, confiance, courrier):
+        confiance = float(confiance or 0.0)
+        return {
+            "classification": {
+                "categorie_suggeree": categorie,
+                "service_suggere": service,
+                "categorie_id": categorie_id,
+                "service_id": service_id,
+                "confiance_categorie": confiance,
+                "confiance_service": confiance,
+            },
+            "priorite": {
+                "niveau": (getattr(courrier, 'priorite', None) or 'normale').upper(),
+                "raison": f"Classification locale ({niveau})",
+            },
+            "_niveau": niveau,
+        }
+
+    def _id_existant(self, modele, valeur):
+        """Identifiant de l'objet s'il existe, sinon None"""
+        try:
+            pk = int(valeur)
+        except (TypeError, ValueError):
+            return None
+        return pk if modele.objects.filter(pk=pk).exists() else None
+
+    def _analyse_par_defaut(self):
+        return {
+            "classification": {
+                "categorie_suggeree": "ADMINISTRATIF",
+                "service_suggere": "Secrétariat Général",
+                "categorie_id": None,
+                "service_id": None,
+                "confiance_categorie": 0.1,
+                "confiance_service": 0.1,
+            },
+            "priorite": {
+                "niveau": "NORMALE",
+                "raison": "Échec de l'analyse IA",
+            },
+        }
+
+
+# Instance globale
+classification_cascade = ClassificationCascade()
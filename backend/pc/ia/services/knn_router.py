@@ -0,0 +1,327 @@
+# ia/services/knn_router.py
+import logging
+import math
+import os
+import threading
+import time
+from collections import Counter
+
+import numpy as np
+from django.conf import settings
+
+from core.services.texte import tokeniser
+
+logger = logging.getLogger(__name__)
+
+
+class KnnRouter:
+    """
+    Routeur local par plus proches voisins (TF-IDF) entraîné sur les
+    imputations validées par un humain (suggestion_ia=False).
+
+    L'index est stocké dans un fichier .npz compact :
+      - vocabulaire : termes connus
+      - indptr / termes / tf : matrice documents x termes (format CSR)
+      - labels : service imputé de chaque document
+      - courriers : id du courrier de chaque document
+      - dernier_imputation_id : point de reprise pour l'indexation incrémentale
+
+    Les poids IDF sont recalculés au chargement, ce qui permet d'ajouter
+    des documents sans reconstruire tout l'index.
+    """
+
+    def __init__(self, chemin=None, voisins=None):
+        self.chemin = str(chemin or getattr(
+            settings, 'IA_KNN_INDEX_PATH', os.path.join(settings.BASE_DIR, 'ia', 'index', 'imputations.npz')
+        ))
+        self.voisins = voisins or getattr(settings, 'IA_KNN_VOISINS', 15)
+        self._verrou = threading.Lock()
+        self._mtime = None
+        self._reinitialiser()
+
+    def _reinitialiser(self):
+        self.vocabulaire = {}
+        self.indptr = np.zeros(1, dtype=np.int64)
+        self.termes = np.zeros(0, dtype=np.int32)
+        self.tf = np.zeros(0, dtype=np.float32)
+        self.labels = np.zeros(0, dtype=np.int64)
+        self.courriers = np.zeros(0, dtype=np.int64)
+        self.dernier_imputation_id = 0
+        self._idf = np.zeros(0, dtype=np.float32)
+        self._post_ptr = np.zeros(1, dtype=np.int64)
+        self._post_docs = np.zeros(0, dtype=np.int64)
+        self._post_poids = np.zeros(0, dtype=np.float32)
+
+    @property
+    def taille(self):
+        return len(self.labels)
+
+    # ------------------------------------------------------------------
+    # Chargement / sauvegarde
+    # ------------------------------------------------------------------
+    def charger(self):
+        """Charge l'index depuis le disque s'il a changé. Retourne True si un index est disponible."""
+        try:
+            mtime = os.path.getmtime(self.chemin)
+        except OSError:
+            return self.taille > 0
+
+        if mtime == self._mtime:
+            return self.taille > 0
+
+        with np.load(self.chemin, allow_pickle=False) as data:
+            self._installer(
+                {terme: i for i, terme in enumerate(data['vocabulaire'].tolist())},
+                data['indptr'], data['termes'], data['tf'], data['labels'], data['courriers'],
+                int(data['dernier_imputation_id']),
+            )
+        self._mtime = mtime
+
+        logger.info(f"Index k-NN chargé: {self.taille} documents, {len(self.vocabulaire)} termes")
+        return self.taille > 0
+
+    def sauvegarder(self):
+        os.makedirs(os.path.dirname(self.chemin), exist_ok=True)
+        vocabulaire = sorted(self.vocabulaire, key=self.vocabulaire.get)
+        tmp = f"{self.chemin}.tmp"
+        with open(tmp, 'wb') as f:
+            np.savez_compressed(
+                f,
+                vocabulaire=np.array(vocabulaire, dtype=str),
+                indptr=self.indptr,
+                termes=self.termes,
+                tf=self.tf,
+                labels=self.labels,
+                courriers=self.courriers,
+                dernier_imputation_id=np.int64(self.dernier_imputation_id),
+            )
+        os.replace(tmp, self.chemin)
+        self._mtime = os.path.getmtime(self.chemin)
+
+    def _installer(self, vocabulaire, indptr, termes, tf, labels, courriers, dernier_imputation_id):
+        """
+        Prépare un index complet hors verrou puis le substitue à l'index
+        courant d'un bloc : une suggestion en cours ne voit jamais un
+        vocabulaire et des tableaux de deux versions différentes.
+        """
+        index = _indexer(len(vocabulaire), indptr, termes, tf)
+        with self._verrou:
+            self.vocabulaire = vocabulaire
+            self.indptr, self.termes, self.tf = indptr, termes, tf
+            self.labels, self.courriers = labels, courriers
+            self.dernier_imputation_id = dernier_imputation_id
+            self._idf, self._post_ptr, self._post_docs, self._post_poids = index
+
+    # ------------------------------------------------------------------
+    # Prédiction
+    # ------------------------------------------------------------------
+    def _scores(self, comptes):
+        scores = np.zeros(self.taille, dtype=np.float32)
+        requete = {}
+        for terme, nombre in comptes.items():
+            idx = self.vocabulaire.get(terme)
+            if idx is not None:
+                requete[idx] = (1 + math.log(nombre)) * float(self._idf[idx])
+
+        norme = math.sqrt(sum(p * p for p in requete.values()))
+        if not norme:
+            return scores
+
+        for idx, poids in requete.items():
+            debut, fin = self._post_ptr[idx], self._post_ptr[idx + 1]
+            scores[self._post_docs[debut:fin]] += (poids / norme) * self._post_poids[debut:fin]
+        return scores
+
+    def _voter(self, scores, top):
+        k = min(self.voisins, len(scores))
+        if k == 0:
+            return []
+        voisins = np.argpartition(-scores, k - 1)[:k]
+        voisins = voisins[scores[voisins] > 0]
+        if not len(voisins):
+            return []
+
+        votes = {}
+        for doc in voisins:
+            label = int(self.labels[doc])
+            votes[label] = votes.get(label, 0.0) + float(scores[doc])
+
+        total = sum(votes.values())
+        classement = sorted(votes.items(), key=lambda item: item[1], reverse=True)[:top]
+        return [
+            {'service_id': service_id, 'confidence': round(vote / total, 4)}
+            for service_id, vote in classement
+        ]
+
+    def suggerer(self, texte, top=3):
+        """
+        Suggère les services les plus probables pour un texte.
+        Retourne: [{'service_id': 3, 'confidence': 0.82}, ...] (vide si aucun index)
+        """
+        if not self.charger():
+            return []
+        comptes = Counter(tokeniser(texte))
+        with self._verrou:
+            return self._voter(self._scores(comptes), top)
+
+    def suggerer_courrier(self, courrier, top=3):
+        return self.suggerer(texte_courrier(courrier), top)
+
+    # ------------------------------------------------------------------
+    # Construction
+    # ------------------------------------------------------------------
+    def construire(self, complet=False):
+        """
+        (Re)construit l'index à partir des imputations humaines.
+        En mode incrémental, seules les imputations postérieures au dernier
+        passage sont lues ; un courrier ré-imputé remplace son ancien document.
+        """
+        from courriers.models import Courrier, Imputation
+
+        debut = time.perf_counter()
+        if complet:
+            vocabulaire, dernier_imputation_id = {}, 0
+            indptr = np.zeros(1, dtype=np.int64)
+            termes, tf = np.zeros(0, dtype=np.int32), np.zeros(0, dtype=np.float32)
+            labels, courriers = np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        else:
+            self.charger()
+            with self._verrou:
+                vocabulaire, dernier_imputation_id = dict(self.vocabulaire), self.dernier_imputation_id
+                indptr, termes, tf = self.indptr, self.termes, self.tf
+                labels, courriers = self.labels, self.courriers
+
+        imputations = Imputation.objects.filter(
+            suggestion_ia=False,
+            service__isnull=False,
+            id__gt=dernier_imputation_id,
+        ).order_by('id').values_list('id', 'courrier_id', 'service_id')
+
+        nouveaux_labels = {}
+        for imputation_id, courrier_id, service_id in imputations.iterator(chunk_size=2000):
+            nouveaux_labels[courrier_id] = service_id
+            dernier_imputation_id = imputation_id
+
+        if not nouveaux_labels and not complet:
+            return {'ajoutes': 0, 'total': self.taille, 'duree': time.perf_counter() - debut}
+
+        # Retirer les documents des courriers ré-imputés
+        garder = ~np.isin(courriers, np.fromiter(nouveaux_labels, dtype=np.int64))
+        masque_entrees = np.repeat(garder, np.diff(indptr))
+        parties_termes = [termes[masque_entrees]]
+        parties_tf = [tf[masque_entrees]]
+        longueurs = [np.diff(indptr)[garder]]
+        parties_labels = [labels[garder]]
+        parties_courriers = [courriers[garder]]
+
+        textes = Courrier.objects.filter(id__in=list(nouveaux_labels)).values_list(
+            'id', 'objet', 'contenu_texte'
+        )
+        nouveaux_termes, nouveaux_tf, nouvelles_longueurs = [], [], []
+        nouveaux_courriers, labels_ajoutes = [], []
+        for courrier_id, objet, contenu in textes.iterator(chunk_size=500):
+            comptes = Counter(tokeniser(f"{objet or ''} {contenu or ''}"))
+            if not comptes:
+                continue
+            for terme in comptes:
+                if terme not in vocabulaire:
+                    vocabulaire[terme] = len(vocabulaire)
+            nouveaux_termes.extend(vocabulaire[terme] for terme in comptes)
+            nouveaux_tf.extend(comptes.values())
+            nouvelles_longueurs.append(len(comptes))
+            nouveaux_courriers.append(courrier_id)
+            labels_ajoutes.append(nouveaux_labels[courrier_id])
+
+        parties_termes.append(np.array(nouveaux_termes, dtype=np.int32))
+        parties_tf.append(np.array(nouveaux_tf, dtype=np.float32))
+        longueurs.append(np.array(nouvelles_longueurs, dtype=np.int64))
+        parties_labels.append(np.array(labels_ajoutes, dtype=np.int64))
+        parties_courriers.append(np.array(nouveaux_courriers, dtype=np.int64))
+
+        self._installer(
+            vocabulaire,
+            np.concatenate([[0], np.cumsum(np.concatenate(longueurs))]).astype(np.int64),
+            np.concatenate(parties_termes).astype(np.int32),
+            np.concatenate(parties_tf).astype(np.float32),
+            np.concatenate(parties_labels).astype(np.int64),
+            np.concatenate(parties_courriers).astype(np.int64),
+            dernier_imputation_id,
+        )
+        self.sauvegarder()
+
+        return {
+            'ajoutes': len(nouveaux_courriers),
+            'total': self.taille,
+            'duree': time.perf_counter() - debut,
+        }
+
+    # ------------------------------------------------------------------
+    # Évaluation
+    # ------------------------------------------------------------------
+    def evaluer(self, echantillon=500, graine=0):
+        """
+        Évaluation leave-one-out : chaque document de l'échantillon est
+        classé contre le reste de l'index.
+        Les poids IDF restent ceux de l'index complet (document évalué
+        compris) : le score est donc légèrement optimiste sur les termes
+        rares, en échange d'une évaluation sans recalcul par document.
+        Retourne: {'documents': n, 'top1': 0.71, 'top3': 0.90, 'latence_ms': 1.2}
+        """
+        if not self.charger():
+            return {'documents': 0, 'top1': 0.0, 'top3': 0.0, 'latence_ms': 0.0}
+
+        rng = np.random.default_rng(graine)
+        docs = np.arange(self.taille)
+        if echantillon and self.taille > echantillon:
+            docs = rng.choice(docs, size=echantillon, replace=False)
+
+        vocab_inverse = {i: terme for terme, i in self.vocabulaire.items()}
+        top1 = top3 = 0
+        debut = time.perf_counter()
+        for doc in docs:
+            a, b = self.indptr[doc], self.indptr[doc + 1]
+            comptes = {vocab_inverse[int(t)]: float(n) for t, n in zip(self.termes[a:b], self.tf[a:b])}
+            scores = self._scores(comptes)
+            scores[doc] = 0
+            suggestions = [s['service_id'] for s in self._voter(scores, 3)]
+            attendu = int(self.labels[doc])
+            top1 += bool(suggestions) and suggestions[0] == attendu
+            top3 += attendu in suggestions
+        duree = time.perf_counter() - debut
+
+        n = len(docs)
+        return {
+            'documents': n,
+            'top1': round(top1 / n, 4) if n else 0.0,
+            'top3': round(top3 / n, 4) if n else 0.0,
+            'latence_ms': round(duree * 1000 / n, 3) if n else 0.0,
+        }
+
+
+def _indexer(nb_termes, indptr, termes, tf):
+    """
+    Construit l'index inversé pondéré (TF-IDF normalisé) à partir de la matrice CSR.
+    Retourne: (idf, post_ptr, post_docs, post_poids)
+    """
+    nb_docs = len(indptr) - 1
+    docs = np.repeat(np.arange(nb_docs, dtype=np.int64), np.diff(indptr))
+
+    df = np.bincount(termes, minlength=nb_termes)
+    idf = (np.log((1 + nb_docs) / (1 + df)) + 1).astype(np.float32)
+
+    poids = (1 + np.log(tf)) * idf[termes]
+    normes = np.sqrt(np.bincount(docs, weights=poids ** 2, minlength=nb_docs))
+    normes[normes == 0] = 1
+    poids = poids / normes[docs]
+
+    ordre = np.argsort(termes, kind='stable')
+    post_ptr = np.searchsorted(termes[ordre], np.arange(nb_termes + 1))
+    return idf, post_ptr, docs[ordre], poids[ordre].astype(np.float32)
+
+
+def texte_courrier(courrier):
+    return f"{getattr(courrier, 'objet', '') or ''} {getattr(courrier, 'contenu_texte', '') or ''}"
+
+
+# Instance globale
+knn_router = KnnRouter()
@@ -1,3 +1,4 @@
+from django.utils import timezone
 from courriers.models import Courrier
 from .models import IAResult
 from core.models import Category, ClassificationRule
@@ -57,6 +58,10 @@ def process_courrier_automatique(courrier: Courrier):
             "categorie_predite": categorie_predite,
             "service_suggere": service_suggere,
             "fiabilite": fiabilite,
+            "confiance_categorie": fiabilite,
+            "confiance_service": fiabilite if service_suggere else 0.0,
+            "modele": "spacy",
+            "date_analyse": timezone.now(),
             "meta": {"cat_scores": cat_scores},
         }
     )
@@ -1,3 +1,207 @@
-from django.test import TestCase
+import shutil
+import tempfile
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+from django.test import TestCase, override_settings
+
+from core.models import Category, ClassificationRule, Service
+from core.services.classification_rules import appliquer_regles
+from courriers.models import Courrier, Imputation
+from ia.services.classifier import classification_cascade
+from ia.services.knn_router import KnnRouter
+from workflow.services.classifier import classifier_courrier
+
+
+@override_settings(IA_CASCADE_SEUILS={'regles': 0.8, 'knn': 0.6})
+class ClassificationCascadeTest(TestCase):
+    """Ordre de la cascade, seuils par niveau et échelle de confiance des mots-clés"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.rh = Service.objects.create(nom="Service RH")
+        cls.finances = Service.objects.create(nom="Service Financier")
+        categorie = Category.objects.create(name="RH")
+        for mot in ('salaire', 'congé', 'recrutement'):
+            ClassificationRule.objects.create(keyword=mot, service=cls.rh, category=categorie)
+
+    def classifier(self, objet, knn=None, gemini=None):
+        courrier = Courrier(objet=objet, contenu_texte='')
+        with mock.patch('ia.services.classifier.knn_router.suggerer_courrier', return_value=knn or []) as m_knn, \
+                mock.patch('workflow.services.gemini_courrier_service.gemini_courrier_service.analyser_courrier',
+                           return_value=gemini) as m_gemini:
+            analyse = classification_cascade.classifier(courrier)
+        return analyse, m_knn, m_gemini
+
+    def analyse_gemini(self, service, confiance):
+        return {
+            'classification': {'categorie_suggeree': 'RH', 'service_suggere': service,
+                               'confiance_service': confiance, 'confiance_categorie': confiance},
+            'priorite': {'niveau': 'NORMALE'},
+        }
+
+    def test_regles_concordantes_arretent_la_cascade(self):
+        analyse, m_knn, m_gemini = self.classifier("Salaire, congé et recrutement")
+
+        self.assertEqual(analyse['cascade']['niveau'], 'regles')
+        self.assertEqual(analyse['classification']['service_id'], self.rh.id)
+        self.assertEqual(analyse['classification']['confiance_service'], 1.0)
+        m_knn.assert_not_called()
+        m_gemini.assert_not_called()
+
+    def test_mot_cle_isole_passe_au_knn(self):
+        analyse, m_knn, m_gemini = self.classifier(
+            "Demande de congé", knn=[{'service_id': self.finances.id, 'confidence': 0.7}]
+        )
+
+        self.assertEqual([e['niveau'] for e in analyse['cascade']['essais']], ['regles', 'knn'])
+        self.assertAlmostEqual(analyse['cascade']['essais'][0]['confiance'], 1 / 3, places=3)
+        self.assertEqual(analyse['cascade']['niveau'], 'knn')
+        self.assertEqual(analyse['classification']['service_id'], self.finances.id)
+        m_gemini.assert_not_called()
+
+    def test_gemini_en_dernier_recours(self):
+        analyse, _, m_gemini = self.classifier(
+            "Demande de congé",
+            knn=[{'service_id': self.finances.id, 'confidence': 0.5}],
+            gemini=self.analyse_gemini("Service RH", 0.9),
+        )
+
+        m_gemini.assert_called_once()
+        self.assertEqual(analyse['cascade']['niveau'], 'gemini')
+        self.assertEqual(analyse['classification']['confiance_service'], 0.9)
+
+    def test_repli_gemini_ne_remplace_pas_un_resultat_local_plus_sur(self):
+        analyse, _, m_gemini = self.classifier(
+            "Demande de congé",
+            knn=[{'service_id': self.finances.id, 'confidence': 0.5}],
+            gemini=self.analyse_gemini("Secrétariat Général", '0.3'),
+        )
+
+        m_gemini.assert_called_once()
+        self.assertEqual(analyse['cascade']['niveau'], 'knn')
+        self.assertEqual(analyse['classification']['service_id'], self.finances.id)
+        self.assertEqual(analyse['cascade']['essais'][-1]['confiance'], 0.3)
+
+    def test_echelle_commune_regles_et_mots_cles(self):
+        self.assertAlmostEqual(appliquer_regles("Demande de congé")['confidence'], 1 / 3, places=3)
+        self.assertEqual(appliquer_regles("salaire, congé, recrutement")['confidence'], 1.0)
+
+        repli = classifier_courrier(Courrier(objet="Demande de congé", contenu_texte=''))
+        self.assertAlmostEqual(repli['confidence'], 1 / 3, places=3)
+        repli = classifier_courrier(Courrier(objet="Salaire, paie et recrutement", contenu_texte=''))
+        self.assertEqual(repli['confidence'], 1.0)
+
+
+class EnregistrementAnalyseTest(TestCase):
+    """Les identifiants d'une analyse envoyée par le client sont vérifiés avant l'IAResult"""
+
+    def test_identifiants_inconnus_ignores(self):
+        service = Service.objects.create(nom="Service RH")
+        courrier = Courrier.objects.create(reference="CE-IA-1", type='entrant', objet="Congé")
+
+        ia_result = classification_cascade.enregistrer(courrier, {
+            'classification': {'categorie_id': 999999, 'service_id': str(service.id), 'confiance_service': 0.9},
+        })
+        self.assertIsNone(ia_result.categorie_predite_id)
+        self.assertEqual(ia_result.service_suggere_id, service.id)
+
+        ia_result = classification_cascade.enregistrer(courrier, {
+            'classification': {'categorie_id': 'RH', 'service_id': 999999},
+        })
+        self.assertIsNone(ia_result.categorie_predite_id)
+        self.assertIsNone(ia_result.service_suggere_id)
+
+
+class KnnRouterTest(TestCase):
+    """Construction complète et incrémentale de l'index, suggestions et évaluation"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.rh = Service.objects.create(nom="Service RH")
+        cls.finances = Service.objects.create(nom="Service Financier")
+        cls.courriers = {}
+        for numero, (objet, service) in enumerate([
+            ("Demande de congé annuel", cls.rh),
+            ("Congé maternité et salaire", cls.rh),
+            ("Recrutement agent contractuel", cls.rh),
+            ("Facture fournisseur impayée", cls.finances),
+            ("Paiement facture électricité", cls.finances),
+            ("Budget et facture trimestrielle", cls.finances),
+        ]):
+            courrier = Courrier.objects.create(reference=f"CE-KNN-{numero}", type='entrant', objet=objet)
+            Imputation.objects.create(courrier=courrier, service=service)
+            cls.courriers[objet] = courrier
+        # Suggestions de l'IA : jamais apprises
+        Imputation.objects.create(courrier=cls.courriers["Demande de congé annuel"], service=cls.finances,
+                                  suggestion_ia=True)
+
+    def setUp(self):
+        self.dossier = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.dossier, ignore_errors=True)
+        self.router = KnnRouter(chemin=self.dossier / 'index.npz', voisins=3)
+
+    def test_index_vide(self):
+        self.assertEqual(self.router.suggerer("congé annuel"), [])
+        self.assertEqual(self.router.evaluer(), {'documents': 0, 'top1': 0.0, 'top3': 0.0, 'latence_ms': 0.0})
+
+    def test_construction_complete(self):
+        resultat = self.router.construire(complet=True)
+
+        self.assertEqual((resultat['ajoutes'], resultat['total']), (6, 6))
+        self.assertTrue((self.dossier / 'index.npz').exists())
+        derniere = Imputation.objects.filter(suggestion_ia=False).latest('id')
+        self.assertEqual(self.router.dernier_imputation_id, derniere.id)
+        self.assertIn('facture', self.router.vocabulaire)
+
+        # Un autre processus relit l'index sauvegardé
+        relu = KnnRouter(chemin=self.dossier / 'index.npz', voisins=3)
+        self.assertTrue(relu.charger())
+        self.assertEqual(relu.taille, 6)
+        np.testing.assert_array_equal(relu.labels, self.router.labels)
+
+    def test_suggestions(self):
+        self.router.construire(complet=True)
+
+        suggestions = self.router.suggerer("Demande de congé pour un agent")
+        self.assertEqual(suggestions[0]['service_id'], self.rh.id)
+        self.assertAlmostEqual(sum(s['confidence'] for s in suggestions), 1.0, places=3)
+        self.assertEqual(self.router.suggerer("facture")[0]['service_id'], self.finances.id)
+        self.assertEqual(self.router.suggerer("xyzzy inconnu"), [])
+        self.assertEqual(len(self.router.suggerer("congé facture", top=1)), 1)
+
+    def test_reimputation_remplace_le_document(self):
+        self.router.construire(complet=True)
+        courrier = self.courriers["Recrutement agent contractuel"]
+        Imputation.objects.create(courrier=courrier, service=self.finances)
+
+        resultat = self.router.construire()
+
+        self.assertEqual((resultat['ajoutes'], resultat['total']), (1, 6))
+        self.assertEqual(list(self.router.courriers).count(courrier.id), 1)
+        position = list(self.router.courriers).index(courrier.id)
+        self.assertEqual(self.router.labels[position], self.finances.id)
+        self.assertEqual(self.router.suggerer("recrutement")[0]['service_id'], self.finances.id)
+
+        # Rien de nouveau : l'index n'est pas réécrit
+        self.assertEqual(self.router.construire()['ajoutes'], 0)
+
+    def test_construction_incrementale_ajoute_les_nouveaux_courriers(self):
+        self.router.construire(complet=True)
+        courrier = Courrier.objects.create(reference="CE-KNN-NOUVEAU", type='entrant', objet="Avancement de carrière")
+        Imputation.objects.create(courrier=courrier, service=self.rh)
+
+        resultat = self.router.construire()
+
+        self.assertEqual((resultat['ajoutes'], resultat['total']), (1, 7))
+        self.assertEqual(self.router.suggerer("carrière")[0]['service_id'], self.rh.id)
+
+    def test_evaluation(self):
+        self.router.construire(complet=True)
+
+        rapport = self.router.evaluer(echantillon=4)
+
+        self.assertEqual(rapport['documents'], 4)
+        self.assertTrue(0 <= rapport['top1'] <= rapport['top3'] <= 1)
+        self.assertGreaterEqual(rapport['latence_ms'], 0)
@@ -5,7 +5,10 @@ from .models import (
     Workflow, WorkflowStep, WorkflowAction,
     WorkflowTemplate, Accuse
 )
+from django.db.models import Prefetch
+from courriers.models import Courrier
 from courriers.serializers import CourrierListSerializer, CourrierDetailSerializer
+from core.projection import Besoin, ProjectionSerializerMixin
 from core.serializers import ServiceSerializer
 from users.serializers import UserSerializer
 
@@ -72,7 +75,7 @@ class WorkflowStepSerializer(serializers.ModelSerializer):
         return couleurs.get(obj.statut, 'secondary')
 
 
-class WorkflowSerializer(serializers.ModelSerializer):
+class WorkflowSerializer(ProjectionSerializerMixin, serializers.ModelSerializer):
     courrier_detail = CourrierDetailSerializer(source='courrier', read_only=True)
     steps = WorkflowStepSerializer(many=True, read_only=True)
     etape_actuelle = serializers.SerializerMethodField()
@@ -80,6 +83,8 @@ class WorkflowSerializer(serializers.ModelSerializer):
     est_bloque = serializers.SerializerMethodField()
     temps_total = serializers.SerializerMethodField()
     
+    CHAMPS_EXTENSIBLES = ('courrier_detail', 'steps')
+    
     class Meta:
         model = Workflow
         fields = [
@@ -89,35 +94,57 @@ class WorkflowSerializer(serializers.ModelSerializer):
         ]
         read_only_fields = ['created_at', 'updated_at']
     
+    @classmethod
+    def projection(cls):
+        """Les champs calculés lisent les étapes préchargées (une requête pour toute la page)"""
+        etapes = Prefetch('steps', queryset=WorkflowStep.objects.order_by('step_number'))
+        # Étapes sérialisées : même préchargement 'steps', avec leurs relations jointes
+        # (déclaré avant les champs calculés, il est celui retenu quand les deux sont demandés)
+        etapes_detaillees = Prefetch('steps', queryset=WorkflowStep.objects.select_related(
+            'validator', 'approbateur_service__chef'
+        ).order_by('step_number'))
+        return {
+            'courrier_detail': Besoin(colonnes=('courrier',), prefetch_related=(
+                Prefetch('courrier', queryset=CourrierDetailSerializer.optimiser_queryset(Courrier.objects.all())),
+            )),
+            'steps': Besoin(prefetch_related=(
+                etapes_detaillees,
+                Prefetch('steps__actions', queryset=WorkflowAction.objects.select_related('user')),
+            )),
+            'etape_actuelle': Besoin(colonnes=('current_step',), prefetch_related=(etapes,)),
+            'progression': Besoin(prefetch_related=(etapes,)),
+            'est_bloque': Besoin(prefetch_related=(etapes,)),
+            'temps_total': Besoin(prefetch_related=(etapes,)),
+        }
+    
     def get_etape_actuelle(self, obj):
-        try:
-            step = obj.steps.get(step_number=obj.current_step)
-            return {
-                'id': step.id,
-                'label': step.label,
-                'statut': step.statut,
-                'validator': step.validator_id
-            }
-        except WorkflowStep.DoesNotExist:
+        step = next((s for s in obj.steps.all() if s.step_number == obj.current_step), None)
+        if step is None:
             return None
+        return {
+            'id': step.id,
+            'label': step.label,
+            'statut': step.statut,
+            'validator': step.validator_id
+        }
     
     def get_progression(self, obj):
-        total_steps = obj.steps.count()
+        steps = obj.steps.all()
+        total_steps = len(steps)
         if total_steps > 0:
-            steps_valides = obj.steps.filter(statut='valide').count()
+            steps_valides = sum(1 for s in steps if s.statut == 'valide')
             return round((steps_valides / total_steps) * 100, 2)
         return 0
     
     def get_est_bloque(self, obj):
         # Un workflow est bloqué si une étape est rejetée
-        return obj.steps.filter(statut='rejete').exists()
+        return any(s.statut == 'rejete' for s in obj.steps.all())
     
     def get_temps_total(self, obj):
-        if obj.steps.exists():
-            premiere_date = obj.steps.order_by('date_action').first().date_action
-            derniere_date = obj.steps.order_by('-date_action').first().date_action
-            if premiere_date and derniere_date:
-                return (derniere_date - premiere_date).total_seconds() / 3600  # en heures
+        dates = [s.date_action for s in obj.steps.all()]
+        # Une étape sans date d'action rend la durée indéterminée
+        if dates and None not in dates:
+            return (max(dates) - min(dates)).total_seconds() / 3600  # en heures
         return None
 
 
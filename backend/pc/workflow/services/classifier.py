@@ -1,6 +1,8 @@
 import logging
 from datetime import datetime
 
+from core.services.classification_rules import confiance_votes
+
 logger = logging.getLogger(__name__)
 
 def classifier_courrier(courrier):
@@ -52,15 +54,13 @@ def classifier_courrier(courrier):
                     score += 1
             
             if score > 0:
-                scores[categorie] = {
-                    'score': score,
-                    'pourcentage': min(score / len(mots_cles), 1.0)
-                }
+                scores[categorie] = score
         
         # Trouver la catégorie avec le score le plus élevé
+        # (même échelle de confiance que les règles de classification)
         if scores:
-            meilleure_categorie = max(scores.items(), key=lambda x: x[1]['score'])[0]
-            confiance = scores[meilleure_categorie]['pourcentage']
+            meilleure_categorie = max(scores.items(), key=lambda x: x[1])[0]
+            confiance = confiance_votes(scores[meilleure_categorie], sum(scores.values()), scores[meilleure_categorie])
         else:
             meilleure_categorie = 'ADMINISTRATIF'
             confiance = 0.3
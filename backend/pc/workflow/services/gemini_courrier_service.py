@@ -5,6 +5,7 @@ import re
 from django.conf import settings
 from django.utils import timezone
 from core.models import Category, Service
+from core.services.resolution_noms import resolveur_categories, resolveur_services
 from courriers.models import ActionHistorique
 
 logger = logging.getLogger(__name__)
@@ -304,18 +305,14 @@ RÈGLES IMPORTANTES:
         """Enrichit l'analyse avec les objets réels"""
         try:
             # Chercher la catégorie
-            categorie_nom = analyse_data.get('categorie_suggeree')
-            if categorie_nom:
-                category = Category.objects.filter(name__icontains=categorie_nom).first()
-                if category:
-                    analyse_data['categorie_id'] = category.id
+            categorie_id = resolveur_categories.resoudre(analyse_data.get('categorie_suggeree'))
+            if categorie_id:
+                analyse_data['categorie_id'] = categorie_id
             
             # Chercher le service
-            service_nom = analyse_data.get('service_suggere')
-            if service_nom:
-                service = Service.objects.filter(nom__icontains(service_nom)).first()
-                if service:
-                    analyse_data['service_id'] = service.id
+            service_id = resolveur_services.resoudre(analyse_data.get('service_suggere'))
+            if service_id:
+                analyse_data['service_id'] = service_id
             
             # Standardiser le format de réponse
             formatted_data = {
@@ -1,3 +1,87 @@
+from datetime import timedelta
+
+from django.db import connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from core.models import Service
+from courriers.models import Courrier, Imputation
+from users.models import User
+from .models import Workflow, WorkflowStep
+
+
+class WorkflowListeTest(TestCase):
+    """Liste des workflows : nombre de requêtes fixe, champs calculés sur les étapes préchargées"""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_superuser(email='admin@test.bf', password='x', nom='Admin', prenom='Test')
+        cls.service = Service.objects.create(nom="Service A", chef=cls.user)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def creer_workflows(self, nombre, dates=None):
+        debut = Workflow.objects.count()
+        maintenant = timezone.now()
+        for i in range(debut, debut + nombre):
+            courrier = Courrier.objects.create(
+                reference=f"CE-WF-{i}", type='entrant', objet=f"Courrier {i}",
+                service_impute=self.service, created_by=self.user,
+            )
+            Imputation.objects.create(courrier=courrier, service=self.service, responsable=self.user)
+            workflow = Workflow.objects.create(courrier=courrier, current_step=2)
+            for numero, decalage in enumerate(dates or (0, 3), start=1):
+                WorkflowStep.objects.create(
+                    workflow=workflow, step_number=numero, label=f"Étape {numero}",
+                    validator=self.user, approbateur_service=self.service,
+                    statut='valide' if numero == 1 else 'en_attente',
+                    date_action=None if decalage is None else maintenant + timedelta(hours=decalage),
+                )
+        return workflow
+
+    def lister(self, **params):
+        with CaptureQueriesContext(connection) as requetes:
+            response = self.client.get('/api/workflow/workflows/', params)
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        return len(requetes), data['results'] if isinstance(data, dict) else data
+
+    def test_nombre_de_requetes_independant_du_nombre_de_workflows(self):
+        self.creer_workflows(1)
+        requetes_une_ligne, data = self.lister()
+        self.assertEqual(len(data), 1)
+
+        self.creer_workflows(4)
+        requetes_cinq_lignes, data = self.lister()
+        self.assertEqual(len(data), 5)
+        self.assertEqual(requetes_une_ligne, requetes_cinq_lignes)
+        # workflows, courriers (+ pièces jointes, imputations, historique), étapes (+ actions)
+        self.assertEqual(requetes_cinq_lignes, 7)
+
+        ligne = data[0]
+        self.assertEqual(ligne['etape_actuelle']['label'], "Étape 2")
+        self.assertEqual(ligne['progression'], 50.0)
+        self.assertFalse(ligne['est_bloque'])
+
+    def test_fields_et_expand(self):
+        self.creer_workflows(2)
+        _, data = self.lister(fields='id,progression')
+        self.assertEqual([set(ligne) for ligne in data], [{'id', 'progression'}] * 2)
+
+        _, data = self.lister(expand='steps')
+        self.assertIn('steps', data[0])
+        self.assertNotIn('courrier_detail', data[0])
+
+    def test_temps_total(self):
+        self.creer_workflows(1, dates=(0, 3))
+        _, data = self.lister(fields='id,temps_total')
+        self.assertAlmostEqual(data[0]['temps_total'], 3.0)
 
-# Create your tests here.
+        # Une étape sans date d'action : durée indéterminée
+        self.creer_workflows(1, dates=(0, None))
+        _, data = self.lister(fields='id,temps_total')
+        self.assertEqual(sorted(ligne['temps_total'] is None for ligne in data), [False, True])
@@ -17,15 +17,17 @@ from .serializers import (
     StepActionSerializer, WorkflowStatsSerializer, NotificationSerializer
 )
 from courriers.models import Courrier
+from core.projection import ProjectionMixin
 from users.models import User
 import logging
 
 logger = logging.getLogger(__name__)
 
 
-class WorkflowViewSet(viewsets.ModelViewSet):
+class WorkflowViewSet(ProjectionMixin, viewsets.ModelViewSet):
     """
     ViewSet pour la gestion des workflows
+    Lecture allégée : ?fields=id,courrier,progression et ?expand=steps
     """
     queryset = Workflow.objects.all().order_by('-created_at')
     serializer_class = WorkflowSerializer
@@ -63,7 +65,8 @@ class WorkflowViewSet(viewsets.ModelViewSet):
             workflow_ids = user_steps.values_list('workflow_id', flat=True).distinct()
             queryset = queryset.filter(id__in=workflow_ids)
         
-        return queryset
+        # Colonnes et préchargements limités aux champs demandés (?fields=, ?expand=)
+        return self.projeter(queryset)
     
     @transaction.atomic
     def create(self, request, *args, **kwargs):